@@ -0,0 +1,60 @@
+"""物資空投批次作業：一次解析目標名單，再以分塊的批次增量 / 多列寫入發送
+
+同一內容 (名單 + 點數 + 禮物) 的空投有失敗的塊時，再執行一次會沿用同一筆 Airdrop_Runs 續傳：
+每塊的標記與入帳在同一交易 (storage.apply_airdrop_chunk)，已完成的塊直接略過，不會重複發送。
+"""
+import hashlib
+import json
+import time
+from datetime import datetime
+
+from tiers import TIER_NAMES, VIP_COHORTS
+
+# 排位對象 (高 → 低)：名稱 → 階級 ID
+RANK_COHORTS = [TIER_NAMES[t] for t in sorted(TIER_NAMES, reverse=True)]
+_COHORT_TIER = {name: t for t, name in TIER_NAMES.items()}
+
+
+def cohort_bounds(group, tiers):
+    """排位對象 → 積分區間 [lo, hi) (tiers 為 TierTable)"""
+    return tiers.bounds(_COHORT_TIER[group])
+
+
+def resolve_targets(db, group, tiers, single_id=None):
+    if group == "單一玩家 ID": return [single_id] if single_id else []
+    if group == "全體玩家": return db.cohort_member_ids()
+    if group in VIP_COHORTS: return db.cohort_member_ids(vip_level=VIP_COHORTS[group])
+    if group in RANK_COHORTS:
+        lo, hi = cohort_bounds(group, tiers)
+        return db.cohort_member_ids(min_points=lo, max_points=hi)
+    return []
+
+
+def airdrop_hash(target_ids, xp, vp, item, chunk_size):
+    return hashlib.sha256(json.dumps([sorted(target_ids), xp, vp, item, chunk_size], ensure_ascii=False).encode()).hexdigest()
+
+
+def run_airdrop(db, target_ids, xp=0, vp=0, item=None, chunk_size=500, on_progress=None):
+    """分塊發送，回傳 (執行紀錄, 每塊的結果報表)；失敗的塊記錄錯誤並繼續下一塊，已完成的塊標記為略過"""
+    target_ids = sorted(target_ids)
+    total = len(target_ids); done = 0
+    run = db.begin_airdrop(airdrop_hash(target_ids, xp, vp, item, chunk_size), -(-total // chunk_size))
+    report = []
+    for start in range(0, total, chunk_size):
+        chunk = target_ids[start:start + chunk_size]
+        t0 = time.perf_counter()
+        row = {"chunk": start // chunk_size + 1, "players": len(chunk), "balances": 0, "prizes": 0, "ms": 0.0, "skipped": False, "error": ""}
+        try:
+            deltas = [{"pf_id": t, "xp": xp, "vip_points": vp} for t in chunk] if xp or vp else []
+            now = datetime.now().isoformat()
+            prizes = [{"player_id": t, "prize_name": item, "status": '待兌換', "time": now, "expire_at": "無期限", "source": '老闆空投'} for t in chunk] if item else []
+            got = db.apply_airdrop_chunk(run["run_key"], row["chunk"] - 1, deltas, prizes)
+            if got is None: row["skipped"] = True
+            else: row["balances"], row["prizes"] = got
+        except Exception as e:
+            row["error"] = str(e)
+        row["ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        report.append(row)
+        done += len(chunk)
+        if on_progress: on_progress(done, total, row)
+    return run, report
@@ -0,0 +1,91 @@
+"""遊戲動畫 (前端播放)：伺服器只算出結果、送出一份 HTML 給 st.iframe，轉動 / 翻牌由瀏覽器完成
+
+每個函式回傳 (html, 高度)；iframe 不繼承頁面 CSS，所需樣式都寫在文件內。
+"""
+import html
+
+from engine.roulette import RED as RED_NUMS
+
+_BASE_CSS = """
+body { margin: 0; font-family: sans-serif; color: #FFF; background: transparent; }
+.banner { text-align: center; font-size: 1.3em; font-weight: bold; padding: 10px; margin-top: 10px; border-radius: 10px; opacity: 0; }
+.banner.win { background: #0b3d17; color: #7CFC00; } .banner.lose { background: #3d0b0b; color: #FF6B6B; } .banner.push { background: #0b2a3d; color: #87CEFA; }
+.show { animation: fade-in 0.4s forwards; }
+@keyframes fade-in { from { opacity: 0; transform: translateY(8px); } to { opacity: 1; transform: none; } }
+"""
+
+
+def _doc(css, body, script=""):
+    return f"<html><head><style>{_BASE_CSS}{css}</style></head><body>{body}<script>{script}</script></body></html>"
+
+
+def _banner(text, kind, delay_ms):
+    return f"<div class='banner {kind} show' style='animation-delay:{delay_ms}ms'>{html.escape(text)}</div>"
+
+
+def wheel(items, win_idx, banner, kind, laps=2, step_ms=100):
+    """幸運轉盤：高亮格依序跑 laps 圈後停在 win_idx"""
+    cells = "".join(
+        f"<div class='cell' id='c{i}'>" + (f"<img src='{html.escape(it.get('img_url') or '')}'>" if it.get('img_url') else "")
+        + f"<div>{html.escape(str(it['item_name']))}</div></div>" for i, it in enumerate(items))
+    steps = laps * len(items) + win_idx + 1
+    css = """
+.grid { display: grid; grid-template-columns: repeat(5, 1fr); gap: 10px; padding: 20px; background: #000; border: 4px solid #FFD700; border-radius: 20px; }
+.cell { background: #222; border: 2px solid #444; border-radius: 10px; padding: 10px; text-align: center; transition: 0.1s; height: 100px; display: flex; flex-direction: column; justify-content: center; align-items: center; }
+.cell.on { background: #FFF; border-color: #FFD700; color: #000; box-shadow: 0 0 20px #FFD700; transform: scale(1.1); font-weight: bold; }
+.cell img { width: 50px; height: 50px; object-fit: contain; margin-bottom: 5px; }
+"""
+    script = f"""
+const n = {len(items)}, steps = {steps}; let k = 0;
+const t = setInterval(() => {{
+  document.querySelectorAll('.cell').forEach(c => c.classList.remove('on'));
+  document.getElementById('c' + (k % n)).classList.add('on');
+  if (++k >= steps) clearInterval(t);
+}}, {step_ms});
+"""
+    body = f"<div class='grid'>{cells}</div>" + _banner(banner, kind, steps * step_ms)
+    return _doc(css, body, script), 360
+
+
+def baccarat(p_cards, b_cards, p_val, b_val, banner, kind, step_ms=500):
+    """百家樂：閒 / 莊依序翻牌，cards 為 [(點數字, 花色)]"""
+    def hand(cards, start):
+        out = ""
+        for i, (face, suit) in enumerate(cards):
+            col = "red" if suit in ("♥", "♦") else "black"
+            out += f"<div class='card {col}' style='animation-delay:{(start + i) * step_ms}ms'>{face}<br>{suit}</div>"
+        return out
+    css = """
+.table { display: flex; justify-content: space-around; }
+.side { text-align: center; } .side h3 { margin: 6px; }
+.card { background: #FFF; border-radius: 5px; width: 40px; height: 60px; display: inline-flex; align-items: center; justify-content: center; font-weight: bold; font-size: 1.1em; margin: 2px; opacity: 0; transform: rotateY(90deg); animation: flip 0.3s forwards; }
+.card.red { color: #D40000; } .card.black { color: #000; }
+@keyframes flip { to { opacity: 1; transform: none; } }
+"""
+    n = len(p_cards) + len(b_cards)
+    body = (f"<div class='table'><div class='side'><h3>🔵 閒家 ({p_val})</h3>{hand(p_cards, 0)}</div>"
+            f"<div class='side'><h3>🔴 莊家 ({b_val})</h3>{hand(b_cards, len(p_cards))}</div></div>"
+            + _banner(banner, kind, n * step_ms + 300))
+    return _doc(css, body), 230
+
+
+def roulette(num, banner, kind, spin_ms=2000):
+    """輪盤：轉動 spin_ms 後顯示開出號碼"""
+    color = "#D40000" if num in RED_NUMS else ("#008000" if num == 0 else "#111")
+    css = f"""
+.wheel {{ width: 160px; height: 160px; border-radius: 50%; border: 10px dashed #FFD700; margin: 10px auto; background: radial-gradient(circle, #000 40%, #0d2b12 100%); animation: spin {spin_ms}ms cubic-bezier(0.25, 0.1, 0.25, 1) forwards; }}
+@keyframes spin {{ from {{ transform: rotate(0deg); }} to {{ transform: rotate(3600deg); }} }}
+.num {{ text-align: center; font-size: 4em; font-weight: bold; color: {color}; opacity: 0; animation-delay: {spin_ms}ms; }}
+.stage {{ position: relative; height: 190px; }}
+.stage > * {{ position: absolute; left: 0; right: 0; }}
+"""
+    body = (f"<div class='stage'><div class='wheel' id='w'></div><div class='num show' style='top:40px'>{num}</div></div>"
+            + _banner(banner, kind, spin_ms))
+    script = f"setTimeout(() => document.getElementById('w').style.visibility = 'hidden', {spin_ms});"
+    return _doc(css, body, script), 280
+
+
+def payload(game, doc):
+    """存進 session_state 的動畫：下一次片段重跑時播放一次"""
+    html_doc, height = doc
+    return {"game": game, "html": html_doc, "height": height}
@@ -3,10 +3,27 @@ import pandas as pd
 import random
 import re
 import time
-import math
+import functools
 import threading
+from collections import deque
 from datetime import datetime, timedelta
-from supabase import create_client, Client
+from streamlit.errors import StreamlitAPIException
+from streamlit.components.v2 import component as bidi_component
+from storage import Storage, open_storage, SETTLEMENT_PY, round_trips
+from outbox import Outbox
+from airdrop import RANK_COHORTS, VIP_COHORTS, resolve_targets, run_airdrop
+from tiers import NO_LIMIT, LIMIT_LABELS, VIP_NAMES, min_tiers
+from tournament_import import import_files
+from ranking import Rankings
+from missions import MissionEngine, CRITERIA
+from settings import Settings, VERSION_KEY, new_version
+import animations
+import boards
+import engine
+from engine import montecarlo
+from engine import baccarat as bacc_engine, blackjack as bj_engine, mines as mines_engine, roulette as roulette_engine, wheel as wheel_engine
+import listview
+import theme
 
 # --- 0. 系統核心配置 ---
 st.set_page_config(
@@ -16,20 +33,44 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# --- 1. Supabase 連線初始化 ---
+# --- 1. 儲存後端初始化 (Supabase / 本機 SQLite) ---
 @st.cache_resource
 def init_connection():
     try:
-        if "supabase" in st.secrets:
-            # 使用最基礎連線方式，避免版本相容性問題
-            return create_client(st.secrets["supabase"]["url"], st.secrets["supabase"]["key"])
+        if "supabase" in st.secrets or "storage" in st.secrets:
+            # secrets 內 [storage] engine = "sqlite" 時改用單機內嵌資料庫
+            return open_storage(st.secrets)
         st.error("❌ 找不到 secrets 設定。")
         st.stop()
     except Exception as e:
         st.error(f"❌ 連線失敗: {e}")
         st.stop()
 
-supabase: Client = init_connection()
+db: Storage = init_connection()
+
+@st.cache_resource
+def init_outbox():
+    # 背景寫入佇列 (每個程序一份)，secrets 可用 [outbox] path / workers 調整
+    cfg = st.secrets["outbox"] if "outbox" in st.secrets else {}
+    return Outbox(db, path=cfg.get("path", "outbox.db"), workers=int(cfg.get("workers", 2))).start()
+
+outbox: Outbox = init_outbox()
+
+@st.cache_resource
+def init_rankings():
+    # 程序內排名索引 (啟動載入一次，之後增量更新並每 5 分鐘與資料庫對帳)
+    return Rankings(db)
+
+rankings: Rankings = init_rankings()
+
+@st.cache_resource
+def init_missions():
+    # 計數器上線前的簽到 / 勝場 / 賽事紀錄於啟動時回填一次
+    m = MissionEngine(db, outbox)
+    m.backfill()
+    return m
+
+missions_engine: MissionEngine = init_missions()
 
 # --- 2. 核心：快取與容錯讀取 ---
 
@@ -45,174 +86,158 @@ def safe_execute(query, retries=3):
                 return None
             time.sleep(0.5)
 
-@st.cache_data(ttl=60)
-def get_all_settings():
+# --- 設定快照：每個版本只解析一次，各程序每 2 秒比對一次版本號 ---
+@st.cache_data(ttl=2, show_spinner=False)
+def get_settings_version():
     try:
-        response = safe_execute(supabase.table("System_Settings").select("*"))
-        if response:
-            return {item['config_key']: item['config_value'] for item in response.data}
-        return {}
-    except: return {}
+        res = safe_execute(db.table("System_Settings").select("config_value").eq("config_key", VERSION_KEY))
+        return res.data[0]['config_value'] if res and res.data else "0"
+    except: return "0"
 
-def get_config(key, default_value):
-    settings = get_all_settings()
-    return settings.get(key, default_value)
+@st.cache_resource(max_entries=2, show_spinner=False)
+def load_settings(version):
+    # 不可變物件，所有 session 共用同一份 (cache_resource 不做序列化複製)
+    try:
+        response = safe_execute(db.table("System_Settings").select("*"))
+        raw = {item['config_key']: item['config_value'] for item in response.data} if response else {}
+    except: raw = {}
+    return Settings.parse(raw, version)
 
-def set_config(key, value):
+def get_settings() -> Settings:
+    return load_settings(get_settings_version())
+
+def set_configs(values):
+    """多個設定一次寫入並推進版本號，所有程序於下次版本比對時重新解析"""
     try:
-        safe_execute(supabase.table("System_Settings").upsert({"config_key": key, "config_value": str(value)}))
-        get_all_settings.clear()
+        rows = [{"config_key": k, "config_value": str(v)} for k, v in values.items()]
+        safe_execute(db.table("System_Settings").upsert(rows + [{"config_key": VERSION_KEY, "config_value": new_version()}]))
+        get_settings_version.clear()
     except Exception as e: print(f"Config Error: {e}")
 
+cfg: Settings = get_settings()
+
 def get_current_user_data(player_id):
     if 'user_data' not in st.session_state or st.session_state.user_data.get('pf_id') != player_id:
         try:
-            res = safe_execute(supabase.table("Members").select("pf_id, name, xp, xp_temp, role, vip_level, vip_expiry, vip_points, last_checkin, consecutive_days").eq("pf_id", player_id))
+            res = safe_execute(db.table("Members").select("pf_id, name, xp, xp_temp, role, vip_level, vip_expiry, vip_points, last_checkin, consecutive_days").eq("pf_id", player_id))
             if res and res.data: st.session_state.user_data = res.data[0]
             else: return None
         except: return None
     return st.session_state.user_data
 
 def update_user_xp(player_id, amount):
-    if 'user_data' in st.session_state:
-        st.session_state.user_data['xp'] += amount
-    threading.Thread(target=lambda: safe_execute(supabase.table("Members").update({"xp": supabase.table("Members").select("xp").eq("pf_id", player_id).execute().data[0]['xp'] + amount}).eq("pf_id", player_id))).start()
+    """增減 XP：入帳走背景佇列合併送出；扣款為原子化單次往返，餘額為負時拒絕並回傳 None"""
+    is_own = 'user_data' in st.session_state and st.session_state.user_data.get('pf_id') == player_id
+    if amount >= 0:
+        outbox.credit(player_id, xp=amount)
+        if is_own: st.session_state.user_data['xp'] += amount
+        return st.session_state.user_data['xp'] if is_own else amount
+    try:
+        bal = db.adjust_balance(player_id, xp=amount)
+        # 可能尚有此玩家的入帳在佇列中，只在有的時候等它送出 (只等此玩家的) 再確認一次
+        if bal is None and outbox.pending(player_id) and outbox.flush(timeout=2.0, pf_id=player_id): bal = db.adjust_balance(player_id, xp=amount)
+    except Exception as e:
+        # 非冪等操作，不走 safe_execute 重試以免重複扣款
+        print(f"DB Error: {e}"); return None
+    if bal is None: return None
+    if is_own: st.session_state.user_data['xp'] = bal['xp']
+    return bal['xp']
+
+def spend_vip_points(player_id, amount):
+    """扣 VIP 點數 (原子化單次往返)：餘額不足或資料庫錯誤回傳 None；非冪等，不重試"""
+    try: bal = db.adjust_balance(player_id, vip_points=-int(amount))
+    except Exception as e: print(f"DB Error: {e}"); return None
+    if bal is None: return None
+    if 'user_data' in st.session_state and st.session_state.user_data.get('pf_id') == player_id:
+        st.session_state.user_data['vip_points'] = bal['vip_points']
+    return bal['vip_points']
 
 def log_game_transaction(player_id, game, action, amount):
-    threading.Thread(target=lambda: safe_execute(supabase.table("Game_Transactions").insert({"player_id": player_id, "game_type": game, "action_type": action, "amount": amount, "timestamp": datetime.now().isoformat()}))).start()
+    outbox.insert("Game_Transactions", {"player_id": player_id, "game_type": game, "action_type": action, "amount": amount, "timestamp": datetime.now().isoformat()})
 
 # --- 3. UI 初始化 (完整保留 13 個參數回傳) ---
-def init_flagship_ui():
-    m_spd = get_config('marquee_speed', "35")
-    m_bg = get_config('welcome_bg_url', "https://img.freepik.com/free-photo/poker-table-dark-atmosphere_23-2151003784.jpg")
-    m_title = get_config('welcome_title', "PRO POKER")
-    m_subtitle = get_config('welcome_subtitle', "撲 洛 傳 奇 殿 堂")
+@st.cache_resource(ttl=3600, show_spinner=False)
+def local_image(url):
+    # 遠端圖片只下載一次；失敗時回傳原網址，一小時後再重試
+    return theme.local_image(url)
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def theme_href(version, m_spd, m_bg):
+    """每個設定版本編譯一次樣式表 (內容雜湊檔名)，所有 session 共用"""
+    try: return theme.compile_css(m_spd, local_image(m_bg))
+    except Exception as e: print(f"Theme Error: {e}"); return ""
+
+@st.cache_data(ttl=30, show_spinner=False)
+def auto_marquee(version, th_xp, default):
+    """自動跑馬燈：最近 20 筆獎項中的第一個大獎 (所有 session 共用，30 秒更新一次)"""
+    try:
+        res = safe_execute(db.table("Prizes").select("prize_name, source, player_id").order("id", desc=True).limit(20))
+        if res and res.data:
+            for row in res.data:
+                p_name = row['prize_name']
+                is_big_win = False
+                xp_match = re.search(r'(\d+)\s*XP', str(p_name), re.IGNORECASE)
+                if xp_match and int(xp_match.group(1)) >= th_xp: is_big_win = True
+                if "大獎" in str(p_name) or "iPhone" in str(p_name): is_big_win = True
+
+                if is_big_win:
+                    try:
+                        mem_res = safe_execute(db.table("Members").select("name").eq("pf_id", row['player_id']))
+                        p_real_name = mem_res.data[0]['name'] if mem_res and mem_res.data else row['player_id']
+                    except: p_real_name = row['player_id']
+                    
+                    return f"🎉 恭喜玩家 【{p_real_name}】 在 {row['source']} 中獲得大獎：{p_name}！ 🔥"
+    except: pass
+    return default
+
+def init_flagship_ui(cfg):
+    m_spd = cfg.get('marquee_speed', "35")
+    m_bg = cfg.get('welcome_bg_url', "https://img.freepik.com/free-photo/poker-table-dark-atmosphere_23-2151003784.jpg")
+    m_title = cfg.get('welcome_title', "PRO POKER")
+    m_subtitle = cfg.get('welcome_subtitle', "撲 洛 傳 奇 殿 堂")
     
-    lb_title_1 = get_config('leaderboard_title_1', "🎖️ 菁英總榜")
-    lb_title_2 = get_config('leaderboard_title_2', "🔥 月度戰神")
+    lb_title_1 = cfg.get('leaderboard_title_1', "🎖️ 菁英總榜")
+    lb_title_2 = cfg.get('leaderboard_title_2', "🔥 月度戰神")
 
-    m_desc1 = get_config('lobby_desc_1', "♠️ 頂級賽事體驗")
-    m_desc2 = get_config('lobby_desc_2', "♥ 公平公正競技")
-    m_desc3 = get_config('lobby_desc_3', "♦ 專屬尊榮服務")
+    m_desc1 = cfg.get('lobby_desc_1', "♠️ 頂級賽事體驗")
+    m_desc2 = cfg.get('lobby_desc_2', "♥ 公平公正競技")
+    m_desc3 = cfg.get('lobby_desc_3', "♦ 專屬尊榮服務")
 
-    m_mode = get_config('marquee_mode', "custom")
-    m_txt = get_config('marquee_text', "撲洛王國營運中，歡迎回歸領地！")
+    m_mode = cfg.get('marquee_mode', "custom")
+    m_txt = cfg.get('marquee_text', "撲洛王國營運中，歡迎回歸領地！")
     
-    ci_min = int(get_config('checkin_min', "10"))
-    ci_max = int(get_config('checkin_max', "500"))
+    ci_min, ci_max = cfg.checkin_min, cfg.checkin_max
 
-    if m_mode == 'auto':
-        try:
-            th_xp = int(get_config('marquee_th_xp', "5000"))
-            res = safe_execute(supabase.table("Prizes").select("prize_name, source, player_id").order("id", desc=True).limit(20))
-            if res and res.data:
-                for row in res.data:
-                    p_name = row['prize_name']
-                    is_big_win = False
-                    xp_match = re.search(r'(\d+)\s*XP', str(p_name), re.IGNORECASE)
-                    if xp_match and int(xp_match.group(1)) >= th_xp: is_big_win = True
-                    if "大獎" in str(p_name) or "iPhone" in str(p_name): is_big_win = True
-
-                    if is_big_win:
-                        try:
-                            mem_res = safe_execute(supabase.table("Members").select("name").eq("pf_id", row['player_id']))
-                            p_real_name = mem_res.data[0]['name'] if mem_res and mem_res.data else row['player_id']
-                        except: p_real_name = row['player_id']
-                        
-                        m_txt = f"🎉 恭喜玩家 【{p_real_name}】 在 {row['source']} 中獲得大獎：{p_name}！ 🔥"
-                        break
-        except: pass
+    if m_mode == 'auto': m_txt = auto_marquee(cfg.version, cfg.marquee_th_xp, m_txt)
 
+    # 樣式表每個設定版本編譯一次，每次執行只送出 <link>
     st.markdown(f"""
-        <style>
-            :root {{ color-scheme: dark; }}
-            html, body, .stApp {{ background-color: #000000 !important; color: #FFFFFF !important; font-family: 'Arial', sans-serif; }}
-            .stTextInput input, .stNumberInput input, .stSelectbox div, .stTextArea textarea {{ background-color: #1a1a1a !important; color: #FFFFFF !important; border: 1px solid #444 !important; border-radius: 8px !important; }}
-            .stButton > button {{ background: linear-gradient(180deg, #333 0%, #111 100%) !important; color: #FFD700 !important; border: 1px solid #FFD700 !important; border-radius: 8px !important; font-weight: bold !important; transition: 0.1s; }}
-            .stButton > button:hover {{ background: linear-gradient(180deg, #FFD700 0%, #B8860B 100%) !important; color: #000 !important; transform: scale(1.02); }}
-            .stTabs [data-baseweb="tab-list"] {{ gap: 5px; background-color: #111; padding: 10px; border-radius: 15px; border: 1px solid #333; }}
-            .stTabs [data-baseweb="tab"] {{ background-color: #222; color: #AAA; border-radius: 8px; border: none; }}
-            .stTabs [aria-selected="true"] {{ background-color: #FFD700 !important; color: #000 !important; font-weight: bold; }}
-            
-            .welcome-wall {{ text-align: center; padding: 60px 20px; background: linear-gradient(rgba(0,0,0,0.8), rgba(0,0,0,0.9)), url('{m_bg}'); background-size: cover; border-radius: 20px; border: 2px solid #FFD700; margin-bottom: 20px; }}
-            .rank-card {{ background: linear-gradient(135deg, #1a1a1a 0%, #000 100%); border: 2px solid #FFD700; border-radius: 20px; padding: 25px; text-align: center; box-shadow: 0 0 20px rgba(255, 215, 0, 0.3); height: 100%; display: flex; flex-direction: column; justify-content: space-between; }}
-            .vip-card {{ background: linear-gradient(135deg, #000 0%, #222 100%); border: 2px solid #9B30FF; border-radius: 20px; padding: 25px; text-align: center; box-shadow: 0 0 20px rgba(155, 48, 255, 0.3); height: 100%; display: flex; flex-direction: column; justify-content: space-between; }}
-            .lb-rank-card {{ padding: 15px; border-radius: 15px; margin-bottom: 10px; display: flex; align-items: center; justify-content: space-between; box-shadow: 0 4px 10px rgba(0,0,0,0.5); border: 2px solid #FFF; }}
-            .lb-rank-1 {{ background: linear-gradient(45deg, #FFD700, #FDB931); color: #000; box-shadow: 0 0 20px rgba(255,215,0,0.6); transform: scale(1.02); }}
-            .lb-rank-2 {{ background: linear-gradient(45deg, #E0E0E0, #B0B0B0); color: #000; box-shadow: 0 0 15px rgba(224,224,224,0.4); }}
-            .lb-rank-3 {{ background: linear-gradient(45deg, #CD7F32, #A0522D); color: #FFF; box-shadow: 0 0 10px rgba(205,127,50,0.4); }}
-            .lb-rank-norm {{ background: rgba(30,30,30,0.8); border: 1px solid #444; color: #EEE; }}
-            
-            .glory-title {{ color: #FFD700; font-size: 2.2em; font-weight: bold; text-align: center; margin-bottom: 20px; border-bottom: 4px solid #FFD700; padding-bottom: 10px; text-shadow: 0 0 10px rgba(255,215,0,0.5); }}
-            .mall-card {{ background: #151515; border: 1px solid #333; border-radius: 12px; padding: 15px; text-align: center; height: 100%; display:flex; flex-direction:column; justify-content:space-between; }}
-            .mall-card:hover {{ border-color: #FFD700; transform: translateY(-5px); }}
-            .mall-price {{ color: #00FF00; font-weight: bold; font-size: 1.2em; }}
-            
-            .lobby-card {{ background: linear-gradient(145deg, #222, #111); border: 1px solid #444; border-radius: 15px; padding: 20px; text-align: center; cursor: pointer; transition: 0.2s; box-shadow: 0 4px 6px rgba(0,0,0,0.3); }}
-            .lobby-card:hover {{ border-color: #FFD700; transform: scale(1.02); box-shadow: 0 0 15px rgba(255, 215, 0, 0.2); }}
-            .lobby-icon {{ font-size: 3em; margin-bottom: 10px; }}
-            
-            .bacc-zone {{ border: 2px solid; border-radius: 10px; padding: 10px; margin: 5px; min-height: 120px; background-color: rgba(0,0,0,0.3); display:flex; flex-direction:column; align-items:center; justify-content:center; cursor:pointer; transition:0.2s; }}
-            .bacc-player {{ border-color: #00BFFF; }} .bacc-banker {{ border-color: #FF4444; }} .bacc-tie {{ border-color: #00FF00; }}
-            .bacc-card {{ background-color: #FFF; color: #000; border-radius: 5px; width: 40px; height: 60px; display: inline-flex; align-items: center; justify-content: center; font-weight: bold; font-size: 1.1em; margin: 2px; }}
-            .bacc-card.red {{ color: #D40000; }} .bacc-card.black {{ color: #000000; }}
-            
-            .bj-table {{ background-color: #35654d; padding: 30px; border-radius: 20px; border: 8px solid #5c3a21; box-shadow: inset 0 0 50px rgba(0,0,0,0.8); text-align: center; margin-bottom: 20px; }}
-            .bj-card {{ background-color: #FFFFFF; color: #000000; border-radius: 6px; display: inline-block; width: 60px; height: 85px; margin: 5px; padding: 5px; font-family: 'Arial', sans-serif; font-weight: bold; font-size: 1.2em; box-shadow: 2px 2px 5px rgba(0,0,0,0.5); vertical-align: middle; line-height: 1.1; }}
-            .suit-red {{ color: #D40000 !important; }} .suit-black {{ color: #000000 !important; }}
-            
-            .roulette-history-bar {{ display: flex; gap: 5px; overflow-x: auto; padding: 10px; background: #000; border-radius: 8px; margin-bottom: 10px; border: 1px solid #333; }}
-            .hist-ball {{ min-width: 35px; height: 35px; border-radius: 50%; display: flex; align-items: center; justify-content: center; font-weight: bold; border: 2px solid #fff; margin-right: 5px; }}
-            .roulette-wheel-anim {{ width: 200px; height: 200px; border-radius: 50%; border: 10px dashed #FFD700; margin: 20px auto; animation: spin-ball 2s cubic-bezier(0.25, 0.1, 0.25, 1); background: radial-gradient(circle, #000 40%, #0d2b12 100%); display: flex; align-items: center; justify-content: center; font-size: 3em; color: #FFF; font-weight: bold; }}
-            @keyframes spin-ball {{ 0% {{ transform: rotate(0deg); }} 100% {{ transform: rotate(3600deg); }} }}
-            
-            .lm-grid {{ display: grid; grid-template-columns: repeat(5, 1fr); gap: 10px; padding: 20px; background: #000; border: 4px solid #FFD700; border-radius: 20px; }}
-            .lm-cell {{ background: #222; border: 2px solid #444; border-radius: 10px; padding: 10px; text-align: center; color: #FFF; transition: 0.1s; height: 100px; display: flex; flex-direction: column; justify-content: center; align-items: center; }}
-            .lm-active {{ background: #FFF; border-color: #FFD700; color: #000; box-shadow: 0 0 20px #FFD700; transform: scale(1.1); font-weight: bold; }}
-            .lm-img {{ width: 50px; height: 50px; object-fit: contain; margin-bottom: 5px; }}
-            
-            .marquee-container {{ background: #1a1a1a; color: #FFD700; padding: 12px 0; overflow: hidden; white-space: nowrap; border-top: 2px solid #FFD700; border-bottom: 2px solid #FFD700; margin-bottom: 25px; }}
-            .marquee-text {{ display: inline-block; padding-left: 100%; animation: marquee {m_spd}s linear infinite; font-size: 1.5em; font-weight: bold; }}
-            @keyframes marquee {{ 0% {{ transform: translate(0, 0); }} 100% {{ transform: translate(-100%, 0); }} }}
-            
-            .mission-card {{ background: linear-gradient(90deg, #222 0%, #111 100%); border-left: 5px solid #FFD700; padding: 15px; margin-bottom: 10px; border-radius: 5px; display: flex; justify-content: space-between; align-items: center; }}
-            .mission-title {{ font-size: 1.2em; font-weight: bold; color: #FFF; }}
-            .mission-reward {{ color: #00FF00; font-weight: bold; border: 1px solid #00FF00; padding: 5px 10px; border-radius: 15px; }}
-            
-            .mine-btn {{ width: 100%; aspect-ratio: 1; border-radius: 8px; border: 2px solid #444; background: #222; font-size: 1.5em; cursor: pointer; display: flex; align-items: center; justify-content: center; transition: 0.1s; }}
-            .mine-btn:active {{ transform: scale(0.95); background: #444; }}
-            .mine-boom {{ background: #500; border-color: #F00; animation: shake 0.5s; }}
-            .mine-safe {{ background: #050; border-color: #0F0; }}
-            @keyframes shake {{ 0% {{ transform: translate(1px, 1px) rotate(0deg); }} 10% {{ transform: translate(-1px, -2px) rotate(-1deg); }} 20% {{ transform: translate(-3px, 0px) rotate(1deg); }} 30% {{ transform: translate(3px, 2px) rotate(0deg); }} 40% {{ transform: translate(1px, -1px) rotate(1deg); }} 50% {{ transform: translate(-1px, 2px) rotate(-1deg); }} 60% {{ transform: translate(-3px, 1px) rotate(0deg); }} 70% {{ transform: translate(3px, 1px) rotate(-1deg); }} 80% {{ transform: translate(-1px, -1px) rotate(1deg); }} 90% {{ transform: translate(1px, 2px) rotate(0deg); }} 100% {{ transform: translate(1px, -2px) rotate(-1deg); }} }}
-            
-            .bead-plate {{ display: grid; grid-template-columns: repeat(10, 1fr); gap: 5px; width: 100%; padding: 10px; background: #FFF; border: 2px solid #999; overflow-x: auto; margin-bottom: 15px; border-radius: 8px; }}
-            .bead {{ width: 35px; height: 35px; border-radius: 50%; display: flex; align-items: center; justify-content: center; font-size: 14px; font-weight: 900; margin: auto; color: white; box-shadow: inset -2px -2px 5px rgba(0,0,0,0.3); border: 1px solid rgba(0,0,0,0.2); }}
-            .bead-P {{ background: radial-gradient(circle at 10px 10px, #5555FF, #0000AA); }}
-            .bead-B {{ background: radial-gradient(circle at 10px 10px, #FF5555, #AA0000); }}
-            .bead-T {{ background: radial-gradient(circle at 10px 10px, #55FF55, #008000); color: black; }}
-        </style>
+        <link rel="stylesheet" href="{theme_href(cfg.version, m_spd, m_bg)}">
         <div class="marquee-container"><div class="marquee-text">{m_txt}</div></div>
     """, unsafe_allow_html=True)
     # [FIXED] 回傳所有 13 個變數，解決 ValueError
     return m_bg, m_title, m_subtitle, m_desc1, m_desc2, m_desc3, lb_title_1, lb_title_2, m_txt, m_spd, m_mode, ci_min, ci_max
 
-def get_rank_v2500(pts):
-    limit_c = int(get_config('rank_limit_challenger', "1000"))
-    limit_m = int(get_config('rank_limit_master', "500"))
-    limit_d = int(get_config('rank_limit_diamond', "200"))
-    limit_p = int(get_config('rank_limit_platinum', "80"))
-    if pts >= limit_c: return "🏆 菁英"
-    elif pts >= limit_m: return "🎖️ 大師"
-    elif pts >= limit_d: return "💎 鑽石"
-    elif pts >= limit_p: return "⬜ 白金"
-    else: return "🥈 白銀"
-
-def rank_to_level(rank_str):
-    if "菁英" in rank_str: return 5
-    if "大師" in rank_str: return 4
-    if "鑽石" in rank_str: return 3
-    if "白金" in rank_str: return 2
-    return 1
+# --- 榜單服務：名稱以 JOIN 一次取回，積分異動時清除快取 ---
+@st.cache_data(ttl=300, show_spinner=False)
+def get_leaderboards(limit=20):
+    try: return {b: db.leaderboard(b, limit) for b in ("hero", "monthly")}
+    except Exception as e: print(f"DB Error: {e}"); return {"hero": [], "monthly": []}
+
+def get_board_position(board, player_id):
+    """名次 / 百分位 / 前後名皆由排名索引回答，不查資料庫"""
+    idx = rankings.get(board)
+    pos = idx.position(player_id)
+    if pos is None: return None
+    above, below = idx.neighbors(player_id)
+    return {"points": idx.points(player_id), "position": pos, "total": len(idx), "percentile": idx.percentile(player_id), "above": above, "below": below}
+
+def invalidate_points(reload_rankings=False):
+    """導入、上帝之手、結算等積分異動後呼叫 (無法增量套用的異動才整份重新載入排名索引)"""
+    get_leaderboards.clear()
+    if reload_rankings:
+        try: rankings.reload()
+        except Exception as e: print(f"Ranking reload error: {e}")
 
 def validate_nickname(nickname):
     if not nickname or not nickname.strip(): return False, "暱稱不可為空"
@@ -223,51 +248,6 @@ def validate_nickname(nickname):
         if len(nickname) > 6: return False, "中文暱稱不可超過 6 個字"
     return True, "OK"
 
-def get_vip_bonus(level):
-    return float(get_config(f'vip_bonus_{level}', "0"))
-
-def get_vip_discount(level):
-    return float(get_config(f'vip_discount_{level}', "0"))
-
-def check_mission_status(player_id, m_type, criteria, target_val, mission_id):
-    now = datetime.now()
-    try:
-        m_res = safe_execute(supabase.table("Missions").select("*").eq("id", mission_id))
-        if not m_res.data: return False, False, 0
-        m_row = m_res.data[0]
-        
-        start_time = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        if m_type == "Weekly": start_time = now - timedelta(days=now.weekday())
-        elif m_type == "Monthly": start_time = now.replace(day=1)
-        elif m_type == "Season": start_time = datetime(2020, 1, 1) 
-        
-        claimed = False
-        log_res = safe_execute(supabase.table("Mission_Logs").select("claim_time").eq("player_id", player_id).eq("mission_id", mission_id).order("claim_time", desc=True).limit(1))
-        if log_res and log_res.data:
-            last_claim_str = log_res.data[0]['claim_time']
-            last_claim = datetime.fromisoformat(last_claim_str.replace('Z', '+00:00')).replace(tzinfo=None)
-            if last_claim >= start_time: claimed = True
-
-        current_val = 0
-        met = False
-        
-        if criteria == "daily_checkin":
-            mem = safe_execute(supabase.table("Members").select("last_checkin").eq("pf_id", player_id))
-            if mem and mem.data and mem.data[0]['last_checkin']:
-                if mem.data[0]['last_checkin'].startswith(now.strftime("%Y-%m-%d")): met = True; current_val = 1
-        elif criteria == "consecutive_checkin":
-            mem = safe_execute(supabase.table("Members").select("consecutive_days").eq("pf_id", player_id))
-            if mem and mem.data:
-                cons = mem.data[0]['consecutive_days'] or 0
-                current_val = cons; met = cons >= target_val
-        elif criteria == "daily_win":
-            res = safe_execute(supabase.table("Prizes").select("id", count="exact").eq("player_id", player_id).ilike("source", "GameWin%").gte("time", now.strftime("%Y-%m-%d 00:00:00")))
-            cnt = res.count if res else 0
-            current_val = min(cnt, target_val); met = cnt >= target_val
-
-        return met, claimed, current_val
-    except: return False, False, 0
-
 # --- 4. 登入與側邊欄 ---
 if "player_id" not in st.session_state:
     st.session_state.player_id = None
@@ -287,11 +267,11 @@ with st.sidebar:
     u_chk = None
     if p_id_input:
         try:
-            res = safe_execute(supabase.table("Members").select("role, password, ban_until").eq("pf_id", p_id_input))
+            res = safe_execute(db.table("Members").select("role, password, ban_until").eq("pf_id", p_id_input))
             if res and res.data: u_chk = res.data[0]
         except: pass
             
-    invite_cfg = get_config('reg_invite_code', "888")
+    invite_cfg = cfg.get('reg_invite_code', "888")
     
     if p_id_input and u_chk:
         ban_msg = ""
@@ -316,12 +296,12 @@ with st.sidebar:
             if st.form_submit_button("物理註冊") and ri == invite_cfg:
                 if rn:
                     try:
-                        exist = supabase.table("Members").select("*").eq("pf_id", p_id_input).execute()
+                        exist = db.table("Members").select("*").eq("pf_id", p_id_input).execute()
                         if exist.data and (not exist.data[0]['password']):
-                             supabase.table("Members").update({"name": rn, "password": rpw, "role": "玩家", "join_date": datetime.now().strftime("%Y-%m-%d")}).eq("pf_id", p_id_input).execute()
+                             db.table("Members").update({"name": rn, "password": rpw, "role": "玩家", "join_date": datetime.now().strftime("%Y-%m-%d")}).eq("pf_id", p_id_input).execute()
                              st.success("✅ 帳號認領成功！")
                         else:
-                             supabase.table("Members").insert({"pf_id": p_id_input, "name": rn, "role": "玩家", "xp": 0, "password": rpw, "join_date": datetime.now().strftime("%Y-%m-%d")}).execute()
+                             db.table("Members").insert({"pf_id": p_id_input, "name": rn, "role": "玩家", "xp": 0, "password": rpw, "join_date": datetime.now().strftime("%Y-%m-%d")}).execute()
                              st.success("✅ 註冊成功！")
                     except: st.error("❌ 該 ID 已被註冊或系統繁忙。")
                 else: st.error("請輸入暱稱")
@@ -334,28 +314,175 @@ with st.sidebar:
             st.rerun()
 
 # [修復] 這裡解包 13 個變數，解決 ValueError
-m_bg, m_title, m_subtitle, m_desc1, m_desc2, m_desc3, lb_title_1, lb_title_2, m_txt, m_spd, m_mode, ci_min, ci_max = init_flagship_ui()
+m_bg, m_title, m_subtitle, m_desc1, m_desc2, m_desc3, lb_title_1, lb_title_2, m_txt, m_spd, m_mode, ci_min, ci_max = init_flagship_ui(cfg)
 
 if not st.session_state.player_id: st.stop()
 
+# --- 片段：每個分頁可獨立重跑 ---
+# 資料載入約定：片段只透過快取讀取器 (get_leaderboards / missions_engine / rankings ...) 載入自己需要的資料，
+# 整頁共用的玩家資料 (u_row / h_pts / player_tier / vip_lvl) 在整頁執行時算好，片段內只讀。
+@st.cache_resource
+def slow_sections():
+    # 超出載入預算的區塊紀錄 (每個程序保留最近 50 筆)
+    return deque(maxlen=50)
+
+def kingdom_fragment(name):
+    """st.fragment 外包一層：累計每個片段的執行次數、後端往返次數與 CPU 時間，超出載入預算時記錄"""
+    def deco(fn):
+        @functools.wraps(fn)
+        def run():
+            n0, c0, w0 = round_trips(), time.thread_time(), time.perf_counter()
+            try: return fn()
+            finally:
+                s = st.session_state.setdefault("fragment_stats", {}).setdefault(name, {"runs": 0, "db": 0, "cpu_ms": 0.0})
+                s["runs"] += 1; s["db"] += round_trips() - n0; s["cpu_ms"] += (time.thread_time() - c0) * 1000
+                ms = (time.perf_counter() - w0) * 1000
+                if ms > cfg.section_budget_ms:
+                    print(f"Section Budget: {name} {ms:.0f}ms > {cfg.section_budget_ms}ms ({round_trips() - n0} 次往返)")
+                    slow_sections().append({"區塊": name, "ms": round(ms, 1), "往返": round_trips() - n0, "玩家": st.session_state.get('player_id'), "時間": datetime.now().strftime("%H:%M:%S")})
+        return st.fragment(run)
+    return deco
+
+def section_nav(key, sections, summaries):
+    """只載入並渲染選取的區塊；其他區塊以快取摘要顯示在選項上"""
+    st.session_state.setdefault(f"{key}_last", next(iter(sections)))
+    pick = st.segmented_control("區塊", list(sections), key=key, default=st.session_state[f"{key}_last"], label_visibility="collapsed",
+                                format_func=lambda k: f"{sections[k][0]} {summaries.get(k, '')}".strip())
+    if pick: st.session_state[f"{key}_last"] = pick
+    return st.session_state[f"{key}_last"]
+
+def rerun_fragment():
+    """遊戲內互動只重跑所在片段；整頁執行中 (例如剛進入頁面) 不能指定片段範圍時改為整頁重跑"""
+    try: st.rerun(scope="fragment")
+    except StreamlitAPIException: st.rerun()
+
+# 下注盤元件：同名同內容重複註冊不會覆寫，每次執行宣告即可
+roulette_board = bidi_component("kingdom_roulette_board", **boards.ROULETTE)
+baccarat_board = bidi_component("kingdom_baccarat_board", **boards.BACCARAT)
+mines_board = bidi_component("kingdom_mines_board", **boards.MINES)
+# 清單元件：任務 / 商城 / 背包 / 榜單整張清單一次送出
+list_view = bidi_component("kingdom_list_view", **listview.LIST)
+
+@st.cache_resource
+def game_rng():
+    """遊戲共用亂數 (engine 規則只吃傳入的 rng)"""
+    return engine.rng()
+
+BJ_LABELS = {"hit": "🔥 要牌", "stand": "✋ 停牌", "double": "⏫ 加倍", "split": "✂️ 分牌", "surrender": "🏳️ 投降"}
+
+@st.cache_resource
+def baccarat_lock():
+    """同一程序內的發牌先排隊，跨程序 (多台 / 多 worker) 由寫回時的條件更新把關"""
+    return threading.Lock()
+
+def baccarat_deal(bets, rtp, retries=5):
+    """從資料庫的共用牌靴發一局；牌靴、本靴局數與牌路一次寫回 (換新牌靴時牌路重來)
+
+    寫回條件為讀到的 hand_count / shoe 未變 (compare-and-swap)，被其他程序搶先就重讀重發；
+    讀寫失敗或一直衝突時回傳 None，由呼叫端退回注金。
+    """
+    with baccarat_lock():
+        for _ in range(retries):
+            got = safe_execute(db.table("Baccarat_Global").select("*").eq("id", 1))
+            if got is None or not got.data: return None
+            row = got.data[0]
+            shoe = bacc_engine.Shoe.decode(row.get('shoe'))
+            r = bacc_engine.deal(game_rng(), shoe, bets, rtp)
+            hist = [] if r.shuffled else [h for h in (row.get('history_string') or "").split(',') if h]
+            hist = (hist + [f"{r.winner}{r.p_val if r.winner == 'P' else r.b_val}"])[-60:]
+            saved = safe_execute(db.table("Baccarat_Global").update({"hand_count": shoe.hands, "history_string": ",".join(hist), "shoe": shoe.encode()})
+                                 .eq("id", 1).eq("hand_count", row.get('hand_count') or 0).eq("shoe", row.get('shoe') or ""))
+            if saved is None: return None
+            if saved.data: return r
+    return None
+
+@st.cache_resource
+def mines_games():
+    """掃雷盤面登記 {玩家: MinesState}：程序內快取，資料庫 Mines_Games 為準 (重新整理 / 換分頁 / 換機器都接回同一盤)"""
+    return {}
+
+def mines_current(player_id):
+    """目前盤面；本程序沒有時從資料庫讀回 (沒有進行中的盤面為 None)"""
+    games = mines_games()
+    if player_id not in games:
+        got = safe_execute(db.table("Mines_Games").select("*").eq("player_id", player_id))
+        if got is None: return None
+        games[player_id] = mines_engine.from_row(got.data[0]) if got.data else None
+    return games[player_id]
+
+def mines_commit(player_id, g, shown):
+    """盤面寫回，條件為資料庫仍是翻開 shown 時的狀態 (compare-and-swap)；結算領錢則刪除該盤
+    被其他分頁 / 程序搶先或寫入失敗時丟掉本機快取並回傳 False，本次操作不算"""
+    q = db.table("Mines_Games")
+    q = q.delete() if not g.active and not g.over else q.update(mines_engine.to_row(g))
+    saved = safe_execute(q.eq("player_id", player_id).eq("status", "active").eq("shown", shown))
+    if saved is not None and saved.data:
+        mines_games()[player_id] = None if not g.active and not g.over else g
+        return True
+    mines_games().pop(player_id, None)
+    return False
+
+@st.cache_data(ttl=600, show_spinner="模擬中…")
+def rtp_report(rtp, n_rounds, seed, wheel_items, wheel_cost):
+    """後台 RTP 報告：同一組設定 / 局數 / 種子 10 分鐘內重看不重跑"""
+    rows = montecarlo.report(dict(rtp), n_rounds, seed, wheel_items=wheel_items, wheel_cost=wheel_cost)
+    return pd.DataFrame(rows)[list(montecarlo.COLUMNS)].rename(columns=montecarlo.COLUMNS)
+
+@st.cache_resource
+def roulette_table():
+    """派彩矩陣換成下注盤格式 (固定不變，只算一次)"""
+    return roulette_engine.table()
+
+def play_animation(game):
+    """播放上一次互動排入的動畫 (只播一次)；伺服器不等待動畫，回傳是否有播放"""
+    anim = st.session_state.get("game_anim")
+    if not anim or anim["game"] != game: return False
+    del st.session_state["game_anim"]
+    st.iframe(anim["html"], height=anim["height"])
+    return True
+
 # --- 5. 主程式 ---
 user_role = st.session_state.access_level
 u_row = get_current_user_data(st.session_state.player_id)
-t_p = st.tabs(["🪪 排位/VIP", "🎯 任務", "🎮 遊戲大廳", "🛒 商城", "🎒 背包", "🏆 榜單"])
-
-nick_cost = int(get_config('nickname_cost', "500"))
+nick_cost = cfg.nickname_cost
 
-with t_p[0]: # 排位卡
+# 整頁執行時載入一次的玩家共用資料 (片段重跑時沿用，片段內只讀不寫)
+try:
+    h_res = safe_execute(db.table("Leaderboard").select("hero_points").eq("player_id", st.session_state.player_id))
+    h_pts = h_res.data[0]['hero_points'] if h_res and h_res.data else 0
+    m_res = safe_execute(db.table("Monthly_God").select("monthly_points").eq("player_id", st.session_state.player_id))
+    m_pts = m_res.data[0]['monthly_points'] if m_res and m_res.data else 0
+except: h_pts=0; m_pts=0
+
+player_tier = cfg.tiers.tier(h_pts)
+player_rank_title = cfg.rank_title(h_pts)
+vip_lvl = int(u_row.get('vip_level', 0) or 0)
+
+@st.cache_data(ttl=60, show_spinner=False)
+def player_counts(player_id):
+    """未開啟區塊的摘要 (計數查詢，不取資料列)"""
+    out = {}
+    try: out["mall"] = safe_execute(db.table("Inventory").select("id", count="exact").gt("stock", 0).in_("target_market", ["Mall", "Both"]).limit(1)).count
+    except: pass
+    try: out["backpack"] = safe_execute(db.table("Prizes").select("id", count="exact").eq("player_id", player_id).eq("status", "待兌換").limit(1)).count
+    except: pass
+    return out
+
+def player_summaries(player_id):
+    counts = player_counts(player_id)
+    out = {"rank": f"· {player_rank_title}", "games": f"· {u_row['xp']:,} XP"}
+    if counts.get("mall"): out["mall"] = f"· {counts['mall']}"
+    if counts.get("backpack"): out["backpack"] = f"· {counts['backpack']}"
     try:
-        h_res = safe_execute(supabase.table("Leaderboard").select("hero_points").eq("player_id", st.session_state.player_id))
-        h_pts = h_res.data[0]['hero_points'] if h_res and h_res.data else 0
-        m_res = safe_execute(supabase.table("Monthly_God").select("monthly_points").eq("player_id", st.session_state.player_id))
-        m_pts = m_res.data[0]['monthly_points'] if m_res and m_res.data else 0
-    except: h_pts=0; m_pts=0
-    
-    player_rank_title = get_rank_v2500(h_pts)
-    vip_lvl = int(u_row.get('vip_level', 0) or 0)
-    
+        ready = sum(1 for met, claimed, _ in missions_engine.evaluate(player_id).values() if met and not claimed)
+        if ready: out["missions"] = f"· {ready} 可領"
+    except Exception as e: print(f"Mission Error: {e}")
+    pos = rankings.get("hero").position(player_id)
+    if pos: out["boards"] = f"· #{pos:,}"
+    return out
+
+@kingdom_fragment("tab_rank_card")
+def tab_rank_card(): # 排位卡
     c1, c2 = st.columns(2)
     with c1:
         if 'vip_card_flipped' not in st.session_state: st.session_state.vip_card_flipped = False
@@ -364,7 +491,7 @@ with t_p[0]: # 排位卡
         if not st.session_state.vip_card_flipped:
             st.markdown(f'''<div class="vip-card"><h3>{u_row['name']}</h3><p>ID: {u_row['pf_id']}</p><h2>VIP {vip_lvl}</h2><p>VP: {u_row.get('vip_points', 0):,.0f}</p></div>''', unsafe_allow_html=True)
         else:
-            v_desc = get_config('vip_card_desc', 'VIP 點數可用於兌換專屬商品與特權。')
+            v_desc = cfg.get('vip_card_desc', 'VIP 點數可用於兌換專屬商品與特權。')
             st.markdown(f'''<div class="vip-card"><h3>VIP 權益說明</h3><p>{v_desc}</p></div>''', unsafe_allow_html=True)
 
     with c2:
@@ -372,9 +499,14 @@ with t_p[0]: # 排位卡
         if st.button("🔄 翻轉排位卡"): st.session_state.rank_card_flipped = not st.session_state.rank_card_flipped
         
         if not st.session_state.rank_card_flipped:
-            st.markdown(f'''<div class="rank-card"><h3>{player_rank_title}</h3><h1 style="color:#00FF00;">💎 {u_row['xp']:,.0f}</h1><p>積分: {h_pts}</p><p>月積分: {m_pts}</p></div>''', unsafe_allow_html=True)
+            me = get_board_position("hero", st.session_state.player_id)
+            pos_txt = f"<p>總榜名次: #{me['position']:,} / {me['total']:,} (勝過 {me['percentile']:.0f}% 玩家)</p>" if me and me['points'] else ""
+            st.markdown(f'''<div class="rank-card"><h3>{player_rank_title}</h3><h1 style="color:#00FF00;">💎 {u_row['xp']:,.0f}</h1><p>積分: {h_pts}</p><p>月積分: {m_pts}</p>{pos_txt}</div>''', unsafe_allow_html=True)
+            if me and (me['above'] or me['below']):
+                near = [f"⬆️ #{p} {n} ({pts})" for p, n, pts in me['above']] + [f"⬇️ #{p} {n} ({pts})" for p, n, pts in me['below']]
+                st.caption("　".join(near))
         else:
-            r_desc = get_config('rank_card_desc', '排位與積分規則請見遊戲大廳說明。')
+            r_desc = cfg.get('rank_card_desc', '排位與積分規則請見遊戲大廳說明。')
             st.markdown(f'''<div class="rank-card"><h3>系統說明</h3><p>{r_desc}</p></div>''', unsafe_allow_html=True)
 
     if st.button("🎰 幸運簽到"):
@@ -383,221 +515,193 @@ with t_p[0]: # 排位卡
         else:
             rand_factor = random.random() ** 3
             bonus = int(ci_min + (ci_max - ci_min) * rand_factor)
-            bonus = int(bonus * (1 + float(get_config(f'vip_bonus_{vip_lvl}', "0"))/100))
+            bonus = int(bonus * (1 + cfg.vip_bonus.get(vip_lvl, 0.0)/100))
             
             update_user_xp(st.session_state.player_id, bonus)
+            # 昨天有簽到才延續連續天數，否則從 1 重新計算
+            yesterday = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
+            streak = int(u_row.get('consecutive_days') or 0) + 1 if str(u_row.get('last_checkin', '')).startswith(yesterday) else 1
             st.session_state.user_data['last_checkin'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            st.session_state.user_data['consecutive_days'] = streak
             
-            threading.Thread(target=lambda: safe_execute(supabase.table("Members").update({"last_checkin": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}).eq("pf_id", st.session_state.player_id))).start()
-            threading.Thread(target=lambda: safe_execute(supabase.table("Prizes").insert({"player_id": st.session_state.player_id, "prize_name": f"{bonus} XP", "status": "自動入帳", "time": datetime.now().isoformat(), "source": "DailyCheckIn"}))).start()
+            outbox.update("Members", {"last_checkin": st.session_state.user_data['last_checkin'], "consecutive_days": streak}, {"pf_id": st.session_state.player_id})
+            outbox.insert("Prizes", {"player_id": st.session_state.player_id, "prize_name": f"{bonus} XP", "status": "自動入帳", "time": datetime.now().isoformat(), "source": "DailyCheckIn"})
+            missions_engine.emit(st.session_state.player_id, "checkin", streak=streak)
             
             st.success(f"✅ 簽到成功！獲得 {bonus} XP"); st.rerun()
 
     with st.expander("🔐 安全中心：修改密碼"):
         new_pw = st.text_input("輸入新密碼", type="password", key="reset_pw_box")
         if st.button("⚡ 執行鋼印替換") and new_pw:
-            supabase.table("Members").update({"password": new_pw}).eq("pf_id", st.session_state.player_id).execute()
+            db.table("Members").update({"password": new_pw}).eq("pf_id", st.session_state.player_id).execute()
             st.success("✅ 修改成功！")
     with st.expander(f"🏷️ 變更暱稱 ({nick_cost} XP)"):
         new_nick = st.text_input("新暱稱", key="nn")
         if st.button(f"變更"):
             v_res, v_msg = validate_nickname(new_nick)
-            if v_res and u_row['xp'] >= nick_cost:
-                update_user_xp(st.session_state.player_id, -nick_cost)
-                supabase.table("Members").update({"name": new_nick}).eq("pf_id", st.session_state.player_id).execute()
+            if v_res and update_user_xp(st.session_state.player_id, -nick_cost) is not None:
+                db.table("Members").update({"name": new_nick}).eq("pf_id", st.session_state.player_id).execute()
                 st.session_state.user_data['name'] = new_nick
                 st.success("成功"); st.rerun()
             else: st.error(v_msg if not v_res else "XP 不足")
 
-with t_p[1]: # 任務
+
+@kingdom_fragment("tab_missions")
+def tab_missions(): # 任務
     st.subheader("🎯 任務中心")
     try:
-        missions = safe_execute(supabase.table("Missions").select("*").eq("status", "Active")).data
-    except: missions = []
+        missions = missions_engine.active_missions()
+        m_status = missions_engine.evaluate(st.session_state.player_id, missions)
+    except Exception as e: print(f"Mission Error: {e}"); missions = []
     
-    if missions:
-        for m in missions:
-            is_met, is_claimed, cur_val = check_mission_status(st.session_state.player_id, m['type'], m['target_criteria'], m['target_value'], m['id'])
-            c1, c2 = st.columns([4, 1])
-            c1.markdown(f"""<div class="mission-card"><div><div class="mission-title">{m['title']}</div><div class="mission-desc">{m['description']} (進度: {cur_val}/{m['target_value']})</div></div><div class="mission-reward">+{m['reward_xp']} XP</div></div>""", unsafe_allow_html=True)
-            if is_claimed: c2.button("已領取", key=f"mc_{m['id']}", disabled=True)
-            elif is_met:
-                if c2.button("領取", key=f"m_{m['id']}"):
-                    update_user_xp(st.session_state.player_id, m['reward_xp'])
-                    safe_execute(supabase.table("Mission_Logs").insert({"player_id": st.session_state.player_id, "mission_id": m['id'], "claim_time": datetime.now().isoformat()}))
-                    st.success("已領取"); st.rerun()
-            else: c2.button("未達成", key=f"ml_{m['id']}", disabled=True)
-
-with t_p[2]: # 遊戲大廳
+    rows = []
+    for m in missions:
+        is_met, is_claimed, cur_val = m_status[m['id']]
+        btn = "已領取" if is_claimed else ("領取" if is_met else "未達成")
+        rows.append(listview.row(m['id'], f"""<div class="mission-card"><div><div class="mission-title">{listview.esc(m['title'])}</div><div class="mission-desc">{listview.esc(m['description'])} (進度: {cur_val}/{m['target_value']})</div></div><div class="mission-reward">+{m['reward_xp']} XP</div></div>""",
+                                 [("claim", btn, is_claimed or not is_met)]))
+    res = list_view(data=listview.data(rows, row_height=100, empty="目前沒有進行中的任務"), key="list_missions", on_action_change=lambda: None)
+    mid = listview.picked(res.action, "claim", rows)
+    m = next((m for m in missions if str(m['id']) == mid), None)
+    # 前端按鈕狀態不可信，以伺服器端評估結果為準
+    if m and m_status[m['id']][0] and not m_status[m['id']][1]:
+        update_user_xp(st.session_state.player_id, m['reward_xp'])
+        claim_at = datetime.now()
+        safe_execute(db.table("Mission_Logs").insert({"player_id": st.session_state.player_id, "mission_id": m['id'], "claim_time": claim_at.isoformat()}))
+        missions_engine.note_claim(st.session_state.player_id, m['id'], claim_at)
+        st.toast("已領取"); st.rerun()
+
+
+@kingdom_fragment("tab_games")
+def tab_games(): # 遊戲大廳
     st.markdown(f'<div class="xp-bar">💰 餘額: {u_row["xp"]:,} XP</div>', unsafe_allow_html=True)
     if 'current_game' not in st.session_state: st.session_state.current_game = 'lobby'
     
     if st.session_state.current_game == 'lobby':
         c1, c2, c3 = st.columns(3)
-        s_mines = get_config('status_mines', 'ON')
         with c1:
             st.markdown('<div class="lobby-card"><div class="lobby-icon">💣</div><div class="lobby-title">撲洛掃雷</div></div>', unsafe_allow_html=True)
-            if s_mines == 'ON': 
-                if st.button("進入 掃雷", use_container_width=True): st.session_state.current_game = 'mines'; st.rerun()
+            if cfg.flags['mines']: 
+                if st.button("進入 掃雷", use_container_width=True): st.session_state.current_game = 'mines'; rerun_fragment()
             else: st.button("🔧 維修中", disabled=True, use_container_width=True)
         
-        s_wheel = get_config('status_wheel', 'ON')
         with c2:
             st.markdown('<div class="lobby-card"><div class="lobby-icon">🎡</div><div class="lobby-title">撲洛幸運大轉盤</div></div>', unsafe_allow_html=True)
-            if s_wheel == 'ON':
-                if st.button("進入 轉盤", use_container_width=True): st.session_state.current_game = 'wheel'; st.rerun()
+            if cfg.flags['wheel']:
+                if st.button("進入 轉盤", use_container_width=True): st.session_state.current_game = 'wheel'; rerun_fragment()
             else: st.button("🔧 維修中", disabled=True, use_container_width=True)
             
-        s_bj = get_config('status_blackjack', 'ON')
         with c3:
             st.markdown('<div class="lobby-card"><div class="lobby-icon">♠️</div><div class="lobby-title">21點 Blackjack</div></div>', unsafe_allow_html=True)
-            if s_bj == 'ON':
-                if st.button("進入 21點", use_container_width=True): st.session_state.current_game = 'blackjack'; st.rerun()
+            if cfg.flags['blackjack']:
+                if st.button("進入 21點", use_container_width=True): st.session_state.current_game = 'blackjack'; rerun_fragment()
             else: st.button("🔧 維修中", disabled=True, use_container_width=True)
         
         st.write("")
         c4, c5 = st.columns(2)
-        s_bacc = get_config('status_baccarat', 'ON')
         with c4:
             st.markdown('<div class="lobby-card"><div class="lobby-icon">🏛️</div><div class="lobby-title">皇家百家樂</div></div>', unsafe_allow_html=True)
-            if s_bacc == 'ON':
-                if st.button("進入 百家樂", use_container_width=True): st.session_state.current_game = 'baccarat'; st.rerun()
+            if cfg.flags['baccarat']:
+                if st.button("進入 百家樂", use_container_width=True): st.session_state.current_game = 'baccarat'; rerun_fragment()
             else: st.button("🔧 維修中", disabled=True, use_container_width=True)
             
-        s_roulette = get_config('status_roulette', 'ON')
         with c5:
             st.markdown('<div class="lobby-card"><div class="lobby-icon">🔴</div><div class="lobby-title">俄羅斯輪盤</div></div>', unsafe_allow_html=True)
-            if s_roulette == 'ON':
-                 if st.button("進入 輪盤", use_container_width=True): st.session_state.current_game = 'roulette'; st.rerun()
+            if cfg.flags['roulette']:
+                 if st.button("進入 輪盤", use_container_width=True): st.session_state.current_game = 'roulette'; rerun_fragment()
             else: st.button("🔧 維修中", disabled=True, use_container_width=True)
 
     else:
-        if st.button("⬅️ 返回大廳"): st.session_state.current_game = 'lobby'; st.rerun()
+        if st.button("⬅️ 返回大廳"): st.session_state.current_game = 'lobby'; rerun_fragment()
 
         if st.session_state.current_game == 'mines':
             st.subheader("💣 撲洛掃雷")
-            if 'mines_active' not in st.session_state: st.session_state.mines_active = False
-            if 'mines_revealed' not in st.session_state or len(st.session_state.mines_revealed) != 25:
-                st.session_state.mines_revealed = [False] * 25
-                st.session_state.mines_grid = [0] * 25
-                st.session_state.mines_active = False
-            if 'mines_game_over' not in st.session_state: st.session_state.mines_game_over = False
-            
-            if not st.session_state.mines_active and not st.session_state.mines_game_over:
+            pid = st.session_state.player_id
+            g = mines_current(pid)
+
+            if g is None:
                 c1, c2 = st.columns(2)
                 bet = c1.number_input("投入 XP", 100, 10000, 100)
                 mines = c2.slider("地雷數", 1, 24, 3)
                 if st.button("🚀 開始"):
-                    if u_row['xp'] >= bet:
-                        update_user_xp(st.session_state.player_id, -bet)
-                        st.session_state.mines_active = True
-                        st.session_state.mines_game_over = False
-                        st.session_state.mines_bet = bet
-                        st.session_state.mines_revealed = [False] * 25
-                        st.session_state.mines_grid = [0]*(25-mines) + [1]*mines
-                        random.shuffle(st.session_state.mines_grid)
-                        st.rerun()
+                    if update_user_xp(pid, -bet) is not None:
+                        g = mines_engine.new_game(game_rng(), bet, mines)
+                        # 盤面先登記到伺服器再開局；已有盤面 (其他分頁) 或寫入失敗則退回注金
+                        if safe_execute(db.table("Mines_Games").insert({"player_id": pid, **mines_engine.to_row(g), "started_at": datetime.now().isoformat()}), retries=1) is not None:
+                            mines_games()[pid] = g
+                        else:
+                            mines_games().pop(pid, None)
+                            update_user_xp(pid, bet); st.session_state.mines_msg = "⚠️ 開局失敗，注金已退回"
+                        rerun_fragment()
                     else: st.error("XP 不足")
+                if st.session_state.get('mines_msg'): st.warning(st.session_state.pop('mines_msg'))
             else:
-                rev_count = sum(1 for i, r in enumerate(st.session_state.mines_revealed) if r and st.session_state.mines_grid[i] == 0)
-                mine_count = sum(st.session_state.mines_grid)
-                try: mult = 0.97 * (math.comb(25, rev_count) / math.comb(25 - mine_count, rev_count))
-                except: mult = 1.0
-                cur_win = int(st.session_state.mines_bet * mult)
+                mult = mines_engine.multiplier(g.mines, g.safe)
+                cur_win = mines_engine.cash_value(g)
                 
                 c_info, c_cash = st.columns([3, 1])
                 c_info.info(f"倍率: {mult:.2f}x | 贏取: {cur_win}")
                 
-                if st.session_state.mines_active:
+                if g.active:
                     if c_cash.button("💰 結算領錢"):
-                        update_user_xp(st.session_state.player_id, cur_win)
-                        log_game_transaction(st.session_state.player_id, 'mines', 'WIN', cur_win)
-                        st.session_state.mines_active = False
-                        st.success(f"贏得 {cur_win} XP"); time.sleep(1); st.rerun()
-
-                cols = st.columns(5)
-                for i in range(25):
-                    with cols[i%5]:
-                        if st.session_state.mines_revealed[i]:
-                            if st.session_state.mines_grid[i] == 1: 
-                                st.markdown("<div class='mine-btn mine-boom'>💥</div>", unsafe_allow_html=True)
-                            else: 
-                                st.markdown("<div class='mine-btn mine-safe'>💎</div>", unsafe_allow_html=True)
-                        elif st.session_state.mines_game_over and st.session_state.mines_grid[i] == 1:
-                             st.markdown("<div class='mine-btn'>💣</div>", unsafe_allow_html=True)
-                        else:
-                            disabled = st.session_state.mines_game_over
-                            if st.button("❓", key=f"m_{i}", disabled=disabled):
-                                st.session_state.mines_revealed[i] = True
-                                if st.session_state.mines_grid[i] == 1:
-                                    st.session_state.mines_active = False
-                                    st.session_state.mines_game_over = True
-                                    st.error("爆炸了！")
-                                st.rerun()
+                        shown = g.shown
+                        win = mines_engine.cash_out(g)
+                        # 刪除盤面成功才入帳，同一盤只領一次
+                        if mines_commit(pid, g, shown):
+                            update_user_xp(pid, win)
+                            log_game_transaction(pid, 'mines', 'WIN', win)
+                            st.toast(f"💰 贏得 {win} XP")
+                        rerun_fragment()
+
+                res = mines_board(data={"cells": mines_engine.cells(g), "locked": g.over},
+                                  key="mines_board", on_reveal_change=lambda: None)
+                if isinstance(res.reveal, int):
+                    shown = g.shown
+                    if mines_engine.reveal(g, res.reveal):
+                        if mines_commit(pid, g, shown) and g.over: st.toast("💥 爆炸了！")
+                        rerun_fragment()
                 
-                if st.session_state.mines_game_over:
+                if g.over:
                     if st.button("🔄 再來一局"): 
-                        st.session_state.mines_game_over = False
-                        st.session_state.mines_active = False
-                        st.rerun()
+                        safe_execute(db.table("Mines_Games").delete().eq("player_id", pid).eq("status", "over"))
+                        mines_games().pop(pid, None)
+                        rerun_fragment()
 
         elif st.session_state.current_game == 'wheel':
              st.subheader("🎡 撲洛幸運大轉盤")
-             wheel_cost = int(get_config('min_bet_wheel', "100"))
+             wheel_cost = cfg.min_bet_wheel
              st.info(f"消耗: {wheel_cost} XP / 次")
-             p_lvl = rank_to_level(player_rank_title)
              
              try:
-                 inv_res = safe_execute(supabase.table("Inventory").select("*").gt("stock", 0).in_("target_market", ["Wheel", "Both"]))
+                 inv_res = safe_execute(db.table("Inventory").select("*").gt("stock", 0).in_("target_market", ["Wheel", "Both"]))
                  all_items = pd.DataFrame(inv_res.data)
              except: all_items = pd.DataFrame()
              
              valid_items = []
              if not all_items.empty:
-                 for _, item in all_items.iterrows():
-                     if rank_to_level(item.get('wheel_min_rank', '無限制')) <= p_lvl: valid_items.append(item.to_dict())
-             while len(valid_items) < 8: valid_items.append({"item_name": "銘謝惠顧", "item_value": 0, "img_url": "", "weight": 50})
-             display_items = valid_items[:8]
+                 valid_items = all_items[min_tiers(all_items, "wheel") <= player_tier].to_dict("records")
+             display_items = [{**i, "img_url": local_image(i.get('img_url'))} for i in wheel_engine.slots(valid_items)]
              
-             grid_html = "<div class='lm-grid'>"
-             for idx, item in enumerate(display_items):
-                 active_cls = "lm-active" if st.session_state.get('lm_idx') == idx else ""
-                 img_tag = f"<img src='{item['img_url']}' class='lm-img'>" if item.get('img_url') else ""
-                 grid_html += f"<div class='lm-cell {active_cls}'>{img_tag}<div>{item['item_name']}</div></div>"
-             grid_html += "</div>"
-             wheel_placeholder = st.empty(); wheel_placeholder.markdown(grid_html, unsafe_allow_html=True)
+             if not play_animation("wheel"):
+                 grid_html = "<div class='lm-grid'>"
+                 for idx, item in enumerate(display_items):
+                     active_cls = "lm-active" if st.session_state.get('lm_idx') == idx else ""
+                     img_tag = f"<img src='{item['img_url']}' class='lm-img'>" if item.get('img_url') else ""
+                     grid_html += f"<div class='lm-cell {active_cls}'>{img_tag}<div>{item['item_name']}</div></div>"
+                 grid_html += "</div>"
+                 st.markdown(grid_html, unsafe_allow_html=True)
              
              if st.button("🚀 啟動"):
-                 if u_row['xp'] >= wheel_cost:
-                     update_user_xp(st.session_state.player_id, -wheel_cost)
+                 if update_user_xp(st.session_state.player_id, -wheel_cost) is not None:
                      
-                     weights = [float(i.get('weight', 10)) for i in display_items]
-                     win_idx = random.choices(range(len(display_items)), weights=weights, k=1)[0]
+                     win_idx = wheel_engine.spin(game_rng(), display_items)
                      win_item = display_items[win_idx]
-                     for _ in range(2): 
-                         for i in range(len(display_items)):
-                             st.session_state.lm_idx = i
-                             temp_html = "<div class='lm-grid'>"
-                             for dx, ditem in enumerate(display_items):
-                                 ac = "lm-active" if i == dx else ""
-                                 it = f"<img src='{ditem.get('img_url','')}' class='lm-img'>" if ditem.get('img_url') else ""
-                                 temp_html += f"<div class='lm-cell {ac}'>{it}<div>{ditem['item_name']}</div></div>"
-                             temp_html += "</div>"
-                             wheel_placeholder.markdown(temp_html, unsafe_allow_html=True); time.sleep(0.1)
                      st.session_state.lm_idx = win_idx
                      
-                     final_html = "<div class='lm-grid'>"
-                     for dx, ditem in enumerate(display_items):
-                         ac = "lm-active" if win_idx == dx else ""
-                         it = f"<img src='{ditem.get('img_url','')}' class='lm-img'>" if ditem.get('img_url') else ""
-                         final_html += f"<div class='lm-cell {ac}'>{it}<div>{ditem['item_name']}</div></div>"
-                     final_html += "</div>"
-                     wheel_placeholder.markdown(final_html, unsafe_allow_html=True)
-                     
-                     if win_item['item_name'] != "銘謝惠顧":
-                         cur_stock = supabase.table("Inventory").select("stock").eq("item_name", win_item['item_name']).execute().data[0]['stock']
-                         supabase.table("Inventory").update({"stock": cur_stock - 1}).eq("item_name", win_item['item_name']).execute()
-                         supabase.table("Prizes").insert({
+                     if win_item['item_name'] != wheel_engine.FILLER['item_name']:
+                         cur_stock = db.table("Inventory").select("stock").eq("item_name", win_item['item_name']).execute().data[0]['stock']
+                         db.table("Inventory").update({"stock": cur_stock - 1}).eq("item_name", win_item['item_name']).execute()
+                         db.table("Prizes").insert({
                              "player_id": st.session_state.player_id, 
                              "prize_name": win_item['item_name'], 
                              "status": '待兌換', 
@@ -605,107 +709,81 @@ with t_p[2]: # 遊戲大廳
                              "expire_at": "無期限", 
                              "source": 'Wheel'
                          }).execute()
-                         st.success(f"恭喜獲得: {win_item['item_name']}"); st.balloons()
-                     else: st.info("銘謝惠顧，下次好運！")
+                         banner, kind = f"🎉 恭喜獲得: {win_item['item_name']}", "win"
+                     else: banner, kind = "銘謝惠顧，下次好運！", "push"
+                     # 轉動由前端播放，伺服器送出結果後立即結束
+                     st.session_state.game_anim = animations.payload("wheel", animations.wheel(display_items, win_idx, banner, kind))
+                     rerun_fragment()
                  else: st.error("XP 不足")
         
         elif st.session_state.current_game == 'blackjack':
             st.subheader("♠️ 21點")
-            if 'bj_active' not in st.session_state: st.session_state.bj_active = False
-            if 'bj_game_over' not in st.session_state: st.session_state.bj_game_over = False
+            g = st.session_state.get('bj_game')
+            # 牌靴跨局保留，發到切牌才換新 (與 engine 模擬相同)
+            if 'bj_shoe' not in st.session_state: st.session_state.bj_shoe = bj_engine.Shoe.new()
+            shoe = st.session_state.bj_shoe
 
-            if not st.session_state.bj_active:
+            if g is None:
                 bet = st.number_input("下注 XP", 100, 10000, 100)
                 if st.button("🃏 發牌"):
-                    if u_row['xp'] >= bet:
-                        update_user_xp(st.session_state.player_id, -bet)
-                        st.session_state.bj_active = True
-                        st.session_state.bj_game_over = False
-                        st.session_state.bj_bet = bet
-                        
-                        ranks = ['2','3','4','5','6','7','8','9','10','J','Q','K','A']
-                        suits = ['♠','♥','♦','♣']
-                        deck = [(r,s) for r in ranks for s in suits]; random.shuffle(deck)
-                        st.session_state.bj_deck = deck
-                        st.session_state.bj_p = [deck.pop(), deck.pop()]
-                        st.session_state.bj_d = [deck.pop(), deck.pop()]
-                        st.rerun()
+                    if update_user_xp(st.session_state.player_id, -bet) is not None:
+                        g = st.session_state.bj_game = bj_engine.deal(game_rng(), shoe, bet, rtp=cfg.rtp['blackjack'])
+                        # 黑傑克當場結算，派彩只在這裡入帳一次
+                        if g.over and g.payout > 0: update_user_xp(st.session_state.player_id, g.payout)
+                        rerun_fragment()
                     else: st.error("XP 不足")
+                st.caption(f"牌靴剩餘 {shoe.remaining} 張 ({bj_engine.RULES.decks} 副牌，剩 {bj_engine.RULES.cut} 張換新)")
             else:
-                def hand_val(h):
-                    v = 0; aces = 0
-                    for r, s in h:
-                        if isinstance(r, int): v+=r
-                        elif r in ['J','Q','K']: v+=10
-                        elif r == 'A': v+=11; aces+=1
-                    while v > 21 and aces: v-=10; aces-=1
-                    return v
-
-                p_val = hand_val(st.session_state.bj_p)
-                d_val = hand_val(st.session_state.bj_d) if st.session_state.bj_game_over else hand_val([st.session_state.bj_d[0]])
+                hand_val = bj_engine.hand_value
+                d_val = hand_val(g.dealer) if g.over else hand_val(g.dealer[:1])
                 
                 def render_bj_card(c): return f"<div class='bj-card {'suit-red' if c[1] in ['♥','♦'] else 'suit-black'}'>{c[0]}<br>{c[1]}</div>"
                 
-                d_html = "".join([render_bj_card(c) for c in st.session_state.bj_d]) if st.session_state.bj_game_over else render_bj_card(st.session_state.bj_d[0]) + "<div class='bj-card'>?</div>"
-                p_html = "".join([render_bj_card(c) for c in st.session_state.bj_p])
+                d_html = "".join([render_bj_card(c) for c in g.dealer]) if g.over else render_bj_card(g.dealer[0]) + "<div class='bj-card'>?</div>"
+                p_html = ""
+                for i, h in enumerate(g.hands):
+                    mark = "👉 " if len(g.hands) > 1 and i == g.active and not g.over else ""
+                    tag = " (加倍)" if h.doubled else (" (投降)" if h.surrendered else "")
+                    p_html += f"<h3>{mark}您: {hand_val(h.cards)}{tag} · {h.bet} XP</h3><div>{''.join(render_bj_card(c) for c in h.cards)}</div>"
                 
-                st.markdown(f"""<div class="bj-table"><h3>莊家: {d_val}</h3><div>{d_html}</div><hr><h3>您: {p_val}</h3><div>{p_html}</div></div>""", unsafe_allow_html=True)
+                st.markdown(f"""<div class="bj-table"><h3>莊家: {d_val}</h3><div>{d_html}</div><hr>{p_html}</div>""", unsafe_allow_html=True)
                 
-                if not st.session_state.bj_game_over:
-                    c1, c2 = st.columns(2)
-                    if c1.button("🔥 要牌"):
-                        st.session_state.bj_p.append(st.session_state.bj_deck.pop())
-                        if hand_val(st.session_state.bj_p) > 21:
-                             st.session_state.bj_game_over = True
-                        st.rerun()
-                    if c2.button("✋ 停牌"):
-                        while hand_val(st.session_state.bj_d) < 17:
-                             st.session_state.bj_d.append(st.session_state.bj_deck.pop())
-                        d_final = hand_val(st.session_state.bj_d)
-                        win = 0
-                        if d_final > 21 or p_val > d_final: win = 2
-                        elif p_val == d_final: win = 1
-                        
-                        if win > 0:
-                            amt = int(st.session_state.bj_bet * win)
-                            update_user_xp(st.session_state.player_id, amt)
-                            st.success(f"贏了 {amt} XP!")
-                        else: st.error("莊家勝")
-                        st.session_state.bj_game_over = True
-                        st.rerun()
+                if not g.over:
+                    if st.toggle("💡 提示"):
+                        ev = bj_engine.advice(g)
+                        st.caption(" · ".join(f"{'⭐ ' if a == max(ev, key=ev.get) else ''}{BJ_LABELS[a]} {v:+.3f}" for a, v in ev.items()))
+                    ok = bj_engine.options(g)
+                    cols = st.columns(len(ok))
+                    for col, a in zip(cols, ok):
+                        if col.button(BJ_LABELS[a]):
+                            # 加倍 / 分牌先扣加注；派彩只在結算的那一步入帳一次
+                            if a in ("double", "split") and update_user_xp(st.session_state.player_id, -g.hand.bet) is None:
+                                st.error("XP 不足"); break
+                            win = bj_engine.MOVES[a](g, game_rng())
+                            if win > 0: update_user_xp(st.session_state.player_id, win)
+                            rerun_fragment()
                 else:
-                    p_final = hand_val(st.session_state.bj_p)
-                    d_final = hand_val(st.session_state.bj_d)
-                    win = 0; msg = "莊家勝"
-                    if p_final > 21: msg = "爆牌！莊家勝"
-                    elif d_final > 21: win = 2; msg = "莊家爆牌！您贏了"
-                    elif p_final > d_final: win = 2; msg = "恭喜！您贏了"
-                    elif p_final == d_final: win = 1; msg = "平局 (Push)"
-                    
-                    if win > 0:
-                         win_amt = int(st.session_state.bj_bet * win)
-                         if 'bj_paid_flag' not in st.session_state:
-                             update_user_xp(st.session_state.player_id, win_amt)
-                             st.session_state.bj_paid_flag = True
-                         st.success(f"恭喜！您贏了 {win_amt} XP！"); st.balloons()
-                    else: st.error(f"結果: {msg}")
+                    if g.payout > 0:
+                        st.success(f"{g.msg}：取回 {g.payout} XP")
+                        if g.payout > g.wagered: st.balloons()
+                    else: st.error(f"結果: {g.msg}")
+                    if g.shuffled: st.caption("🔀 本局前已換新牌靴")
                         
                     if st.button("🔄 再玩一局"):
-                        st.session_state.bj_active = False
-                        if 'bj_paid_flag' in st.session_state: del st.session_state.bj_paid_flag
-                        st.rerun()
+                        st.session_state.bj_game = None
+                        rerun_fragment()
 
         elif st.session_state.current_game == 'baccarat':
             st.subheader("🏛️ 皇家百家樂 (Royal Baccarat)")
             
-            if 'bacc_chips' not in st.session_state: st.session_state.bacc_chips = 100
-            if 'bacc_bets' not in st.session_state: st.session_state.bacc_bets = {"P":0, "B":0, "T":0, "PP":0, "BP":0}
+            if 'bacc_round' not in st.session_state: st.session_state.bacc_round = 0
             
             try:
-                b_state = safe_execute(supabase.table("Baccarat_Global").select("*").eq("id", 1)).data[0]
+                b_state = safe_execute(db.table("Baccarat_Global").select("*").eq("id", 1)).data[0]
                 hist_str = b_state['history_string'] if b_state['history_string'] else ""
                 hist_list = hist_str.split(',') if hist_str else []
-            except: hist_list = []
+            except: b_state, hist_list = {}, []
+            shoe = bacc_engine.Shoe.decode(b_state.get('shoe'))
 
             st.markdown("#### 📜 牌路")
             bead_html = "<div class='bead-plate'>"
@@ -717,127 +795,63 @@ with t_p[2]: # 遊戲大廳
                     bead_html += f"<div class='bead {c}'>{val}</div>"
             bead_html += "</div>"
             st.markdown(bead_html, unsafe_allow_html=True)
+            # 剩餘牌靴的精確機率 (依牌靴組成快取，發牌後才重算)
+            if shoe.spent: st.caption("🂠 切牌已出，下一局換新牌靴")
+            else:
+                od = bacc_engine.summary(shoe.counts)
+                st.caption(f"🂠 牌靴剩餘 {shoe.remaining} 張 (本靴第 {shoe.hands + 1} 局) · 閒 {od['P']:.2%} · 莊 {od['B']:.2%} · 和 {od['T']:.2%} · 閒對 {od['PP']:.2%} · 莊對 {od['BP']:.2%}")
 
-            if 'bacc_last_res' in st.session_state:
+            if not play_animation("baccarat") and 'bacc_last_res' in st.session_state:
                 st.info(st.session_state.bacc_last_res)
 
-            st.write("#### 🪙 選擇籌碼")
-            chips = [100, 500, 1000, 5000, 10000]
-            chip_cols = st.columns(len(chips))
-            for i, c in enumerate(chips):
-                with chip_cols[i]:
-                    if st.button(f"{chip}", key=f"chip_{chip}"):
-                        st.session_state.bacc_chips = chip
-            st.info(f"當前選定籌碼: {st.session_state.bacc_chips}")
-
-            c1, c2, c3, c4, c5 = st.columns(5)
-            def add_bet(target): st.session_state.bacc_bets[target] += st.session_state.bacc_chips
-            
-            with c1:
-                st.markdown(f"<div class='bacc-zone bacc-player' style='text-align:center;'><h4>🔵 閒 (1:1)</h4><h2>{st.session_state.bacc_bets['P']}</h2></div>", unsafe_allow_html=True)
-                st.button("押 閒", key="bet_p", on_click=add_bet, args=("P",), use_container_width=True)
-            with c2:
-                st.markdown(f"<div class='bacc-zone bacc-banker' style='text-align:center;'><h4>🔴 莊 (1:0.95)</h4><h2>{st.session_state.bacc_bets['B']}</h2></div>", unsafe_allow_html=True)
-                st.button("押 莊", key="bet_b", on_click=add_bet, args=("B",), use_container_width=True)
-            with c3:
-                st.markdown(f"<div class='bacc-zone bacc-tie' style='text-align:center;'><h4>🟢 和 (1:8)</h4><h2>{st.session_state.bacc_bets['T']}</h2></div>", unsafe_allow_html=True)
-                st.button("押 和", key="bet_t", on_click=add_bet, args=("T",), use_container_width=True)
-            with c4:
-                st.markdown(f"<div class='bacc-zone bacc-pair' style='text-align:center;'><h4>🔵 閒對 (1:11)</h4><h2>{st.session_state.bacc_bets['PP']}</h2></div>", unsafe_allow_html=True)
-                st.button("押 閒對", key="bet_pp", on_click=add_bet, args=("PP",), use_container_width=True)
-            with c5:
-                st.markdown(f"<div class='bacc-zone bacc-pair' style='text-align:center;'><h4>🔴 莊對 (1:11)</h4><h2>{st.session_state.bacc_bets['BP']}</h2></div>", unsafe_allow_html=True)
-                st.button("押 莊對", key="bet_bp", on_click=add_bet, args=("BP",), use_container_width=True)
-
-            total_bet = sum(st.session_state.bacc_bets.values())
-            c_act1, c_act2 = st.columns(2)
-            if c_act1.button("🗑️ 清空籌碼"):
-                st.session_state.bacc_bets = {k:0 for k in st.session_state.bacc_bets}
-                st.rerun()
-
-            if c_act2.button("💰 發牌 (Deal)", type="primary"):
-                if total_bet > 0 and u_row['xp'] >= total_bet:
-                    update_user_xp(st.session_state.player_id, -total_bet)
-                    
-                    rtp = float(get_config('rtp_baccarat', "0.95"))
-                    deck = [1,2,3,4,5,6,7,8,9,10,11,12,13] * 8; random.shuffle(deck)
-                    
-                    p_hand = []; b_hand = []
-                    winner = "T"
+            # 選籌碼 / 疊注在前端完成，發牌時才送出整張注單
+            res = baccarat_board(data={"round": st.session_state.bacc_round, "chips": boards.CHIPS, "zones": boards.BACCARAT_ZONES},
+                                 key="baccarat_board", on_deal_change=lambda: None)
+
+            if res.deal:
+                slip = boards.clean_slip(res.deal, boards.BACCARAT_KEYS)
+                bets = {z[0]: slip.get(z[0], 0) for z in boards.BACCARAT_ZONES}
+                total_bet = sum(bets.values())
+                if total_bet > 0 and update_user_xp(st.session_state.player_id, -total_bet) is not None:
                     
-                    for _ in range(10):
-                        p_hand = [deck.pop(), deck.pop()]; b_hand = [deck.pop(), deck.pop()]
-                        def get_val(h): return sum([0 if c>=10 else c for c in h]) % 10
-                        if get_val(p_hand) < 8 and get_val(b_hand) < 8:
-                            if get_val(p_hand) <= 5: p_hand.append(deck.pop())
-                            if get_val(b_hand) <= 5: b_hand.append(deck.pop()) 
-                        
-                        p_val = get_val(p_hand); b_val = get_val(b_hand)
-                        if p_val > b_val: winner = "P"
-                        elif b_val > p_val: winner = "B"
-                        else: winner = "T"
-                        
-                        is_pp = p_hand[0] == p_hand[1]
-                        is_bp = b_hand[0] == b_hand[1]
-
-                        pot_win = 0
-                        if winner == "P": pot_win += st.session_state.bacc_bets['P'] * 2
-                        if winner == "B": pot_win += int(st.session_state.bacc_bets['B'] * 1.95)
-                        if winner == "T": pot_win += st.session_state.bacc_bets['T'] * 9
-                        if is_pp: pot_win += st.session_state.bacc_bets['PP'] * 12
-                        if is_bp: pot_win += st.session_state.bacc_bets['BP'] * 12
-                        if winner == "T": pot_win += st.session_state.bacc_bets['P'] + st.session_state.bacc_bets['B']
-                        
-                        if random.random() > rtp and pot_win > total_bet: continue 
-                        else: break
+                    try: r = baccarat_deal(bets, cfg.rtp['baccarat'])
+                    except Exception as e: print(f"Baccarat deal error: {e}"); r = None
+                    if r is None:
+                        # 牌靴讀寫失敗：這局不成立，注金退回
+                        update_user_xp(st.session_state.player_id, total_bet)
+                        st.session_state.bacc_last_res = "⚠️ 牌桌忙碌，本局未發牌，注金已退回"
+                        rerun_fragment()
+                    p_hand, b_hand, p_val, b_val, winner, pot_win = r.player, r.banker, r.p_val, r.b_val, r.winner, r.payout
                     
                     if pot_win > 0:
                         update_user_xp(st.session_state.player_id, pot_win)
-                        supabase.table("Prizes").insert({
+                        outbox.insert("Prizes", {
                             "player_id": st.session_state.player_id, 
                             "prize_name": f"{pot_win} XP", 
                             "status": '自動入帳', 
                             "time": datetime.now().isoformat(), 
                             "expire_at": "無期限", 
                             "source": "GameWin-bacc"
-                        }).execute()
-                    
-                    new_entry = f"{winner}{p_val if winner=='P' else b_val}"
-                    new_hist = (hist_list + [new_entry])[-60:]
-                    
-                    safe_execute(supabase.table("Baccarat_Global").update({"hand_count": len(new_hist), "history_string": ",".join(new_hist)}).eq("id", 1))
+                        })
+                        missions_engine.emit(st.session_state.player_id, "game_win")
                     
                     log_game_transaction(st.session_state.player_id, 'baccarat', 'BET', total_bet)
                     if pot_win > 0: log_game_transaction(st.session_state.player_id, 'baccarat', 'WIN', pot_win)
 
-                    ph = st.empty(); bh = st.empty()
-                    def render_card(val):
-                         s = random.choice(['♠', '♣', '♥', '♦'])
-                         c = "red" if s in ['♥', '♦'] else "black"
-                         d = {1:'A',11:'J',12:'Q',13:'K'}.get(val, str(val))
-                         return f"<div class='bacc-card {c}'>{d}<br>{s}</div>"
-
-                    p_html = ""
-                    for card in p_hand:
-                        p_html += render_card(card)
-                        ph.markdown(f"<div style='text-align:center'><h3>🔵 閒家 ({p_val})</h3><div>{p_html}</div></div>", unsafe_allow_html=True)
-                        time.sleep(0.5)
-                    
-                    b_html = ""
-                    for card in b_hand:
-                        b_html += render_card(card)
-                        bh.markdown(f"<div style='text-align:center'><h3>🔴 莊家 ({b_val})</h3><div>{b_html}</div></div>", unsafe_allow_html=True)
-                        time.sleep(0.5)
+                    def card_face(val):
+                         return {1:'A',11:'J',12:'Q',13:'K'}.get(val, str(val)), random.choice(['♠', '♣', '♥', '♦'])
 
                     res_msg = f"結果: {winner} ({p_val} vs {b_val})"
                     st.session_state.bacc_last_res = f"上局結果: {res_msg} | 贏得: {pot_win}"
                     
-                    if pot_win > total_bet: st.success(f"贏得 {pot_win} XP! {res_msg}"); st.balloons()
-                    elif pot_win == total_bet: st.info(f"退回本金 {res_msg}")
-                    else: st.error(f"莊家通吃 {res_msg}")
+                    if pot_win > total_bet: banner, kind = f"🎉 贏得 {pot_win} XP! {res_msg}", "win"
+                    elif pot_win == total_bet: banner, kind = f"退回本金 {res_msg}", "push"
+                    else: banner, kind = f"莊家通吃 {res_msg}", "lose"
+                    st.session_state.game_anim = animations.payload("baccarat", animations.baccarat(
+                        [card_face(c) for c in p_hand], [card_face(c) for c in b_hand], p_val, b_val, banner, kind))
                     
-                    st.session_state.bacc_bets = {k:0 for k in st.session_state.bacc_bets}
-                    time.sleep(2); st.rerun()
+                    st.session_state.bacc_round += 1
+                    rerun_fragment()
 
                 else: st.error("XP 不足或未下注")
 
@@ -845,7 +859,7 @@ with t_p[2]: # 遊戲大廳
             st.subheader("🔴 俄羅斯輪盤 (Roulette)")
             
             try:
-                r_state = safe_execute(supabase.table("Roulette_Global").select("*").eq("id", 1)).data[0]
+                r_state = safe_execute(db.table("Roulette_Global").select("*").eq("id", 1)).data[0]
                 hist_str = r_state['history_string'] if r_state['history_string'] else ""
                 hist_list = hist_str.split(',') if hist_str else []
             except: hist_list = []
@@ -854,274 +868,185 @@ with t_p[2]: # 遊戲大廳
             for h in hist_list:
                 if h:
                     n = int(h)
-                    c = "#D40000" if n in [1,3,5,7,9,12,14,16,18,19,21,23,25,27,30,32,34,36] else ("#008000" if n == 0 else "#111")
+                    c = "#D40000" if n in roulette_engine.RED else ("#008000" if n == 0 else "#111")
                     h_html += f"<div class='hist-ball' style='background-color:{c}'>{n}</div>"
             h_html += "</div>"
             st.markdown(h_html, unsafe_allow_html=True)
             
-            if 'roulette_last_win' in st.session_state:
+            if not play_animation("roulette") and 'roulette_last_win' in st.session_state:
                 rw = st.session_state.roulette_last_win
                 if rw['win'] > 0: st.success(f"🎉 上局開出 {rw['num']}，您贏得 {rw['win']} XP！")
                 else: st.error(f"💀 上局開出 {rw['num']}，未中獎。")
 
-            if 'roulette_bets' not in st.session_state: st.session_state.roulette_bets = {} 
-            if 'roulette_chips' not in st.session_state: st.session_state.roulette_chips = 100
+            if 'roulette_bets' not in st.session_state: st.session_state.roulette_bets = {}
+            if 'roulette_round' not in st.session_state: st.session_state.roulette_round = 0
 
-            st.markdown("##### 🪙 籌碼與操作")
-            chips = [100, 500, 1000, 5000, 10000]
-            cc = st.columns(len(chips))
-            for i, c in enumerate(chips):
-                if cc[i].button(f"{c}", key=f"rc_{c}"): st.session_state.roulette_chips = c
-            
-            total_bet = sum(st.session_state.roulette_bets.values())
-            c_act1, c_act2 = st.columns(2)
-            c_act1.info(f"💰 總下注: {total_bet} | 籌碼: {st.session_state.roulette_chips}")
-            
-            if c_act2.button("🚀 旋轉 (SPIN)", type="primary", use_container_width=True):
-                if total_bet > 0 and u_row['xp'] >= total_bet:
-                    update_user_xp(st.session_state.player_id, -total_bet)
-                    
-                    rtp = float(get_config('rtp_roulette', "0.95"))
-                    
-                    potential_loss_nums = []
-                    for n in range(37):
-                        sim_win = 0
-                        red_nums = [1,3,5,7,9,12,14,16,18,19,21,23,25,27,30,32,34,36]
-                        for t, a in st.session_state.roulette_bets.items():
-                            is_hit = False
-                            if t.isdigit() and int(t) == n: is_hit = True
-                            elif t == "紅色" and n in red_nums: is_hit = True
-                            elif t == "黑色" and n not in red_nums and n!=0: is_hit = True
-                            elif t == "單數" and n!=0 and n%2!=0: is_hit = True
-                            elif t == "雙數" and n!=0 and n%2==0: is_hit = True
-                            if is_hit:
-                                if t.isdigit(): sim_win += a * 36
-                                else: sim_win += a * 2
-                        if sim_win < total_bet: potential_loss_nums.append(n)
-                    
-                    if random.random() > rtp and potential_loss_nums:
-                        final_num = random.choice(potential_loss_nums) 
-                    else:
-                        final_num = random.randint(0, 36) 
+            # 選籌碼 / 疊注 / 清空在前端完成，旋轉時才送出整張注單 (上一局注單保留供續押)
+            res = roulette_board(data={"round": st.session_state.roulette_round, "chips": boards.CHIPS, "bets": st.session_state.roulette_bets,
+                                       "red": sorted(roulette_engine.RED), "outside": boards.ROULETTE_OUTSIDE,
+                                       "table": roulette_table()},
+                                 key="roulette_board", on_spin_change=lambda: None)
+
+            if res.spin:
+                st.session_state.roulette_bets = boards.clean_slip(res.spin, boards.ROULETTE_KEYS)
+                total_bet = sum(st.session_state.roulette_bets.values())
+                if total_bet > 0 and update_user_xp(st.session_state.player_id, -total_bet) is not None:
                     
-                    total_win = 0
-                    red_nums = [1,3,5,7,9,12,14,16,18,19,21,23,25,27,30,32,34,36]
-                    for t, a in st.session_state.roulette_bets.items():
-                        is_win = False
-                        if t.isdigit() and int(t) == final_num: is_win = True; mult = 36
-                        elif t == "紅色" and final_num in red_nums: is_win = True; mult = 2
-                        elif t == "黑色" and final_num not in red_nums and final_num != 0: is_win = True; mult = 2
-                        elif t == "Odd" and final_num%2!=0: is_win = True; mult = 2
-                        elif t == "Even" and final_num%2==0 and final_num!=0: is_win = True; mult = 2
-                        
-                        if is_win: total_win += a * mult
+                    final_num, total_win = roulette_engine.spin(game_rng(), st.session_state.roulette_bets, cfg.rtp['roulette'])
                     
                     if total_win > 0:
                         update_user_xp(st.session_state.player_id, total_win)
-                        supabase.table("Prizes").insert({
+                        outbox.insert("Prizes", {
                             "player_id": st.session_state.player_id, 
                             "prize_name": f"{total_win} XP", 
                             "status": '自動入帳', 
                             "time": datetime.now().isoformat(), 
                             "expire_at": "無期限", 
                             "source": "GameWin-Roulette"
-                        }).execute()
+                        })
+                        missions_engine.emit(st.session_state.player_id, "game_win")
                     
                     new_hist_list = [str(final_num)] + hist_list[:39] 
                     new_hist_str = ",".join(new_hist_list)
-                    safe_execute(supabase.table("Roulette_Global").update({"history_string": new_hist_str}).eq("id", 1))
+                    safe_execute(db.table("Roulette_Global").update({"history_string": new_hist_str}).eq("id", 1))
                     
                     log_game_transaction(st.session_state.player_id, 'roulette', 'BET', total_bet)
                     if total_win > 0: log_game_transaction(st.session_state.player_id, 'roulette', 'WIN', total_win)
                     
                     st.session_state.roulette_last_win = {'num': final_num, 'win': total_win}
                     
-                    placeholder = st.empty()
-                    placeholder.markdown('<div class="roulette-wheel-anim">🎲</div>', unsafe_allow_html=True)
-                    time.sleep(2)
-                    res_c = "#D40000" if final_num in red_nums else ("#008000" if final_num==0 else "#111")
-                    placeholder.markdown(f"<div style='text-align:center; font-size:4em; color:{res_c}; font-weight:bold;'>{final_num}</div>", unsafe_allow_html=True)
-                    
-                    time.sleep(1); st.rerun()
+                    banner = f"🎉 開出 {final_num}，您贏得 {total_win} XP！" if total_win > 0 else f"💀 開出 {final_num}，未中獎。"
+                    st.session_state.game_anim = animations.payload("roulette", animations.roulette(final_num, banner, "win" if total_win > 0 else "lose"))
+                    st.session_state.roulette_round += 1
+                    rerun_fragment()
 
                 else: st.error("XP 不足或未下注")
 
-            if st.session_state.roulette_bets:
-                with st.expander("📝 查看/編輯下注"):
-                    bets_list = list(st.session_state.roulette_bets.keys())
-                    c_del1, c_del2 = st.columns([3, 1])
-                    del_target = c_del1.selectbox("選擇要刪除的注單", bets_list)
-                    if c_del2.button("❌ 刪除"):
-                        del st.session_state.roulette_bets[del_target]
-                        st.rerun()
-                    if st.button("🗑️ 全部清空"):
-                        st.session_state.roulette_bets = {}
-                        st.rerun()
-                    st.table(pd.DataFrame(list(st.session_state.roulette_bets.items()), columns=["下注目標", "金額"]))
-
-            c1, c2, c3 = st.columns([1,12,1])
-            with c2:
-                if st.button("0 (1:35)", key="rb_0", use_container_width=True): 
-                    st.session_state.roulette_bets["0"] = st.session_state.roulette_bets.get("0", 0) + st.session_state.roulette_chips
-                
-                for row in range(12):
-                    rc1, rc2, rc3 = st.columns(3)
-                    n1, n2, n3 = row*3+1, row*3+2, row*3+3
-                    for n, col in zip([n1,n2,n3], [rc1,rc2,rc3]):
-                         color = "🔴" if n in [1,3,5,7,9,12,14,16,18,19,21,23,25,27,30,32,34,36] else "⚫"
-                         if col.button(f"{color} {n}", key=f"rb_{n}", use_container_width=True):
-                             st.session_state.roulette_bets[str(n)] = st.session_state.roulette_bets.get(str(n), 0) + st.session_state.roulette_chips
-                
-                sb1, sb2 = st.columns(2)
-                if sb1.button("🔴 紅色", key="rb_red"): st.session_state.roulette_bets["紅色"] = st.session_state.roulette_bets.get("紅色", 0) + st.session_state.roulette_chips
-                if sb2.button("⚫ 黑色", key="rb_black"): st.session_state.roulette_bets["黑色"] = st.session_state.roulette_bets.get("黑色", 0) + st.session_state.roulette_chips
-                
-                sb3, sb4 = st.columns(2)
-                if sb3.button("單數", key="rb_odd"): st.session_state.roulette_bets["Odd"] = st.session_state.roulette_bets.get("Odd", 0) + st.session_state.roulette_chips
-                if sb4.button("雙數", key="rb_even"): st.session_state.roulette_bets["Even"] = st.session_state.roulette_bets.get("Even", 0) + st.session_state.roulette_chips
 
-with t_p[3]: # 商城
+@kingdom_fragment("tab_mall")
+def tab_mall(): # 商城
     st.subheader("🛒 商城")
     try:
-        inv_res = safe_execute(supabase.table("Inventory").select("*").gt("stock", 0).in_("target_market", ["Mall", "Both"]).order("item_value", desc=True))
+        inv_res = safe_execute(db.table("Inventory").select("*").gt("stock", 0).in_("target_market", ["Mall", "Both"]).order("item_value", desc=True))
         items = pd.DataFrame(inv_res.data)
     except: items = pd.DataFrame()
     
+    rows = []
+    discount = cfg.vip_discount.get(vip_lvl, 0.0)
     if not items.empty:
-        ic = st.columns(3)
-        for i, r in items.reset_index(drop=True).iterrows():
-            with ic[i%3]:
-                discount = get_vip_discount(vip_lvl)
-                final_xp_price = int(r['mall_price'] * (1 - discount/100.0))
-                vip_price_val = r.get('vip_price', 0)
-                
-                xp_display = f"⚡{final_xp_price:,} XP"
-                if discount > 0:
-                    xp_display += f" <span style='font-size:0.8em;color:#AAA;text-decoration:line-through;'>({r['mall_price']:,})</span> <span style='font-size:0.8em;color:#FFD700;'>(-{discount}%)</span>"
-                
-                vp_display = ""
-                if vip_price_val > 0:
-                    vp_display = f"<div class='vip-price'>💎 {vip_price_val:,} VP</div>"
-
-                limit_txt = f"🔒 需 {r.get('mall_min_rank', '無限制')}" if r.get('mall_min_rank') != '無限制' else "✅ 無限制"
-                img_html = f"<img src='{r['img_url']}' class='mall-img'>" if r['img_url'] else ""
-                
-                st.markdown(f'''<div class="mall-card">{img_html}<div><p>{r['item_name']}</p><p class="mall-price">{xp_display}</p>{vp_display}</div><p style="color:#AAA;font-size:0.8em;margin-top:5px;">{limit_txt}</p></div>''', unsafe_allow_html=True)
-                
-                p_lvl = rank_to_level(player_rank_title); r_lvl = rank_to_level(r.get('mall_min_rank', '無限制'))
-                
-                if p_lvl >= r_lvl:
-                    c_buy1, c_buy2 = st.columns(2)
-                    if c_buy1.button(f"XP 購買", key=f"bxp_{r['item_name']}"):
-                        if u_row['xp'] >= final_xp_price:
-                            update_user_xp(st.session_state.player_id, -final_xp_price)
-                            supabase.table("Inventory").update({"stock": r['stock'] - 1}).eq("item_name", r['item_name']).execute()
-                            supabase.table("Prizes").insert({
-                                "player_id": st.session_state.player_id, 
-                                "prize_name": r['item_name'], 
-                                "status": '待兌換', 
-                                "time": datetime.now().isoformat(), 
-                                "expire_at": "無期限", 
-                                "source": '商城購買'
-                            }).execute()
-                            st.success("購買成功"); st.rerun()
-                        else: st.error("XP 不足")
-                    
-                    if vip_price_val > 0:
-                        if c_buy2.button(f"VP 購買", key=f"bvp_{r['item_name']}"):
-                             if u_row.get('vip_points', 0) >= vip_price_val:
-                                 supabase.table("Members").update({"vip_points": u_row['vip_points'] - vip_price_val}).eq("pf_id", st.session_state.player_id).execute()
-                                 supabase.table("Inventory").update({"stock": r['stock'] - 1}).eq("item_name", r['item_name']).execute()
-                                 supabase.table("Prizes").insert({
-                                     "player_id": st.session_state.player_id, 
-                                     "prize_name": r['item_name'], 
-                                     "status": '待兌換', 
-                                     "time": datetime.now().isoformat(), 
-                                     "expire_at": "無期限", 
-                                     "source": '商城(VP)'
-                                 }).execute()
-                                 st.success("VP 購買成功"); st.rerun()
-                             else: st.error("VP 不足")
-                else: st.button(f"🔒 需 {r['mall_min_rank']}", disabled=True, key=f"lk_{r['item_name']}")
-
-with t_p[4]: # 背包
+        items['min_tier'] = min_tiers(items, "mall")
+        items['xp_price'] = (items['mall_price'] * (1 - discount/100.0)).astype(int)
+        if 'vip_price' not in items: items['vip_price'] = 0
+        items['vip_price'] = items['vip_price'].fillna(0).astype(int)
+        for r in items.to_dict("records"):
+            xp_display = f"⚡{r['xp_price']:,} XP"
+            if discount > 0:
+                xp_display += f" <span style='font-size:0.8em;color:#AAA;text-decoration:line-through;'>({r['mall_price']:,})</span> <span style='font-size:0.8em;color:#FFD700;'>(-{discount}%)</span>"
+            vp_display = f"<div class='vip-price'>💎 {r['vip_price']:,} VP</div>" if r['vip_price'] > 0 else ""
+            limit_txt = f"🔒 需 {LIMIT_LABELS[r['min_tier']]}" if r['min_tier'] != NO_LIMIT else "✅ 無限制"
+            img_html = f"<img src='{listview.esc(local_image(r['img_url']))}' class='mall-img'>" if r.get('img_url') else ""
+            if player_tier >= r['min_tier']:
+                acts = [("xp", "XP 購買", False)] + ([("vp", "VP 購買", False)] if r['vip_price'] > 0 else [])
+            else: acts = [("locked", f"🔒 需 {LIMIT_LABELS[r['min_tier']]}", True)]
+            rows.append(listview.row(r['id'], f'''<div class="mall-card">{img_html}<div><p>{listview.esc(r['item_name'])}</p><p class="mall-price">{xp_display}</p>{vp_display}</div><p style="color:#AAA;font-size:0.8em;margin-top:5px;">{limit_txt}</p></div>''', acts))
+    res = list_view(data=listview.data(rows, row_height=330, cols=3, height=700, empty="商城補貨中"), key="list_mall", on_action_change=lambda: None)
+
+    for kind in ("xp", "vp"):
+        item_id = listview.picked(res.action, kind, rows)
+        if item_id is None: continue
+        r = items[items['id'].astype(str) == item_id].iloc[0]
+        if player_tier < r['min_tier']: st.error(f"🔒 需 {LIMIT_LABELS[r['min_tier']]}"); break
+        if kind == "xp":
+            if update_user_xp(st.session_state.player_id, -int(r['xp_price'])) is None: st.error("XP 不足"); break
+        else:
+            if r['vip_price'] <= 0: break
+            if spend_vip_points(st.session_state.player_id, r['vip_price']) is None: st.error("VP 不足"); break
+        db.table("Inventory").update({"stock": int(r['stock']) - 1}).eq("item_name", r['item_name']).execute()
+        db.table("Prizes").insert({
+            "player_id": st.session_state.player_id, 
+            "prize_name": r['item_name'], 
+            "status": '待兌換', 
+            "time": datetime.now().isoformat(), 
+            "expire_at": "無期限", 
+            "source": '商城購買' if kind == "xp" else '商城(VP)'
+        }).execute()
+        player_counts.clear(); st.toast("購買成功" if kind == "xp" else "VP 購買成功"); st.rerun()
+
+
+@kingdom_fragment("tab_backpack")
+def tab_backpack(): # 背包
     st.subheader("🎒 背包")
     try:
-        pz_res = safe_execute(supabase.table("Prizes").select("*").eq("player_id", st.session_state.player_id).not_.ilike("source", "GameWin%").order("id", desc=True))
+        pz_res = safe_execute(db.table("Prizes").select("*").eq("player_id", st.session_state.player_id).not_.ilike("source", "GameWin%").order("id", desc=True))
         prizes = pd.DataFrame(pz_res.data)
     except: prizes = pd.DataFrame()
     
-    h1, h2, h3, h4, h5, h6 = st.columns([1, 2, 2, 3, 2, 2])
-    h1.markdown("**選取**"); h2.markdown("**ID**"); h3.markdown("**來源**"); h4.markdown("**物品**"); h5.markdown("**狀態**"); h6.markdown("**效期**")
-    st.write("---")
-    sel = []
-    if not prizes.empty:
-        for _, r in prizes.iterrows():
-            c1, c2, c3, c4, c5, c6 = st.columns([1, 2, 2, 3, 2, 2])
-            if c1.checkbox("", key=f"del_{r['id']}"): sel.append(r['id'])
-            c2.write(str(r['id'])); c3.write(r['source']); c4.write(r['prize_name']); c5.write(r['status']); c6.write(r.get('expire_at', '無期限'))
-    if sel and st.button("🗑️ 刪除選取"):
-        for i in sel: supabase.table("Prizes").delete().eq("id", i).execute()
-        st.success("已刪除"); st.rerun()
-
-with t_p[5]: # 榜單
+    rows = [] if prizes.empty else [
+        listview.row(r['id'], "<div class='bp-row'>" + "".join(f"<span>{listview.esc(v)}</span>" for v in (r['id'], r['source'], r['prize_name'], r['status'], r.get('expire_at') or '無期限')) + "</div>")
+        for r in prizes.to_dict("records")]
+    header = "<div class='bp-row bp-head'>" + "".join(f"<span>{h}</span>" for h in ("ID", "來源", "物品", "狀態", "效期")) + "</div>"
+    res = list_view(data=listview.data(rows, row_height=44, height=600, header=header, select={"label": "🗑️ 刪除選取", "action": "delete"}, empty="背包是空的"),
+                    key="list_backpack", on_action_change=lambda: None)
+    sel = listview.picked(res.action, "delete", rows)
+    if sel:
+        # 一次刪除，並限定本人的獎品
+        safe_execute(db.table("Prizes").delete().in_("id", [int(i) for i in sel]).eq("player_id", st.session_state.player_id))
+        player_counts.clear(); st.toast(f"已刪除 {len(sel)} 筆"); st.rerun()
+
+
+@kingdom_fragment("tab_boards")
+def tab_boards(): # 榜單
+    lbs = get_leaderboards()
     c_lb1, c_lb2 = st.columns(2)
-    with c_lb1:
-        st.markdown(f"<div class='glory-title'>{lb_title_1}</div>", unsafe_allow_html=True)
-        try:
-            lb_res = safe_execute(supabase.table("Leaderboard").select("player_id, hero_points").neq("player_id", "330999").order("hero_points", desc=True).limit(20))
-            lb_data = lb_res.data
-        except: lb_data = []
-        
-        if lb_data:
-            for i, row in enumerate(lb_data):
+    for col, board, title in [(c_lb1, "hero", lb_title_1), (c_lb2, "monthly", lb_title_2)]:
+        with col:
+            st.markdown(f"<div class='glory-title'>{title}</div>", unsafe_allow_html=True)
+            # 整榜積分一次分類成階級，整張榜單一次送出
+            titles = cfg.tiers.titles([row['points'] for row in lbs[board]]) if board == "hero" else None
+            rows = []
+            for i, row in enumerate(lbs[board]):
                 rank_num = i + 1
                 badge = "👑" if rank_num == 1 else ("🥈" if rank_num == 2 else ("🥉" if rank_num == 3 else f"#{rank_num}"))
                 style_class = "lb-rank-1" if rank_num == 1 else ("lb-rank-2" if rank_num == 2 else ("lb-rank-3" if rank_num == 3 else "lb-rank-norm"))
-                curr_rank = get_rank_v2500(row['hero_points'])
-                
-                p_name = row['player_id']
-                try:
-                    mem_q = safe_execute(supabase.table("Members").select("name").eq("pf_id", row['player_id']))
-                    if mem_q.data: p_name = mem_q.data[0]['name']
-                except: pass
-                
-                st.markdown(f"""<div class="lb-rank-card {style_class}"><div class="lb-badge">{badge}</div><div class="lb-info"><div class="lb-name">{p_name} <span style="font-size:0.8em;color:#DDD;">({curr_rank})</span></div><div class="lb-id">{row['player_id']}</div></div><div class="lb-score">{row['hero_points']}</div></div>""", unsafe_allow_html=True)
-        else: st.info("暫無資料")
+                tier = f' <span style="font-size:0.8em;color:#DDD;">({titles[i]})</span>' if board == "hero" else ""
+                rows.append(listview.row(row['player_id'], f"""<div class="lb-rank-card {style_class}"><div class="lb-badge">{badge}</div><div class="lb-info"><div class="lb-name">{listview.esc(row['name'])}{tier}</div><div class="lb-id">{listview.esc(row['player_id'])}</div></div><div class="lb-score">{row['points']}</div></div>"""))
+            list_view(data=listview.data(rows, row_height=95, height=1000), key=f"list_lb_{board}")
+            
+            me = get_board_position(board, st.session_state.player_id)
+            if me and me['points']: st.info(f"📍 您的名次: #{me['position']:,} / {me['total']:,} (積分 {me['points']})")
+            else: st.caption("您尚未上榜")
 
-    with c_lb2:
-        st.markdown(f"<div class='glory-title'>{lb_title_2}</div>", unsafe_allow_html=True)
-        try:
-            mg_res = safe_execute(supabase.table("Monthly_God").select("player_id, monthly_points").neq("player_id", "330999").order("monthly_points", desc=True).limit(20))
-            mg_data = mg_res.data
-        except: mg_data = []
-        
-        if mg_data:
-            for i, row in enumerate(mg_data):
-                rank_num = i + 1
-                badge = "👑" if rank_num == 1 else ("🥈" if rank_num == 2 else ("🥉" if rank_num == 3 else f"#{rank_num}"))
-                style_class = "lb-rank-1" if rank_num == 1 else ("lb-rank-2" if rank_num == 2 else ("lb-rank-3" if rank_num == 3 else "lb-rank-norm"))
-                
-                p_name = row['player_id']
-                try:
-                    mem_q = safe_execute(supabase.table("Members").select("name").eq("pf_id", row['player_id']))
-                    if mem_q.data: p_name = mem_q.data[0]['name']
-                except: pass
 
-                st.markdown(f"""<div class="lb-rank-card {style_class}"><div class="lb-badge">{badge}</div><div class="lb-info"><div class="lb-name">{p_name}</div><div class="lb-id">{row['player_id']}</div></div><div class="lb-score">{row['monthly_points']}</div></div>""", unsafe_allow_html=True)
-        else: st.info("暫無資料")
+PLAYER_SECTIONS = {
+    "rank": ("🪪 排位/VIP", tab_rank_card), "missions": ("🎯 任務", tab_missions), "games": ("🎮 遊戲大廳", tab_games),
+    "mall": ("🛒 商城", tab_mall), "backpack": ("🎒 背包", tab_backpack), "boards": ("🏆 榜單", tab_boards),
+}
+PLAYER_SECTIONS[section_nav("nav_player", PLAYER_SECTIONS, player_summaries(st.session_state.player_id))][1]()
 
 # --- 5. 指揮部 (Admin) ---
 if st.session_state.access_level in ["老闆", "店長", "員工"]:
     st.write("---"); st.header("⚙️ 指揮部")
     
-    tabs = st.tabs(["💰 櫃台與物資", "👥 人員與空投", "📊 賽事與數據", "🛠️ 系統與維護"])
-    with tabs[0]: 
+    @st.cache_data(ttl=60, show_spinner=False)
+    def admin_counts():
+        out = {}
+        try: out["counter"] = f"· 待核銷 {safe_execute(db.table('Prizes').select('id', count='exact').eq('status', '待兌換').limit(1)).count}"
+        except: pass
+        try: out["staff"] = f"· {safe_execute(db.table('Members').select('pf_id', count='exact').limit(1)).count} 人"
+        except: pass
+        try:
+            n = safe_execute(db.table("Import_History").select("id", count="exact").eq("status", "in_progress").limit(1)).count
+            if n: out["data"] = f"· {n} 未完成"
+        except: pass
+        return out
+
+    @kingdom_fragment("admin_counter")
+    def admin_counter(): # 櫃台與物資
         st.subheader("🛂 櫃台核銷")
         target = st.text_input("玩家 ID")
         if target:
             try:
-                pend_res = safe_execute(supabase.table("Prizes").select("id, prize_name").eq("player_id", target).eq("status", "待兌換"))
+                pend_res = safe_execute(db.table("Prizes").select("id, prize_name").eq("player_id", target).eq("status", "待兌換"))
                 prizes_data = pend_res.data
             except: prizes_data = []
             
@@ -1130,7 +1055,7 @@ if st.session_state.access_level in ["老闆", "店長", "員工"]:
                 p_names = list(set([p['prize_name'] for p in prizes_data]))
                 if p_names:
                     try:
-                        inv_res = safe_execute(supabase.table("Inventory").select("item_name, item_value, vip_card_level, vip_card_hours").in_("item_name", p_names))
+                        inv_res = safe_execute(db.table("Inventory").select("item_name, item_value, vip_card_level, vip_card_hours").in_("item_name", p_names))
                         inv_map = {i['item_name']: i for i in inv_res.data}
                     except: inv_map = {}
                 else: inv_map = {}
@@ -1150,7 +1075,7 @@ if st.session_state.access_level in ["老闆", "店長", "員工"]:
                 df_pend = pd.DataFrame(display_data)
                 st.table(df_pend)
                 redeem_id = st.selectbox("選擇核銷項目 ID", df_pend['id'].tolist())
-                max_val = int(get_config('max_redeem_val', "1000000"))
+                max_val = cfg.max_redeem_val
                 
                 selected_item = next((x for x in display_data if x['id'] == redeem_id), None)
                 
@@ -1159,7 +1084,7 @@ if st.session_state.access_level in ["老闆", "店長", "員工"]:
                 else:
                     if st.button("確認核銷 (自動入帳)"):
                         if selected_item['vip_hours'] > 0:
-                            mem = safe_execute(supabase.table("Members").select("vip_level, vip_expiry").eq("pf_id", target)).data[0]
+                            mem = safe_execute(db.table("Members").select("vip_level, vip_expiry").eq("pf_id", target)).data[0]
                             c_lvl = mem.get('vip_level', 0)
                             c_exp = mem.get('vip_expiry')
                             now = datetime.now(); start_time = now
@@ -1169,7 +1094,7 @@ if st.session_state.access_level in ["老闆", "店長", "員工"]:
                                     if exp_dt > now: start_time = exp_dt
                                 except: pass
                             new_exp = (start_time + timedelta(hours=int(selected_item['vip_hours']))).strftime("%Y-%m-%d %H:%M:%S")
-                            supabase.table("Members").update({"vip_level": int(selected_item['vip_level']), "vip_expiry": new_exp}).eq("pf_id", target).execute()
+                            db.table("Members").update({"vip_level": int(selected_item['vip_level']), "vip_expiry": new_exp}).eq("pf_id", target).execute()
                             st.toast(f"💎 VIP 權益已開通至 {new_exp}")
 
                         xp_match = re.search(r'(\d+)\s*XP', str(selected_item['prize_name']), re.IGNORECASE)
@@ -1178,8 +1103,8 @@ if st.session_state.access_level in ["老闆", "店長", "員工"]:
                             update_user_xp(target, add_xp)
                             st.toast(f"💰 已自動儲值 {add_xp} XP")
                         
-                        supabase.table("Prizes").update({"status": '已核銷'}).eq("id", redeem_id).execute()
-                        supabase.table("Staff_Logs").insert({"staff_id": st.session_state.player_id, "player_id": target, "prize_name": selected_item['prize_name'], "time": datetime.now().isoformat()}).execute()
+                        db.table("Prizes").update({"status": '已核銷'}).eq("id", redeem_id).execute()
+                        db.table("Staff_Logs").insert({"staff_id": st.session_state.player_id, "player_id": target, "prize_name": selected_item['prize_name'], "time": datetime.now().isoformat()}).execute()
                         st.success("核銷作業完成！"); time.sleep(1); st.rerun()
             else: st.info("該玩家無待核銷物品")
             
@@ -1196,13 +1121,13 @@ if st.session_state.access_level in ["老闆", "店長", "員工"]:
             if st.button("查詢歷史紀錄"):
                  hq_start = hd1.strftime("%Y-%m-%d 00:00:00"); hq_end = hd2.strftime("%Y-%m-%d 23:59:59")
                  try:
-                     logs_res = safe_execute(supabase.table("Staff_Logs").select("*").gte("time", hq_start).lte("time", hq_end).order("time", desc=True))
+                     logs_res = safe_execute(db.table("Staff_Logs").select("*").gte("time", hq_start).lte("time", hq_end).order("time", desc=True))
                      st.dataframe(pd.DataFrame(logs_res.data))
                  except: st.error("查詢失敗")
                  
                  if user_role == "老闆":
                      if st.button("⚠️ 刪除此區間紀錄 (老闆權限)"):
-                         supabase.table("Staff_Logs").delete().gte("time", hq_start).lte("time", hq_end).execute()
+                         db.table("Staff_Logs").delete().gte("time", hq_start).lte("time", hq_end).execute()
                          st.warning("紀錄已刪除")
 
         st.write("---")
@@ -1222,21 +1147,21 @@ if st.session_state.access_level in ["老闆", "店長", "員工"]:
             v_lvl = 0; v_hrs = 0
             if is_vip:
                 c_v1, c_v2 = st.columns(2)
-                v_lvl = c_v1.selectbox("設定 VIP 等級", [1, 2, 3, 4], format_func=lambda x: {1:"銅牌",2:"銀牌",3:"黃金",4:"鑽石"}[x])
+                v_lvl = c_v1.selectbox("設定 VIP 等級", [1, 2, 3, 4], format_func=VIP_NAMES.get)
                 v_hrs = c_v2.number_input("VIP 有效時數 (小時)", 1, 8760, 720)
             
             st.markdown("---")
             img = st.text_input("圖片 URL (可留空)")
-            r_min = st.selectbox("購買排位限制", ["無限制", "🥈 白銀 (Silver)", "⬜ 白金 (Platinum)", "💎 鑽石 (Diamond)", "🎖️ 大師 (Master)", "🏆 菁英 (Challenger)"])
+            r_min = st.selectbox("購買排位限制", list(LIMIT_LABELS), format_func=LIMIT_LABELS.get)
             vp_price = st.number_input("VP 點數售價 (0 = 不開放 VP 購買)", 0)
             target_m = st.selectbox("上架位置", ["Both", "Mall", "Wheel"])
             
             if st.button("確認上架商品"):
                 if n:
-                    supabase.table("Inventory").insert({
+                    db.table("Inventory").insert({
                         "item_name": n, "stock": s, "item_value": v, "weight": w, "target_market": target_m,
                         "mall_price": mp, "vip_card_level": v_lvl, "vip_card_hours": v_hrs,
-                        "img_url": img, "mall_min_rank": r_min, "vip_price": vp_price
+                        "img_url": img, "mall_min_rank": LIMIT_LABELS[r_min], "mall_min_tier": r_min, "vip_price": vp_price
                     }).execute()
                     st.success(f"✅ 商品 {n} 上架成功！"); time.sleep(1); st.rerun()
                 else: st.error("名稱不可為空")
@@ -1244,7 +1169,7 @@ if st.session_state.access_level in ["老闆", "店長", "員工"]:
             st.markdown("---")
             st.write("📋 **架上商品列表 (可編輯/刪除)**")
             try:
-                inv_res = safe_execute(supabase.table("Inventory").select("*"))
+                inv_res = safe_execute(db.table("Inventory").select("*"))
                 inv_data = inv_res.data
             except: inv_data = []
             
@@ -1256,32 +1181,30 @@ if st.session_state.access_level in ["老闆", "店長", "員工"]:
                         new_vp = c2.number_input(f"VP售價", value=int(mm.get('vip_price', 0)), key=f"mm_vp_{mm['item_name']}")
                         new_s = c3.number_input(f"庫存", value=mm['stock'], key=f"mm_s_{mm['item_name']}")
                         
-                        r_opts = ["無限制", "🥈 白銀 (Silver)", "⬜ 白金 (Platinum)", "💎 鑽石 (Diamond)", "🎖️ 大師 (Master)", "🏆 菁英 (Challenger)"]
-                        curr_r = mm.get('mall_min_rank', '無限制')
-                        if curr_r not in r_opts: curr_r = "無限制"
-                        r_idx = r_opts.index(curr_r)
-                        
-                        new_r = c4.selectbox(f"限制", r_opts, index=r_idx, key=f"mm_r_{mm['item_name']}")
+                        curr_r = int(min_tiers(pd.DataFrame([mm]), "mall").iloc[0])
+                        new_r = c4.selectbox(f"限制", list(LIMIT_LABELS), index=curr_r, format_func=LIMIT_LABELS.get, key=f"mm_r_{mm['item_name']}")
                         
                         c5, c6, c7 = st.columns([2, 1, 1])
                         new_u = c5.text_input("圖片", value=mm['img_url'], key=f"mm_u_{mm['item_name']}")
                         new_st = c6.selectbox("狀態", ["上架中", "下架中"], index=0 if mm.get('status')=='上架中' else 1, key=f"mm_st_{mm['item_name']}")
                         if c7.button(f"💾 保存", key=f"mm_up_{mm['item_name']}"):
-                            supabase.table("Inventory").update({
+                            db.table("Inventory").update({
                                 "mall_price": new_p, "vip_price": new_vp, "stock": new_s, 
-                                "mall_min_rank": new_r, "img_url": new_u, "status": new_st
+                                "mall_min_rank": LIMIT_LABELS[new_r], "mall_min_tier": new_r, "img_url": new_u, "status": new_st
                             }).eq("item_name", mm['item_name']).execute()
                             st.success("已更新"); st.rerun()
                         if st.button("刪除商品", key=f"mm_del_{mm['item_name']}"):
-                             supabase.table("Inventory").delete().eq("item_name", mm['item_name']).execute()
+                             db.table("Inventory").delete().eq("item_name", mm['item_name']).execute()
                              st.success("Deleted"); st.rerun()
 
-    with tabs[1]: # 人員與空投
+
+    @kingdom_fragment("admin_staff")
+    def admin_staff(): # 人員與空投
         st.subheader("🔍 查閱與管理")
         q = st.text_input("查詢玩家 ID", key="query_lookup_id_2")
         if q:
             try:
-                mem_res = safe_execute(supabase.table("Members").select("*").eq("pf_id", q))
+                mem_res = safe_execute(db.table("Members").select("*").eq("pf_id", q))
                 mem_data = mem_res.data
             except: mem_data = []
             
@@ -1300,7 +1223,7 @@ if st.session_state.access_level in ["老闆", "店長", "員工"]:
                 
                 # Check contribution
                 try:
-                    tr_res = safe_execute(supabase.table("Tournament_Records").select("actual_fee").eq("player_id", q))
+                    tr_res = safe_execute(db.table("Tournament_Records").select("actual_fee").eq("player_id", q))
                     total_contribution = sum(r['actual_fee'] for r in tr_res.data)
                 except: total_contribution = 0
                 st.markdown(f"**生涯總貢獻 (淨利): {total_contribution:,}**")
@@ -1308,26 +1231,30 @@ if st.session_state.access_level in ["老闆", "店長", "員工"]:
                 if user_role == "老闆":
                     with st.expander("🚫 封禁管理"):
                         if st.button("❌ 物理刪除玩家"):
-                            supabase.table("Members").delete().eq("pf_id", q).execute()
-                            supabase.table("Prizes").delete().eq("player_id", q).execute()
-                            supabase.table("Leaderboard").delete().eq("player_id", q).execute()
-                            st.error("已刪除"); st.rerun()
+                            db.table("Members").delete().eq("pf_id", q).execute()
+                            db.table("Prizes").delete().eq("player_id", q).execute()
+                            db.table("Leaderboard").delete().eq("player_id", q).execute()
+                            db.table("Monthly_God").delete().eq("player_id", q).execute()
+                            db.table("Progress_Counters").delete().gte("counter_key", f"{q}:").lt("counter_key", f"{q};").execute()  # 前綴範圍 (; 緊接在 : 之後)，ID 含萬用字元也不會波及他人
+                            missions_engine.invalidate(q)
+                            rankings.remove_player(q)
+                            invalidate_points(); st.error("已刪除"); st.rerun()
                             
                     with st.expander("👮 懲處：扣除玩家 XP"):
                          deduct_xp = st.number_input("扣除數量", min_value=1, value=100, key="deduct_xp_val_2")
                          if st.button("執行扣除", key="btn_deduct_xp_2"):
-                             update_user_xp(q, -deduct_xp)
-                             st.success("已扣除"); st.rerun()
+                             if update_user_xp(q, -deduct_xp) is not None: st.success("已扣除"); st.rerun()
+                             else: st.error("餘額不足，無法扣除")
 
                 with st.expander("🎰 近 20 場遊戲紀錄"):
                     try:
-                        gw = safe_execute(supabase.table("Prizes").select("source, prize_name, time").eq("player_id", q).ilike("source", "GameWin%").order("id", desc=True).limit(20))
+                        gw = safe_execute(db.table("Prizes").select("source, prize_name, time").eq("player_id", q).ilike("source", "GameWin%").order("id", desc=True).limit(20))
                         st.table(pd.DataFrame(gw.data))
                     except: pass
                 
                 with st.expander("🎒 背包庫存"):
                     try:
-                        bp = safe_execute(supabase.table("Prizes").select("prize_name, status, expire_at").eq("player_id", q).eq("status", "待兌換").order("id", desc=True))
+                        bp = safe_execute(db.table("Prizes").select("prize_name, status, expire_at").eq("player_id", q).eq("status", "待兌換").order("id", desc=True))
                         st.table(pd.DataFrame(bp.data))
                     except: pass
 
@@ -1335,24 +1262,11 @@ if st.session_state.access_level in ["老闆", "店長", "員工"]:
 
         st.write("---")
         st.subheader("🚀 物資空投")
-        target_group = st.selectbox("發送對象", ["單一玩家 ID", "全體玩家", "🏆 菁英", "🎖️ 大師", "💎 鑽石", "⬜ 白金", "🥈 白銀", "VIP 1 (銅)", "VIP 2 (銀)", "VIP 3 (金)", "VIP 4 (鑽)"])
+        target_group = st.selectbox("發送對象", ["單一玩家 ID", "全體玩家"] + RANK_COHORTS + list(VIP_COHORTS))
         
-        target_ids = []
-        if target_group == "單一玩家 ID":
-            tid = st.text_input("輸入玩家 ID")
-            if tid: target_ids = [tid]
-        elif target_group == "全體玩家":
-            try:
-                res = safe_execute(supabase.table("Members").select("pf_id"))
-                target_ids = [r['pf_id'] for r in res.data]
-            except: pass
-        else:
-            if "VIP" in target_group:
-                lvl = int(target_group.split(" ")[2])
-                try:
-                    res = safe_execute(supabase.table("Members").select("pf_id").eq("vip_level", lvl))
-                    target_ids = [r['pf_id'] for r in res.data]
-                except: pass
+        tid = st.text_input("輸入玩家 ID") if target_group == "單一玩家 ID" else None
+        try: target_ids = resolve_targets(db, target_group, cfg.tiers, tid)
+        except Exception as e: print(f"DB Error: {e}"); target_ids = []
             
         st.info(f"預計發送對象人數: {len(target_ids)} 人")
         
@@ -1361,7 +1275,7 @@ if st.session_state.access_level in ["老闆", "店長", "員工"]:
         vp = c_vp.number_input("VIP 點數", 0)
         
         try:
-            inv_list = safe_execute(supabase.table("Inventory").select("item_name"))
+            inv_list = safe_execute(db.table("Inventory").select("item_name"))
             it_opts = ["無"] + [i['item_name'] for i in inv_list.data]
         except: it_opts = ["無"]
         it = c_it.selectbox("禮物 (庫存)", it_opts)
@@ -1369,17 +1283,22 @@ if st.session_state.access_level in ["老闆", "店長", "員工"]:
         if st.button("確認空投"):
             if not target_ids: st.error("無目標")
             else:
-                for t in target_ids:
-                    if xp or vp:
-                        update_user_xp(t, xp)
-                        threading.Thread(target=lambda: safe_execute(supabase.table("Members").update({"vip_points": supabase.table("Members").select("vip_points").eq("pf_id", t).execute().data[0]['vip_points'] + vp}).eq("pf_id", t))).start()
-                    
-                    if it != "無":
-                         # Async prize insert
-                         threading.Thread(target=lambda: supabase.table("Prizes").insert({"player_id": t, "prize_name": it, "status": '待兌換', "time": datetime.now().isoformat(), "expire_at": "無期限", "source": '老闆空投'}).execute()).start()
-                st.success("空投完成")
-
-    with tabs[2]: # 賽事與數據
+                bar = st.progress(0.0, text="空投中...")
+                t_start = time.perf_counter()
+                def on_chunk(done, total, row):
+                    rate = done / max(time.perf_counter() - t_start, 1e-6)
+                    bar.progress(done / total, text=f"空投中... {done}/{total} 人 ({rate:,.0f} 人/秒)")
+                run, report = run_airdrop(db, target_ids, xp=xp, vp=vp, item=None if it == "無" else it, on_progress=on_chunk)
+                elapsed = time.perf_counter() - t_start
+                failed = [r for r in report if r['error']]
+                if run['chunks_done']: st.info(f"🔁 續傳上次未完成的空投：已完成的 {run['chunks_done']} 個批次略過不重發")
+                if failed: st.error(f"⚠️ {len(failed)} 個批次失敗，請查看報表；以相同內容再按一次只會補發失敗的批次")
+                else: st.success(f"空投完成：{len(target_ids)} 人，耗時 {elapsed:.2f} 秒 ({len(target_ids) / max(elapsed, 1e-6):,.0f} 人/秒)")
+                st.dataframe(pd.DataFrame(report), hide_index=True)
+
+
+    @kingdom_fragment("admin_data")
+    def admin_data(): # 賽事與數據
         st.subheader("📁 賽事精算導入 (已修復 XP 公式)")
         
         st.info("""
@@ -1392,156 +1311,122 @@ if st.session_state.access_level in ["老闆", "店長", "員工"]:
         *(不含獎金，不乘10%)*
         """)
         
-        up = st.file_uploader("上傳 CSV / Excel")
-        if up and st.button("執行精算"):
+        st.caption("可一次上傳多個 CSV / Excel 或 zip；以檔案內容去重，中斷後重新上傳同一批檔案會從上次完成的區塊續傳。")
+        ups = st.file_uploader("上傳 CSV / Excel / zip", accept_multiple_files=True)
+        try:
+            pend = safe_execute(db.table("Import_History").select("filename, chunks_done, chunks_total").eq("status", "in_progress"))
+            if pend and pend.data:
+                st.warning("⏸️ 未完成的導入 (重新上傳即可續傳)：" + "、".join(f"{p['filename']} ({p['chunks_done']}/{p['chunks_total']})" for p in pend.data))
+        except: pass
+        if ups and st.button("執行精算"):
             try:
-                fn = up.name; buy = 1000 
-                match = re.search(r'(\d+)', fn)
-                if match: buy = int(match.group(1))
-                
-                if fn.endswith('.csv'):
-                    try: df = pd.read_csv(up, encoding='utf-8-sig')
-                    except: 
-                        up.seek(0)
-                        df = pd.read_csv(up, encoding='big5')
-                else: df = pd.read_excel(up)
-                
-                df.columns = df.columns.str.strip()
-                
-                try:
-                    chk = safe_execute(supabase.table("Import_History").select("filename").eq("filename", fn))
-                    if chk.data:
-                        st.error(f"❌ 檔案 {fn} 已被匯入過！"); st.stop()
-                except: pass
-                
-                # 積分矩陣 (還原舊版邏輯)
-                matrix = {
-                    1200: (200, 0.75, [2, 1.5, 1]),
-                    3400: (400, 1.5, [5, 4, 3]),
-                    6600: (600, 2.0, [10, 8, 6]),
-                    11000: (1000, 3.0, [20, 15, 10]),
-                    21500: (1500, 5.0, [40, 30, 20])
-                }
-                base, p_mult, bonuses = matrix.get(buy, (100, 1.0, [1, 1, 1]))
-                if buy >= 3000 and buy not in matrix: base = 200 
-                
-                for _, r in df.iterrows():
-                    pid = str(r['ID']); raw_name = str(r['Nickname']); name = raw_name[:10]
-                    # Ensure Member exists
-                    try:
-                        mem = safe_execute(supabase.table("Members").select("pf_id").eq("pf_id", pid))
-                        if not mem.data:
-                            safe_execute(supabase.table("Members").insert({"pf_id": pid, "name": name, "role": "玩家", "xp": 0}))
-                    except: pass
-                    
-                    rank = int(r['Rank'])
-                    re_e = int(r.get('Re-Entries', 0))
-                    payout = int(r.get('Payout', 0))
-                    ents = re_e + 1
-                    
-                    # 抓取抵用卷折扣
-                    remark = str(r.get('Remark', '')) if pd.notna(r.get('Remark')) else ''
-                    discounts = sum([int(d) for d in re.findall(r'(\d+)抵用卷', remark)])
-
-                    # 計算實際手續費
-                    total_service_fee_gross = base * ents
-                    actual_fee = max(0, total_service_fee_gross - discounts)
-                    
-                    # [修正] XP = 實際手續費 (100% 全額回饋，不含 Payout)
-                    xp_reward = actual_fee
-                    update_user_xp(pid, xp_reward)
-                    
-                    # 計算積分
-                    rank_bonus = bonuses[rank-1] if rank <= 3 else 0
-                    pts = int(ents * p_mult) + rank_bonus
-                    
-                    # 雙榜同步更新
-                    try:
-                        cur_h = safe_execute(supabase.table("Leaderboard").select("hero_points").eq("player_id", pid)).data[0]['hero_points']
-                        safe_execute(supabase.table("Leaderboard").update({"hero_points": cur_h + pts}).eq("player_id", pid))
-                    except:
-                        safe_execute(supabase.table("Leaderboard").insert({"player_id": pid, "hero_points": pts}))
-                        
-                    try:
-                        cur_m = safe_execute(supabase.table("Monthly_God").select("monthly_points").eq("player_id", pid)).data[0]['monthly_points']
-                        safe_execute(supabase.table("Monthly_God").update({"monthly_points": cur_m + pts}).eq("player_id", pid))
-                    except:
-                        safe_execute(supabase.table("Monthly_God").insert({"player_id": pid, "monthly_points": pts}))
-                    
-                    # Log
-                    safe_execute(supabase.table("Tournament_Records").insert({
-                        "player_id": pid, "buy_in": buy, "rank": rank, "re_entries": re_e, "payout": payout, "filename": fn,
-                        "actual_fee": actual_fee,
-                        "time": datetime.now().isoformat()
-                    }))
-                
-                safe_execute(supabase.table("Import_History").insert({"filename": fn, "import_time": datetime.now().isoformat()}))
-                st.balloons(); st.success(f"✅ 成功匯入 {fn}")
+                bar = st.progress(0.0, text="精算中...")
+                t0 = time.perf_counter()
+                def index_chunk(p):
+                    names = {m['pf_id']: m['name'] for m in p['members']}
+                    rankings.apply_deltas("hero", p['hero'], "player_id", "hero_points", names)
+                    rankings.apply_deltas("monthly", p['monthly'], "player_id", "monthly_points", names)
+                    missions_engine.emit_many([(r['player_id'], "tournament_finish", {}) for r in p['records']])
+                report = import_files(db, [(u.name, u.getvalue()) for u in ups], on_progress=lambda d, n, row: bar.progress(d / n, text=f"{d}/{n} {row['檔案']}：{row['結果']}"), on_chunk=index_chunk)
+                invalidate_points()
+                failed = [r for r in report if r['結果'].startswith("失敗")]
+                if failed: st.error(f"⚠️ {len(failed)} 個檔案失敗，修正後重新上傳即可續傳")
+                else: st.balloons(); st.success(f"✅ 完成 {len(report)} 個檔案，耗時 {time.perf_counter() - t0:.2f} 秒")
+                st.dataframe(pd.DataFrame(report), hide_index=True)
 
             except Exception as e: st.error(f"匯入失敗: {e}")
 
-    with tabs[3]: # 系統設定
+
+    @kingdom_fragment("admin_system")
+    def admin_system(): # 系統設定
         if user_role == "老闆":
             st.subheader("⚙️ 遊戲參數設定")
             c1, c2, c3 = st.columns(3)
-            c1.number_input("輪盤 RTP", value=float(get_config('rtp_roulette', 0.95)), key='rtp_r')
-            c2.number_input("百家樂 RTP", value=float(get_config('rtp_baccarat', 0.95)), key='rtp_b')
-            c3.number_input("21點 RTP", value=float(get_config('rtp_blackjack', 0.95)), key='rtp_bj')
+            c1.number_input("輪盤 RTP", value=cfg.rtp['roulette'], key='rtp_r')
+            c2.number_input("百家樂 RTP", value=cfg.rtp['baccarat'], key='rtp_b')
+            c3.number_input("21點 RTP", value=cfg.rtp['blackjack'], key='rtp_bj')
             
             if st.button("保存遊戲參數"):
-                set_config('rtp_roulette', st.session_state.rtp_r)
-                set_config('rtp_baccarat', st.session_state.rtp_b)
-                set_config('rtp_blackjack', st.session_state.rtp_bj)
+                set_configs({'rtp_roulette': st.session_state.rtp_r, 'rtp_baccarat': st.session_state.rtp_b, 'rtp_blackjack': st.session_state.rtp_bj})
                 st.success("已更新")
 
+            with st.expander("🎲 RTP 模擬報告 (蒙地卡羅)"):
+                c1, c2, c3 = st.columns([2, 1, 1])
+                mc_rounds = c1.select_slider("每組注單局數", [10**5, 10**6, 10**7], value=10**6, format_func=lambda v: f"{v:,}")
+                mc_seed = c2.number_input("種子", value=1, step=1)
+                if c3.button("▶️ 執行模擬"):
+                    try: inv = safe_execute(db.table("Inventory").select("item_name, item_value, mall_price, weight").gt("stock", 0).in_("target_market", ["Wheel", "Both"])).data
+                    except: inv = []
+                    # 轉盤獎品未設 item_value 時以商城價計值
+                    items = [{"item_name": i['item_name'], "item_value": i.get('item_value') or i.get('mall_price') or 0, "weight": i.get('weight') or 10} for i in inv]
+                    st.session_state.rtp_report = rtp_report(tuple(sorted(cfg.rtp.items())), mc_rounds, int(mc_seed), items, cfg.min_bet_wheel)
+                if 'rtp_report' in st.session_state:
+                    st.dataframe(st.session_state.rtp_report, hide_index=True)
+                st.caption("輪盤 / 百家樂 / 21點依設定 RTP 控制 (21點以最佳策略期望值調整開局)；掃雷固定 0.97 係數。CLI：python -m engine.montecarlo --rounds 10000000")
+
             st.write("---")
             # [修復] 每日簽到設定
             st.subheader("📅 每日簽到設定")
             c_min, c_max = st.columns(2)
-            new_cmin = c_min.number_input("最小獎勵", value=int(get_config('checkin_min', 10)))
-            new_cmax = c_max.number_input("最大獎勵", value=int(get_config('checkin_max', 500)))
+            new_cmin = c_min.number_input("最小獎勵", value=cfg.checkin_min)
+            new_cmax = c_max.number_input("最大獎勵", value=cfg.checkin_max)
             if st.button("保存簽到設定"):
-                set_config('checkin_min', new_cmin)
-                set_config('checkin_max', new_cmax)
+                set_configs({'checkin_min': new_cmin, 'checkin_max': new_cmax})
                 st.success("已更新")
 
             st.write("---")
             st.subheader("🎨 卡片與排位設定")
             c1, c2, c3, c4 = st.columns(4)
-            rc = c1.number_input("菁英分數", value=int(get_config('rank_limit_challenger', 1000)))
-            rm = c2.number_input("大師分數", value=int(get_config('rank_limit_master', 500)))
-            rd = c3.number_input("鑽石分數", value=int(get_config('rank_limit_diamond', 200)))
-            rp = c4.number_input("白金分數", value=int(get_config('rank_limit_platinum', 80)))
+            rc = c1.number_input("菁英分數", value=cfg.rank_limits[0])
+            rm = c2.number_input("大師分數", value=cfg.rank_limits[1])
+            rd = c3.number_input("鑽石分數", value=cfg.rank_limits[2])
+            rp = c4.number_input("白金分數", value=cfg.rank_limits[3])
             
-            rank_desc = st.text_area("排位卡背面說明", value=get_config('rank_card_desc', '排位與積分規則說明...'))
-            vip_desc = st.text_area("VIP 卡背面說明", value=get_config('vip_card_desc', 'VIP 權益說明...'))
+            rank_desc = st.text_area("排位卡背面說明", value=cfg.get('rank_card_desc', '排位與積分規則說明...'))
+            vip_desc = st.text_area("VIP 卡背面說明", value=cfg.get('vip_card_desc', 'VIP 權益說明...'))
             
             if st.button("保存排位與卡片設定"):
-                set_config('rank_limit_challenger', rc)
-                set_config('rank_limit_master', rm)
-                set_config('rank_limit_diamond', rd)
-                set_config('rank_limit_platinum', rp)
-                set_config('rank_card_desc', rank_desc)
-                set_config('vip_card_desc', vip_desc)
+                set_configs({'rank_limit_challenger': rc, 'rank_limit_master': rm, 'rank_limit_diamond': rd, 'rank_limit_platinum': rp,
+                             'rank_card_desc': rank_desc, 'vip_card_desc': vip_desc})
                 st.success("設定已更新")
                 
             st.write("---")
             # [修復] 賽季結算與重置
             st.subheader("🗑️ 賽季結算與重置")
-            scheme = st.selectbox("結算方案", ["方案A: 全扣150", "方案B: 扣10%", "軟重置: 保留40%"])
+            schemes = {"方案A: 全扣150": "A", "方案B: 扣10%": "B", "軟重置: 保留40%": "soft"}
+            c_s1, c_s2 = st.columns(2)
+            scheme = c_s1.selectbox("結算方案", list(schemes))
+            season_label = c_s2.text_input("賽季名稱 (封存用，不可重複)", value=f"S{datetime.now().strftime('%Y%m%d')}")
             if st.button("執行賽季結算"):
                 try:
-                    all_lb = safe_execute(supabase.table("Leaderboard").select("*").neq("player_id", "330999")).data
-                    for p in all_lb:
-                        old_pts = p['hero_points']
-                        new_pts = old_pts
-                        if "方案A" in scheme: new_pts = max(0, old_pts - 150)
-                        elif "方案B" in scheme: new_pts = int(old_pts * 0.9)
-                        elif "軟重置" in scheme: new_pts = int(old_pts * 0.4)
-                        
-                        safe_execute(supabase.table("Leaderboard").update({"hero_points": new_pts}).eq("player_id", p['player_id']))
-                    st.success("賽季結算完成")
-                except: st.error("結算失敗")
+                    n = db.settle_season(schemes[scheme], season_label)
+                    rankings.boards["hero"].transform(SETTLEMENT_PY[schemes[scheme]]); invalidate_points()
+                    st.success(f"賽季結算完成：已封存 {n} 位玩家並套用 {scheme}")
+                except Exception as e: st.error(f"結算失敗 (賽季名稱可能已結算過): {e}")
+
+            c_m1, c_m2 = st.columns(2)
+            month_label = c_m1.text_input("月份名稱 (封存用，不可重複)", value=datetime.now().strftime('%Y-%m'))
+            if c_m2.button("🗓️ 月結：封存並清空月榜"):
+                try:
+                    n = db.rollover_month(month_label)
+                    rankings.boards["monthly"].clear(); invalidate_points()
+                    st.success(f"月結完成：已封存 {n} 位玩家")
+                except Exception as e: st.error(f"月結失敗 (月份名稱可能已封存過): {e}")
+
+            with st.expander("📚 歷屆賽季 / 月榜封存"):
+                try: runs = safe_execute(db.table("Settlement_Runs").select("*").order("id", desc=True).limit(50)).data
+                except: runs = []
+                if runs:
+                    run_opts = {f"{'賽季' if r['kind'] == 'season' else '月榜'} {r['label']} ({r['players']} 人)": r for r in runs}
+                    sel_run = run_opts[st.selectbox("選擇封存", list(run_opts))]
+                    try:
+                        if sel_run['kind'] == 'season':
+                            arc = safe_execute(db.table("Season_Archive").select("position, player_id, hero_points, new_points").eq("season_label", sel_run['label']).order("position").limit(100)).data
+                        else:
+                            arc = safe_execute(db.table("Monthly_Archive").select("position, player_id, monthly_points").eq("month_label", sel_run['label']).order("position").limit(100)).data
+                        st.dataframe(pd.DataFrame(arc), hide_index=True)
+                    except: st.error("查詢失敗")
+                else: st.info("尚無封存紀錄")
 
             st.write("---")
             st.markdown("### ⚖️ 上帝之手 (手動調整)")
@@ -1552,19 +1437,22 @@ if st.session_state.access_level in ["老闆", "店長", "員工"]:
             if c3.button("執行調整"):
                 try:
                     # 雙榜調整
-                    cur_h = safe_execute(supabase.table("Leaderboard").select("hero_points").eq("player_id", god_pid)).data[0]['hero_points']
-                    safe_execute(supabase.table("Leaderboard").update({"hero_points": cur_h + god_pts}).eq("player_id", god_pid))
+                    cur_h = safe_execute(db.table("Leaderboard").select("hero_points").eq("player_id", god_pid)).data[0]['hero_points']
+                    safe_execute(db.table("Leaderboard").update({"hero_points": cur_h + god_pts}).eq("player_id", god_pid))
                     
-                    cur_m = safe_execute(supabase.table("Monthly_God").select("monthly_points").eq("player_id", god_pid)).data[0]['monthly_points']
-                    safe_execute(supabase.table("Monthly_God").update({"monthly_points": cur_m + god_pts}).eq("player_id", god_pid))
-                    st.success("已調整")
+                    cur_m = safe_execute(db.table("Monthly_God").select("monthly_points").eq("player_id", god_pid)).data[0]['monthly_points']
+                    safe_execute(db.table("Monthly_God").update({"monthly_points": cur_m + god_pts}).eq("player_id", god_pid))
+                    rankings.boards["hero"].set(god_pid, cur_h + god_pts); rankings.boards["monthly"].set(god_pid, cur_m + god_pts)
+                    invalidate_points(); st.success("已調整")
                 except: st.error("玩家不存在或無積分紀錄")
             
             if c4.button("💥 歸零重置"):
                 try:
-                    safe_execute(supabase.table("Leaderboard").update({"hero_points": 0}).eq("player_id", god_pid))
-                    safe_execute(supabase.table("Monthly_God").update({"monthly_points": 0}).eq("player_id", god_pid))
-                    st.success("已歸零")
+                    safe_execute(db.table("Leaderboard").update({"hero_points": 0}).eq("player_id", god_pid))
+                    safe_execute(db.table("Monthly_God").update({"monthly_points": 0}).eq("player_id", god_pid))
+                    for b in ("hero", "monthly"):
+                        if rankings.boards[b].points(god_pid) is not None: rankings.boards[b].set(god_pid, 0)
+                    invalidate_points(); st.success("已歸零")
                 except: st.error("歸零失敗")
 
         st.write("---")
@@ -1576,33 +1464,60 @@ if st.session_state.access_level in ["老闆", "店長", "員工"]:
                 d = st.text_input("描述")
                 xp = st.number_input("獎勵 XP", 100)
                 tp = st.selectbox("類型", ["Daily", "Weekly", "Monthly"])
-                cr = st.selectbox("條件", ["daily_checkin", "consecutive_checkin", "daily_win"])
+                cr = st.selectbox("條件", CRITERIA)
                 val = st.number_input("目標值", 1)
                 
                 inv_items = ["無"]
                 try: 
-                    inv = safe_execute(supabase.table("Inventory").select("item_name")).data
+                    inv = safe_execute(db.table("Inventory").select("item_name")).data
                     inv_items += [i['item_name'] for i in inv]
                 except: pass
                 it = st.selectbox("獎勵物品", inv_items)
                 
                 if st.form_submit_button("新增"):
                     item_val = None if it == "無" else it
-                    safe_execute(supabase.table("Missions").insert({
+                    safe_execute(db.table("Missions").insert({
                         "title": t, "description": d, "reward_xp": xp, "type": tp, 
                         "target_criteria": cr, "target_value": val, "status": "Active", "reward_item": item_val
                     }))
+                    missions_engine.invalidate_missions()
                     st.success("任務已新增")
 
         # [新增] 老闆一鍵重置
         if user_role == "老闆":
             st.write("---")
+            st.subheader("📮 背景寫入佇列")
+            ob = outbox.stats()
+            o1, o2, o3, o4 = st.columns(4)
+            o1.metric("佇列深度", ob['depth']); o2.metric("最久等待 (秒)", ob['oldest_age_s'])
+            o3.metric("上批送出 (ms)", ob['last_flush_ms']); o4.metric("平均送出 (ms)", ob['avg_flush_ms'])
+            st.caption(f"已送出 {ob['sent']} 筆 / {ob['batches']} 批 / {ob['requests']} 次請求，重試 {ob['failed']} 筆，待處理失敗 {ob['dead']} 筆" + (f" | 最近錯誤: {ob['last_error']}" if ob['last_error'] else ""))
+            if ob['dead']:
+                with st.expander(f"☠️ 送出失敗 (已重試 {outbox.max_attempts} 次或玩家不存在)"):
+                    st.dataframe(pd.DataFrame(outbox.dead_letters()), hide_index=True)
+                    if st.button("🔁 全部重新排隊"): st.toast(f"已重新排隊 {outbox.requeue()} 筆")
+            with st.expander(f"⏱️ 區塊載入逾時紀錄 (預算 {cfg.section_budget_ms} ms)"):
+                slow = list(slow_sections())
+                if slow: st.dataframe(pd.DataFrame(slow[::-1]), hide_index=True)
+                else: st.caption("尚無逾時紀錄")
+            st.write("---")
             st.markdown("### 🧨 危險區域")
             if st.button("🔥 刪除所有玩家數據 (保留老闆)", type="primary"):
-                safe_execute(supabase.table("Prizes").delete().neq("player_id", "330999"))
-                safe_execute(supabase.table("Game_Transactions").delete().neq("player_id", "330999"))
-                safe_execute(supabase.table("Leaderboard").delete().neq("player_id", "330999"))
-                safe_execute(supabase.table("Monthly_God").delete().neq("player_id", "330999"))
-                safe_execute(supabase.table("Mission_Logs").delete().neq("player_id", "330999"))
-                safe_execute(supabase.table("Members").delete().neq("pf_id", "330999"))
-                st.toast("💥 所有測試數據已清除！")
\ No newline at end of file
+                safe_execute(db.table("Prizes").delete().neq("player_id", "330999"))
+                safe_execute(db.table("Game_Transactions").delete().neq("player_id", "330999"))
+                safe_execute(db.table("Leaderboard").delete().neq("player_id", "330999"))
+                safe_execute(db.table("Monthly_God").delete().neq("player_id", "330999"))
+                safe_execute(db.table("Mission_Logs").delete().neq("player_id", "330999"))
+                safe_execute(db.table("Progress_Counters").delete().not_.like("counter_key", "330999:%"))
+                missions_engine.reset()
+                safe_execute(db.table("Members").delete().neq("pf_id", "330999"))
+                invalidate_points(reload_rankings=True)
+                st.toast("💥 所有測試數據已清除！")
+
+    ADMIN_SECTIONS = {
+        "counter": ("💰 櫃台與物資", admin_counter), "staff": ("👥 人員與空投", admin_staff),
+        "data": ("📊 賽事與數據", admin_data), "system": ("🛠️ 系統與維護", admin_system),
+    }
+    admin_sum = dict(admin_counts())
+    if outbox.depth(): admin_sum["system"] = f"· 佇列 {outbox.depth()}"
+    ADMIN_SECTIONS[section_nav("nav_admin", ADMIN_SECTIONS, admin_sum)][1]()
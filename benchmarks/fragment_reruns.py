@@ -0,0 +1,103 @@
+"""片段重跑基準：同一組掃雷操作，比較「整頁重跑」與「只重跑遊戲片段」的後端往返次數與 CPU
+
+    python benchmarks/fragment_reruns.py [--players 2000] [--rounds 5]
+
+以暫存 SQLite 建立測試資料後用 streamlit AppTest 驅動 app.py。AppTest 不模擬片段重跑，每次互動都執行整頁
+(含點擊處理後的重跑)，因此同一次互動可同時量到：
+  改版前 = 整頁 (程序合計的往返次數與 CPU)
+  改版後 = tab_games 片段 (kingdom_fragment 累計值的增量，瀏覽器中只會重跑這一段)
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from streamlit.runtime.state.session_state import STREAMLIT_INTERNAL_KEY_PREFIX  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+import storage  # noqa: E402
+
+
+def seed(path, players):
+    db = storage.SQLiteStorage(path)
+    db.table("Members").upsert({"pf_id": storage.HOUSE_ID, "name": "Boss", "password": "x", "role": "老闆", "xp": 10 ** 9}).execute()
+    db.table("Members").insert([{"pf_id": f"p{i}", "name": f"玩家{i}", "password": "x", "role": "玩家", "xp": 10 ** 6} for i in range(players)]).execute()
+    db.bulk_add("Leaderboard", "player_id", [{"player_id": f"p{i}", "hero_points": random.randint(0, 1500)} for i in range(players)], upsert=True)
+    db.bulk_add("Monthly_God", "player_id", [{"player_id": f"p{i}", "monthly_points": random.randint(0, 300)} for i in range(players)], upsert=True)
+    for i in range(10):
+        db.table("Missions").insert({"title": f"任務{i}", "description": "", "reward_xp": 100, "type": "Daily",
+                                     "target_criteria": "daily_win", "target_value": 3, "status": "Active"}).execute()
+    for i in range(30):
+        db.table("Inventory").insert({"item_name": f"商品{i}", "stock": 10, "mall_price": 100 * i, "target_market": "Both"}).execute()
+
+
+def trigger(at, event, value):
+    """AppTest 沒有下注盤元件的操作介面，直接送出元件的觸發值 (與瀏覽器送出的格式相同)"""
+    ws = at._tree.get_widget_states()
+    w = ws.widgets.add()
+    w.id = f"{STREAMLIT_INTERNAL_KEY_PREFIX}_{at.get('bidi_component')[0].proto.id}__events"
+    w.json_trigger_value = json.dumps([{"event": event, "value": value}])
+    at._run(ws)
+
+
+def click(at, label=None, reveal=None):
+    before = dict(at.session_state["fragment_stats"]["tab_games"])
+    n0, c0 = storage.round_trips(all_threads=True), time.process_time()
+    if reveal is not None: trigger(at, "reveal", reveal)
+    else: next(b for b in at.button if b.label == label).click().run()
+    full = {"db": storage.round_trips(all_threads=True) - n0, "cpu_ms": (time.process_time() - c0) * 1000}
+    if at.exception: raise RuntimeError(at.exception[0].value)
+    after = at.session_state["fragment_stats"]["tab_games"]
+    return full, {"db": after["db"] - before["db"], "cpu_ms": after["cpu_ms"] - before["cpu_ms"]}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--players", type=int, default=2000)
+    ap.add_argument("--rounds", type=int, default=5)
+    ap.add_argument("--role", default="老闆", help="老闆 會同時渲染指揮部 (最壞情況)")
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, "bench.db")
+    seed(path, args.players)
+    db = storage.SQLiteStorage(path)
+
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=120)
+    at.secrets["storage"] = {"engine": "sqlite", "path": path}
+    at.secrets["outbox"] = {"path": os.path.join(tmp, "outbox.db")}
+    at.session_state.player_id = storage.HOUSE_ID if args.role == "老闆" else "p1"
+    at.session_state.nav_player = "games"
+    at.session_state.access_level = args.role
+    at.run()
+
+    full, frag = [], []
+    for _ in range(args.rounds):
+        at.session_state.current_game = "lobby"; at.run()
+        for label in ("進入 掃雷", "🚀 開始"):
+            f, g = click(at, label=label); full.append(f); frag.append(g)
+        # 點到爆炸或點完安全格為止 (盤面在伺服器端的 Mines_Games)
+        for i in range(25):
+            row = db.table("Mines_Games").select("*").eq("player_id", at.session_state.player_id).execute().data[0]
+            if row["status"] != "active": break
+            f, g = click(at, reveal=i); full.append(f); frag.append(g)
+        if row["status"] == "active": next(b for b in at.button if b.label == "💰 結算領錢").click().run()
+        else: next(b for b in at.button if b.label == "🔄 再來一局").click().run()
+
+    def row(name, xs):
+        return f"{name:<22}{statistics.mean(x['db'] for x in xs):>10.1f}{statistics.mean(x['cpu_ms'] for x in xs):>12.1f}"
+    print(f"{len(full)} 次遊戲互動，{args.players} 位玩家，身分 {args.role}")
+    print(f"{'':<22}{'DB 往返':>10}{'CPU ms':>12}")
+    print(row("改版前 (整頁重跑)", full))
+    print(row("改版後 (遊戲片段)", frag))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""清單渲染基準：任務 / 商城 / 背包 / 榜單 各區塊送出的前端元素 (delta) 數與執行時間
+
+    python benchmarks/list_render.py [--prizes 500] [--items 60] [--missions 20] [--runs 3]
+
+以暫存 SQLite 建立測試資料後用 streamlit AppTest 只開啟指定區塊 (nav_player)，
+計算該次執行送出的元素數 (元素樹的節點數)、區塊片段的 CPU 時間與整頁執行時間 (中位數)。
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+import storage  # noqa: E402
+
+SECTIONS = ["missions", "mall", "backpack", "boards"]
+
+
+def seed(path, args):
+    db = storage.SQLiteStorage(path)
+    db.table("Members").upsert({"pf_id": "p1", "name": "玩家1", "password": "x", "role": "玩家", "xp": 10 ** 6}).execute()
+    db.table("Members").insert([{"pf_id": f"p{i}", "name": f"玩家{i}", "password": "x", "role": "玩家", "xp": 0} for i in range(2, 500)]).execute()
+    db.bulk_add("Leaderboard", "player_id", [{"player_id": f"p{i}", "hero_points": random.randint(0, 1500)} for i in range(1, 500)], upsert=True)
+    db.bulk_add("Monthly_God", "player_id", [{"player_id": f"p{i}", "monthly_points": random.randint(0, 300)} for i in range(1, 500)], upsert=True)
+    for i in range(args.missions):
+        db.table("Missions").insert({"title": f"任務{i}", "description": "說明", "reward_xp": 100, "type": "Daily",
+                                     "target_criteria": "daily_win", "target_value": 3, "status": "Active"}).execute()
+    db.table("Inventory").insert([{"item_name": f"商品{i}", "stock": 10, "mall_price": 100 * i, "vip_price": 10 * (i % 3),
+                                   "target_market": "Both", "mall_min_tier": i % 3} for i in range(args.items)]).execute()
+    db.table("Prizes").insert([{"player_id": "p1", "prize_name": f"獎品{i}", "status": "待兌換", "time": "2026-01-01T00:00:00",
+                                "expire_at": "無期限", "source": "Wheel"} for i in range(args.prizes)]).execute()
+
+
+def count_nodes(node):
+    kids = getattr(node, "children", None) or {}
+    return 1 + sum(count_nodes(c) for c in kids.values())
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--prizes", type=int, default=500)
+    ap.add_argument("--items", type=int, default=60)
+    ap.add_argument("--missions", type=int, default=20)
+    ap.add_argument("--runs", type=int, default=3)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, "bench.db")
+    seed(path, args)
+
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=300)
+    at.secrets["storage"] = {"engine": "sqlite", "path": path}
+    at.secrets["outbox"] = {"path": os.path.join(tmp, "outbox.db")}
+    at.session_state.player_id = "p1"
+    at.session_state.access_level = "玩家"
+
+    print(f"任務 {args.missions} / 商品 {args.items} / 背包 {args.prizes} 筆")
+    print(f"{'區塊':<12}{'元素數':>8}{'片段 CPU ms':>14}{'整頁 ms':>10}")
+    for sec in SECTIONS:
+        at.session_state.nav_player = sec
+        ms, cpu = [], []
+        for _ in range(args.runs):
+            before = at.session_state["fragment_stats"].get(f"tab_{sec}", {}).get("cpu_ms", 0.0) if "fragment_stats" in at.session_state else 0.0
+            t0 = time.perf_counter(); at.run(); ms.append((time.perf_counter() - t0) * 1000)
+            if at.exception: raise RuntimeError(at.exception[0].value)
+            cpu.append(at.session_state["fragment_stats"][f"tab_{sec}"]["cpu_ms"] - before)
+        print(f"{sec:<12}{count_nodes(at._tree):>8}{statistics.median(cpu):>14.1f}{statistics.median(ms):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""重跑傳輸量基準：每次重跑送到瀏覽器的元素 protobuf 位元組數 (主題樣式 / 跑馬燈 / 各區塊)
+
+    python benchmarks/rerun_payload.py [--runs 3]
+
+以暫存 SQLite 建立少量資料後用 streamlit AppTest 依序開啟各區塊，加總元素樹中每個元素的 proto 大小。
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+import storage  # noqa: E402
+
+SECTIONS = ["rank", "missions", "games", "mall", "backpack", "boards"]
+
+
+def seed(path):
+    db = storage.SQLiteStorage(path)
+    db.table("Members").upsert({"pf_id": "p1", "name": "玩家1", "password": "x", "role": "玩家", "xp": 10 ** 6}).execute()
+    db.table("Leaderboard").upsert({"player_id": "p1", "hero_points": 300}).execute()
+    db.table("Missions").insert({"title": "每日勝場", "description": "", "reward_xp": 100, "type": "Daily",
+                                 "target_criteria": "daily_win", "target_value": 3, "status": "Active"}).execute()
+    db.table("Inventory").insert([{"item_name": f"商品{i}", "stock": 10, "mall_price": 100 * i, "target_market": "Both"} for i in range(6)]).execute()
+
+
+def walk(node):
+    yield node
+    for c in (getattr(node, "children", None) or {}).values(): yield from walk(c)
+
+
+def payload_bytes(at):
+    total = 0
+    for n in walk(at._tree):
+        proto = getattr(n, "proto", None)
+        if proto is not None and hasattr(proto, "ByteSize"): total += proto.ByteSize()
+    return total
+
+
+def theme_bytes(at):
+    """主題相關 (style / link 與跑馬燈) 的 markdown 元素"""
+    return sum(m.proto.ByteSize() for m in at.markdown if "<style" in m.value or "stylesheet" in m.value or "marquee" in m.value)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=3)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, "bench.db")
+    seed(path)
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=120)
+    at.secrets["storage"] = {"engine": "sqlite", "path": path}
+    at.secrets["outbox"] = {"path": os.path.join(tmp, "outbox.db")}
+    at.session_state.player_id = "p1"
+    at.session_state.access_level = "玩家"
+
+    print(f"{'區塊':<12}{'整頁 bytes':>12}{'主題 bytes':>12}")
+    for sec in SECTIONS:
+        at.session_state.nav_player = sec
+        for _ in range(args.runs): at.run()
+        if at.exception: raise RuntimeError(at.exception[0].value)
+        print(f"{sec:<12}{payload_bytes(at):>12,}{theme_bytes(at):>12,}")
+
+
+if __name__ == "__main__":
+    main()
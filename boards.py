@@ -0,0 +1,142 @@
+"""下注盤元件 (雙向 components.v2)：選籌碼、疊注、刪注都在瀏覽器完成，只有送出動作才回傳伺服器
+
+輪盤 spin / 百家樂 deal 帶整張注單，掃雷 reveal 帶格子編號；每局只觸發一次重跑。
+注單以 data.round 區分局數：round 改變時前端以 data.bets 重新初始化。
+"""
+from engine import roulette
+
+# 外圍注按列排版 (key 與 engine.roulette.OUTSIDE 相同)
+ROULETTE_OUTSIDE = [
+    [["1st12", "第一打 1-12"], ["2nd12", "第二打 13-24"], ["3rd12", "第三打 25-36"]],
+    [["col1", "第一行 2:1"], ["col2", "第二行 2:1"], ["col3", "第三行 2:1"]],
+    [["1-18", "1-18"], ["紅色", "🔴 紅色"], ["黑色", "⚫ 黑色"], ["19-36", "19-36"]],
+    [["Odd", "單數"], ["Even", "雙數"]],
+]
+ROULETTE_KEYS = set(roulette.KEYS)
+BACCARAT_ZONES = [["P", "🔵 閒", "1:1", "player"], ["B", "🔴 莊", "1:0.95", "banker"], ["T", "🟢 和", "1:8", "tie"],
+                  ["PP", "🔵 閒對", "1:11", "pair"], ["BP", "🔴 莊對", "1:11", "pair"]]
+BACCARAT_KEYS = {z[0] for z in BACCARAT_ZONES}
+CHIPS = [100, 500, 1000, 5000, 10000]
+
+
+def clean_slip(raw, allowed):
+    """前端送來的注單不可信：只留允許的下注目標與正整數金額"""
+    out = {}
+    if not isinstance(raw, dict): return out
+    for k, v in raw.items():
+        try: v = int(v)
+        except (TypeError, ValueError): continue
+        if str(k) in allowed and v > 0: out[str(k)] = v
+    return out
+
+
+_CSS = """
+.kb { font-family: sans-serif; color: #FFF; }
+.kb button { cursor: pointer; font-weight: bold; border-radius: 8px; border: 1px solid #555; background: #222; color: #FFF; padding: 8px 4px; }
+.kb button:hover { border-color: #FFD700; }
+.kb .chips { display: flex; gap: 6px; margin-bottom: 8px; }
+.kb .chips button { flex: 1; border-radius: 20px; }
+.kb .chips button.on { background: #FFD700; color: #000; }
+.kb .bar { display: flex; gap: 8px; align-items: center; margin: 8px 0; }
+.kb .bar .info { flex: 1; background: #0b2a3d; border-radius: 8px; padding: 8px; }
+.kb .go { background: #FF4B4B; border-color: #FF4B4B; padding: 10px 18px; }
+.kb .go:disabled { opacity: 0.4; cursor: default; }
+.kb .stake { display: block; font-size: 0.8em; color: #FFD700; min-height: 1em; }
+.kb .grid { display: grid; grid-template-columns: repeat(3, 1fr); gap: 4px; }
+.kb .grid .red { background: #7a0000; } .kb .grid .black { background: #111; } .kb .zero { width: 100%; background: #006400; margin-bottom: 4px; }
+.kb .row { display: grid; grid-auto-columns: 1fr; grid-auto-flow: column; gap: 4px; margin-top: 4px; }
+.kb .pot { color: #AAA; font-size: 0.85em; margin: -4px 0 8px; }
+.kb .zones { display: grid; grid-template-columns: repeat(5, 1fr); gap: 6px; }
+.kb .zone { min-height: 110px; border-width: 2px; background: rgba(0,0,0,0.3); }
+.kb .zone.player { border-color: #00BFFF; } .kb .zone.banker { border-color: #FF4444; } .kb .zone.tie { border-color: #00FF00; } .kb .zone.pair { border-color: #AAA; }
+.kb .zone b { display: block; font-size: 1.5em; margin-top: 6px; }
+.kb .mines { display: grid; grid-template-columns: repeat(5, 1fr); gap: 8px; }
+.kb .mines button { aspect-ratio: 1; font-size: 1.5em; }
+.kb .mines .safe { background: #050; border-color: #0F0; } .kb .mines .boom { background: #500; border-color: #F00; }
+"""
+
+# 注單狀態掛在 parentElement 上，重跑時保留；局數改變才重設
+_SLIP_JS = """
+function slip(host, data) {
+  if (!host.__kb || host.__kb.round !== data.round) host.__kb = { round: data.round, chip: data.chips[0], bets: { ...(data.bets || {}) } };
+  return host.__kb;
+}
+function root(host) {
+  let el = host.querySelector('.kb');
+  if (!el) { el = document.createElement('div'); el.className = 'kb'; host.appendChild(el); }
+  return el;
+}
+function chipRow(s) {
+  return '<div class="chips">' + s.__chips.map(c => `<button data-chip="${c}" class="${c === s.chip ? 'on' : ''}">${c}</button>`).join('') + '</div>';
+}
+function total(s) { return Object.values(s.bets).reduce((a, b) => a + b, 0); }
+function bar(s, label) {
+  return `<div class="bar"><span class="info">💰 總下注: ${total(s)} | 籌碼: ${s.chip}</span><button data-act="clear">🗑️ 清空</button>` +
+         `<button class="go" data-act="go" ${total(s) ? '' : 'disabled'}>${label}</button></div>`;
+}
+function wire(el, s, draw, go) {
+  el.onclick = (e) => {
+    const b = e.target.closest('button'); if (!b || b.disabled) return;
+    if (b.dataset.chip) s.chip = Number(b.dataset.chip);
+    else if (b.dataset.bet) s.bets[b.dataset.bet] = (s.bets[b.dataset.bet] || 0) + s.chip;
+    else if (b.dataset.act === 'clear') s.bets = {};
+    else if (b.dataset.act === 'go') return go({ ...s.bets });
+    draw();
+  };
+}
+"""
+
+ROULETTE_JS = _SLIP_JS + """
+export default function ({ data, parentElement, setTriggerValue }) {
+  const s = slip(parentElement, data); s.__chips = data.chips;
+  const el = root(parentElement);
+  const cell = (k, label, cls) => `<button data-bet="${k}" class="${cls || ''}">${label}<span class="stake">${s.bets[k] || ''}</span></button>`;
+  // 可贏金額：派彩矩陣每欄 = [倍數, 命中號碼]，與伺服器結算同一張表
+  const pot = () => {
+    const win = new Array(37).fill(0);
+    for (const [k, amt] of Object.entries(s.bets)) { const [m, hits] = data.table[k]; hits.forEach(n => win[n] += amt * m); }
+    const t = total(s), best = Math.max(...win), paid = win.filter(v => v > 0).length;
+    return t ? `<div class="pot">最高可贏 ${best} · ${paid}/37 個號碼有派彩 · ${win.filter(v => v > t).length} 個號碼獲利</div>` : '';
+  };
+  const draw = () => {
+    let grid = '';
+    for (let n = 1; n <= 36; n++) grid += cell(String(n), n, data.red.includes(n) ? 'red' : 'black');
+    el.innerHTML = chipRow(s) + bar(s, '🚀 旋轉 (SPIN)') + pot() + cell('0', '0 (1:35)', 'zero') + `<div class="grid">${grid}</div>` +
+      data.outside.map(row => '<div class="row">' + row.map(([k, label]) => cell(k, label)).join('') + '</div>').join('');
+  };
+  wire(el, s, draw, (bets) => setTriggerValue('spin', bets));
+  draw();
+}
+"""
+
+BACCARAT_JS = _SLIP_JS + """
+export default function ({ data, parentElement, setTriggerValue }) {
+  const s = slip(parentElement, data); s.__chips = data.chips;
+  const el = root(parentElement);
+  const draw = () => {
+    el.innerHTML = chipRow(s) + '<div class="zones">' + data.zones.map(([k, label, odds, cls]) =>
+      `<button class="zone ${cls}" data-bet="${k}">${label} (${odds})<b>${s.bets[k] || 0}</b></button>`).join('') + '</div>' + bar(s, '💰 發牌 (Deal)');
+  };
+  wire(el, s, draw, (bets) => setTriggerValue('deal', bets));
+  draw();
+}
+"""
+
+MINES_JS = """
+export default function ({ data, parentElement, setTriggerValue }) {
+  let el = parentElement.querySelector('.kb');
+  if (!el) { el = document.createElement('div'); el.className = 'kb'; parentElement.appendChild(el); }
+  const look = { hidden: ['❓', ''], safe: ['💎', 'safe'], boom: ['💥', 'boom'], mine: ['💣', ''] };
+  el.innerHTML = '<div class="mines">' + data.cells.map((c, i) =>
+    `<button data-i="${i}" class="${look[c][1]}" ${c !== 'hidden' || data.locked ? 'disabled' : ''}>${look[c][0]}</button>`).join('') + '</div>';
+  el.onclick = (e) => {
+    const b = e.target.closest('button'); if (!b || b.disabled) return;
+    el.querySelectorAll('button').forEach(x => x.disabled = true);
+    setTriggerValue('reveal', Number(b.dataset.i));
+  };
+}
+"""
+
+ROULETTE = {"css": _CSS, "js": ROULETTE_JS}
+BACCARAT = {"css": _CSS, "js": BACCARAT_JS}
+MINES = {"css": _CSS, "js": MINES_JS}
@@ -0,0 +1,38 @@
+"""遊戲引擎：純規則 + 明確的狀態物件 + 可指定種子的亂數，不碰 Streamlit / 資料庫
+
+每個遊戲模組提供 play(rng, strategy, **rules) → (下注, 派彩)，與畫面使用同一組規則函式；
+simulate() 以此批次跑局數 (壓測 / 派彩驗證)。app.py 只負責收注單、扣款入帳與畫面。
+    strategy：玩家決策 (注單、停牌點數、翻格數…)，各模組 STRATEGY 為預設值
+    rules：莊家設定 (rtp、轉盤獎項…)
+"""
+import random
+import time
+
+from . import baccarat, blackjack, mines, roulette, wheel
+
+GAMES = {"mines": mines, "wheel": wheel, "blackjack": blackjack, "baccarat": baccarat, "roulette": roulette}
+
+
+def rng(seed=None):
+    """seed 為 None 時取系統亂數；同一種子重現同一串局面"""
+    return random.Random(seed)
+
+
+def simulate(game, strategy=None, n_rounds=100_000, seed=None, **rules):
+    """跑 n_rounds 局，回傳 {game, rounds, wagered, paid, rtp, hit_rate, seconds, rounds_per_min}
+
+    hit_rate 為派彩大於下注的局數比例。
+    """
+    mod = GAMES[game]
+    strategy = {**mod.STRATEGY, **(strategy or {})}
+    play, r = mod.play, rng(seed)
+    wagered = paid = hits = 0
+    t0 = time.perf_counter()
+    for _ in range(n_rounds):
+        bet, win = play(r, strategy, **rules)
+        wagered += bet; paid += win
+        if win > bet: hits += 1
+    secs = time.perf_counter() - t0
+    return {"game": game, "rounds": n_rounds, "wagered": wagered, "paid": paid,
+            "rtp": paid / wagered if wagered else 0.0, "hit_rate": hits / n_rounds if n_rounds else 0.0,
+            "seconds": secs, "rounds_per_min": n_rounds / secs * 60 if secs else 0.0}
@@ -0,0 +1,291 @@
+"""百家樂：8 副牌靴 (各點數剩餘張數的計數陣列 + 切牌)，完整補牌規則，依目前牌靴組成精算各注機率
+
+牌以點數牌 1..13 表示 (10/J/Q/K 計 0 點)；發牌順序 閒、莊、閒、莊，第 5 / 6 張為補牌。
+odds() 以組合計算 (閒 / 莊 / 和) × 閒對 × 莊對 的聯合機率 (約 1 ms，依牌靴組成快取)，給玩家看剩餘牌靴機率。
+rtp 控制：以去牌效應線性模型 approx_odds() 每局 O(1) 估出聯合機率，解析算出「會贏的局改發成不贏」的機率 β；
+改發時由聯合機率直接抽一個不贏的結果，再依該結果的條件分佈發出牌面，不重發碰運氣。
+"""
+import weakref
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+import numpy as np
+
+DECKS = 8
+RANKS = 13
+CUT = 16                        # 切牌：剩餘張數 ≤ 16 時下一局前換新牌靴
+PAYOUT = {"P": 2, "B": 1.95, "T": 9, "PP": 12, "BP": 12}
+WINNERS = ("P", "B", "T")
+STRATEGY = {"bets": {"B": 100}}
+
+POINT = [0] + [r if r < 10 else 0 for r in range(1, RANKS + 1)]      # POINT[點數牌]
+
+
+def _banker_draws(b, t):
+    """莊家補牌表：b = 莊家兩張點數，t = 閒家第三張點數 (閒家未補為 None)"""
+    if t is None: return b <= 5
+    return b <= 2 or (b == 3 and t != 8) or (b == 4 and 2 <= t <= 7) or (b == 5 and 4 <= t <= 7) or (b == 6 and t in (6, 7))
+
+
+# BANKER_DRAW[莊家點數][閒家第三張點數，10 = 閒家未補]
+BANKER_DRAW = [[_banker_draws(b, t if t < 10 else None) for t in range(11)] for b in range(10)]
+
+
+@dataclass
+class Shoe:
+    counts: list = field(default_factory=lambda: [4 * DECKS] * RANKS)     # counts[r - 1] = 點數牌 r 剩餘張數
+    hands: int = 0              # 本牌靴已發局數
+
+    @property
+    def remaining(self): return sum(self.counts)
+
+    @property
+    def spent(self): return self.remaining <= CUT
+
+    def encode(self):
+        return ",".join(map(str, self.counts)) + f";{self.hands}"
+
+    @classmethod
+    def decode(cls, s):
+        """讀回 encode() 的字串；空白或格式不符時給新牌靴"""
+        try:
+            counts, hands = (s or "").split(";")
+            counts = [int(c) for c in counts.split(",")]
+            if len(counts) == RANKS and all(0 <= c <= 4 * DECKS for c in counts): return cls(counts, int(hands))
+        except ValueError: pass
+        return cls()
+
+
+@dataclass
+class BaccaratRound:
+    player: list
+    banker: list
+    p_val: int
+    b_val: int
+    winner: str                     # P / B / T
+    pp: bool
+    bp: bool
+    payout: int = 0
+    shuffled: bool = False          # 本局前換了新牌靴
+
+
+def point(hand):
+    return sum(POINT[c] for c in hand) % 10
+
+
+def _draw(rng, counts):
+    i = rng.randrange(sum(counts))
+    for r, c in enumerate(counts):
+        if i < c: counts[r] -= 1; return r + 1
+        i -= c
+
+
+def _finish(p, b, draw):
+    """前 4 張之後依補牌規則由 draw() 補牌並判定勝負"""
+    pv, bv = point(p), point(b)
+    if pv < 8 and bv < 8:
+        t = 10
+        if pv <= 5: p.append(draw()); t = POINT[p[2]]
+        if BANKER_DRAW[bv][t]: b.append(draw())
+        pv, bv = point(p), point(b)
+    winner = "P" if pv > bv else ("B" if bv > pv else "T")
+    return BaccaratRound(p, b, pv, bv, winner, p[0] == p[1], b[0] == b[1])
+
+
+def coup(rng, counts):
+    """從計數陣列 counts (會被扣除) 發出一局"""
+    p1, b1, p2, b2 = (_draw(rng, counts) for _ in range(4))
+    return _finish([p1, p2], [b1, b2], lambda: _draw(rng, counts))
+
+
+def settle(bets, winner, pp, bp):
+    """和局退回閒 / 莊本金；莊贏抽水後取整"""
+    g = bets.get
+    win = {"P": g("P", 0) * 2, "B": int(g("B", 0) * PAYOUT["B"]), "T": g("T", 0) * 9 + g("P", 0) + g("B", 0)}[winner]
+    return win + pp * g("PP", 0) * 12 + bp * g("BP", 0) * 12
+
+
+def payout(bets, r):
+    return settle(bets, r.winner, r.pp, r.bp)
+
+
+# --- 精算：勝負只看前 4 張的閒 / 莊點數 (100 類) 與第 5 / 6 張點數，勝負表只建一次 ---
+@lru_cache(maxsize=1)
+def _tables():
+    p1, b1, p2, b2 = (a.reshape(-1) for a in np.meshgrid(*[np.arange(10)] * 4, indexing="ij"))
+    pv, bv = (p1 + p2) % 10, (b1 + b2) % 10
+    order = np.argsort(pv * 10 + bv, kind="stable")                                # 依 (閒點, 莊點) 分成 100 組，每組 100 種前 4 張
+    removed = np.stack([(np.stack([p1, b1, p2, b2]) == v).sum(axis=0) for v in range(10)], axis=1)[order].astype(float)
+    # table[組, 第 5 張, 勝方, 第 6 張] = 1 / 0
+    g_pv, g_bv, c5, c6 = np.ix_(np.arange(10), np.arange(10), np.arange(10), np.arange(10))
+    play = (g_pv < 8) & (g_bv < 8)
+    p_draw = play & (g_pv <= 5)
+    b_draw = play & np.array(BANKER_DRAW)[g_bv, np.where(p_draw, c5, 10)]
+    pf = np.where(p_draw, (g_pv + c5) % 10, g_pv)
+    bf = np.where(b_draw, (g_bv + np.where(p_draw, c6, c5)) % 10, g_bv)
+    pf, bf = np.broadcast_arrays(pf, bf)
+    out = np.where(pf > bf, 0, np.where(bf > pf, 1, 2)).reshape(100, 10, 10)
+    table = np.stack([out == w for w in range(3)], axis=2).astype(float)          # (100, 10, 3, 10)
+    diag = np.einsum("kswt->kstw", table)[:, np.arange(10), np.arange(10)]         # 第 5 / 6 張同點數 (100, 10, 3)
+    # 點數牌層級的前 4 張 (對子要同點數牌，不只同點數)
+    ranks = np.array(np.meshgrid(*[np.arange(RANKS)] * 4, indexing="ij")).reshape(4, -1).T
+    rpt = np.array(POINT[1:])[ranks]
+    combo = ((rpt[:, 0] * 10 + rpt[:, 1]) * 10 + rpt[:, 2]) * 10 + rpt[:, 3]
+    where = np.empty(10 ** 4, dtype=np.int64); where[order] = np.arange(10 ** 4)
+    dup = np.stack([(ranks[:, :k] == ranks[:, [k]]).sum(axis=1) for k in range(4)], axis=1)
+    pair = (ranks[:, 0] == ranks[:, 2]) * 2 + (ranks[:, 1] == ranks[:, 3])         # 閒對 ×2 + 莊對
+    return removed, table, diag, ranks, where[combo], ranks * 4 + dup, pair
+
+
+def _first_four(counts, w=slice(None)):
+    """(win, p4)：win[前 4 張點數組合, 勝方 w] = 該組合下 w 勝的條件機率，p4[點數牌組合] = 前 4 張機率"""
+    removed, table, diag, ranks, row, pick, pair = _tables()
+    n = sum(counts)
+    by_point = np.zeros(10)
+    for r, c in enumerate(counts): by_point[POINT[r + 1]] += c
+    # P(勝方 | 前 4 張) = Σ rest[s] (rest[t] - [s = t]) / ((n-4)(n-5))，每組一次矩陣乘法；
+    # 前 4 張用掉不存在的牌時 rest 為負，但該組合的 p4 為 0，不必截斷
+    rest = (by_point - removed).reshape(100, 100, 10)
+    t, d = table[:, :, w], diag[:, :, w]
+    win = np.einsum("kcws,kcs->kcw", (rest @ t.reshape(100, 10, -1)).reshape(100, 100, -1, 10), rest) - rest @ d
+    ff = np.clip(np.asarray(counts, dtype=float)[:, None] - np.arange(4), 0, None).ravel()
+    p4 = ff[pick].prod(axis=1) / (n * (n - 1) * (n - 2) * (n - 3))
+    return win.reshape(10 ** 4, -1) / ((n - 4) * (n - 5)), p4
+
+
+@lru_cache(maxsize=512)
+def odds(counts):
+    """counts (tuple) 的精確聯合機率：陣列 [勝方 P/B/T][閒對][莊對]"""
+    row, pair = _tables()[4], _tables()[-1]
+    win, p4 = _first_four(counts)
+    by_row = np.bincount(row * 4 + pair, p4, minlength=4 * 10 ** 4).reshape(10 ** 4, 4)      # 點數組合 × 對子 的機率
+    return (win.T @ by_row).reshape(3, 2, 2)
+
+
+def summary(counts):
+    """給玩家看的剩餘牌靴機率 {P, B, T, PP, BP}"""
+    j = odds(tuple(counts))
+    return {"P": j[0].sum(), "B": j[1].sum(), "T": j[2].sum(), "PP": j[:, 1].sum(), "BP": j[:, :, 1].sum()}
+
+
+# --- rtp 控制：去牌效應 (effect of removal) 線性模型，每局 O(1) 估出聯合機率 ---
+EOR_STEP = 4                    # 估斜率時每種點數牌 ± 4 張 (中央差分)
+
+
+@lru_cache(maxsize=1)
+def _eor():
+    """joint(組成比例 q) ≈ j0 + (q - q0) @ grad；grad 由新牌靴各點數牌 ± EOR_STEP 張的精算差分求出"""
+    full = np.array(Shoe().counts, dtype=float)
+    q0, j0 = full / full.sum(), odds(tuple(Shoe().counts)).ravel()
+    dq, dj = [], []
+    for r in range(RANKS):
+        for s in (EOR_STEP, -EOR_STEP):
+            c = full.copy(); c[r] += s
+            dq.append(c / c.sum() - q0); dj.append(odds(tuple(int(x) for x in c)).ravel() - j0)
+    grad = np.linalg.lstsq(np.array(dq), np.array(dj), rcond=None)[0]
+    return q0, j0, grad
+
+
+def approx_odds(counts):
+    """odds() 的線性近似 (可一次傳入多個牌靴：counts 形狀 (..., 13))，回傳 (..., 12) 依 odds().ravel() 排列"""
+    q0, j0, grad = _eor()
+    c = np.asarray(counts, dtype=float)
+    j = np.clip(j0 + (c / c.sum(axis=-1, keepdims=True) - q0) @ grad, 0, None)
+    return j / j.sum(axis=-1, keepdims=True)
+
+
+@lru_cache(maxsize=256)
+def _pay(bets):
+    """bets = tuple(注單.items()) → 12 格派彩 (依 odds().ravel() 排列)"""
+    bets = dict(bets)
+    return np.array([settle(bets, w, pp, bp) for w in WINNERS for pp in (0, 1) for bp in (0, 1)], dtype=float)
+
+
+def _pay_table(bets):
+    return _pay(tuple(bets.items())).reshape(3, 2, 2)
+
+
+def beta(ev, pw, w, target):
+    """解析求 β：玩家會贏的局以機率 β 改發成不贏的局 (依不贏的條件分佈)，使期望派彩 = target。
+    ev = 期望派彩、pw = 贏的機率、w = 贏的局的派彩期望貢獻；呼叫端負責 ev ≤ target 時不改發並截到 [0, 1]"""
+    return (ev - target) / (w - pw * (ev - w) / (1 - pw))
+
+
+@lru_cache(maxsize=256)
+def _steer_model(bets):
+    """bets = tuple(注單.items()) → (c, g)：(期望派彩, 贏的機率, 贏的局派彩貢獻) ≈ c + 組成比例 @ g"""
+    q0, j0, grad = _eor()
+    pay = _pay(bets)
+    win = pay > sum(dict(bets).values())
+    m = np.stack([pay, win, pay * win], axis=1)
+    g = grad @ m
+    return j0 @ m - q0 @ g, g
+
+
+def steer(bets, counts, rtp=1.0):
+    total = sum(bets.values())
+    if rtp >= 1 or not total: return 0.0
+    c, g = _steer_model(tuple(bets.items()))
+    ev, pw, w = (c + np.asarray(counts) @ g / sum(counts)).tolist()
+    if ev <= rtp * total or not 0 < pw < 1: return 0.0
+    return min(1.0, max(0.0, beta(ev, pw, w, rtp * total)))
+
+
+def _coup_as(rng, counts, w, pp, bp):
+    """直接依條件分佈發出 (勝方 w, 閒對 pp, 莊對 bp) 的一局 (扣除 counts)；該結果不可能時回傳 None"""
+    ranks, row, pair = _tables()[3], _tables()[4], _tables()[-1]
+    win, p4 = _first_four(counts, [w])
+    weight = win[row, 0] * p4 * (pair == pp * 2 + bp)
+    cum = np.cumsum(weight)
+    if cum[-1] <= 0: return None
+    p1, b1, p2, b2 = (int(x) + 1 for x in ranks[np.searchsorted(cum, rng.random() * cum[-1], side="right")])
+    for c in (p1, b1, p2, b2): counts[c - 1] -= 1
+    # 第 5 / 6 張：由勝負表取出勝方為 w 的 (第 5 張點數, 第 6 張點數) 依剩餘張數抽一組，再於同點數中抽點數牌
+    by_point = np.zeros(10)
+    for r, c in enumerate(counts): by_point[POINT[r + 1]] += c
+    k = point([p1, p2]) * 10 + point([b1, b2])
+    weight = (by_point[:, None] * (by_point[None, :] - np.eye(10)) * _tables()[1][k, :, w, :]).ravel()
+    cum = np.cumsum(weight)
+    s5, s6 = divmod(int(np.searchsorted(cum, rng.random() * cum[-1], side="right")), 10)
+    rest = list(counts)
+    c5 = _draw_point(rng, rest, s5); c6 = _draw_point(rng, rest, s6)
+    nxt = iter((c5, c6))
+    r = _finish([p1, p2], [b1, b2], lambda: next(nxt))
+    for c in r.player[2:] + r.banker[2:]: counts[c - 1] -= 1
+    return r
+
+
+def _draw_point(rng, counts, v):
+    """從 counts 中點數為 v 的點數牌抽一張 (會被扣除)"""
+    only = [c if POINT[r + 1] == v else 0 for r, c in enumerate(counts)]
+    c = _draw(rng, only)
+    counts[c - 1] -= 1
+    return c
+
+
+def deal(rng, shoe, bets, rtp=1.0):
+    """從牌靴 shoe 發一局並結算 (扣除 shoe 的牌)；切牌已過時先換新牌靴"""
+    shuffled = shoe.spent
+    if shuffled: shoe.counts, shoe.hands = Shoe().counts, 0
+    total, counts = sum(bets.values()), list(shoe.counts)
+    r = coup(rng, counts)
+    if payout(bets, r) > total and rng.random() < steer(bets, shoe.counts, rtp):
+        # 改發：由聯合機率抽一個不贏的結果 (勝方 × 閒對 × 莊對)，再依該結果的條件分佈直接發出牌面
+        j = approx_odds(shoe.counts) * (_pay(tuple(bets.items())) <= total)
+        cell = int(np.searchsorted(np.cumsum(j), rng.random() * j.sum(), side="right"))
+        retry = list(shoe.counts)
+        steered = _coup_as(rng, retry, cell // 4, cell // 2 % 2, cell % 2)
+        if steered: r, counts = steered, retry
+    shoe.counts = counts; shoe.hands += 1
+    r.payout, r.shuffled = payout(bets, r), shuffled
+    return r
+
+
+_SHOES = weakref.WeakKeyDictionary()
+
+
+def play(rng, strategy, rtp=1.0):
+    """模擬用：同一個 rng 共用一個牌靴 (依序發到切牌再換新)"""
+    shoe = _SHOES.setdefault(rng, Shoe())
+    bets = strategy["bets"]
+    return sum(bets.values()), deal(rng, shoe, bets, rtp).payout
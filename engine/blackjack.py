@@ -0,0 +1,450 @@
+"""21 點：N 副牌靴 (各點數牌剩餘張數 + 切牌)，要牌 / 停牌 / 加倍 / 分牌 / 投降；每局只結算一次
+
+規則由 Rules 指定 (預設 6 副、莊家軟 17 停、黑傑克 3:2、分牌後可加倍、可投降、莊家先看底牌)。
+dealer_odds() / ev_table() 以動態規劃算出莊家結果分佈與玩家各動作期望值，依 (規則, 牌靴組成) 快取：
+提示、基本策略、rtp 控制 (解析 β，與百家樂相同的算法) 與批次模擬都查這些表。
+牌靴組成一律以 10 種點數 (A, 2..9, 10/J/Q/K) 的剩餘張數表示。
+"""
+import weakref
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+import numpy as np
+
+from .baccarat import beta
+
+LABELS = ['A', '2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K']      # 點數牌 1..13
+SUITS = ['♠', '♥', '♦', '♣']
+VALUE = {lab: min(i + 1, 10) for i, lab in enumerate(LABELS)}
+ACTIONS = ("hit", "stand", "double", "split", "surrender")
+STRATEGY = {"bet": 100, "play": "basic"}
+
+
+@dataclass(frozen=True)
+class Rules:
+    decks: int = 6
+    penetration: float = 0.75       # 發到 75% 放切牌，下一局前換新牌靴
+    hit_soft17: bool = False
+    blackjack_pays: float = 1.5
+    das: bool = True                # 分牌後可加倍
+    surrender: bool = True          # 投降 (莊家看過底牌後，只限最初兩張)
+
+    @property
+    def cut(self): return round(52 * self.decks * (1 - self.penetration))
+
+
+RULES = Rules()
+
+
+@dataclass
+class Shoe:
+    counts: list                    # counts[r - 1] = 點數牌 r 剩餘張數
+    hands: int = 0
+
+    @classmethod
+    def new(cls, rules=RULES):
+        return cls([4 * rules.decks] * 13)
+
+    @property
+    def remaining(self): return sum(self.counts)
+
+    def comp(self, extra=()):
+        """10 種點數的剩餘張數 (extra = 還沒翻開、要算回牌靴的牌)"""
+        c = self.counts[:9] + [sum(self.counts[9:])]
+        for card in extra: c[VALUE[card[0]] - 1] += 1
+        return tuple(c)
+
+
+@dataclass
+class Hand:
+    cards: list
+    bet: int
+    doubled: bool = False
+    split: bool = False             # 分牌後的手牌 (21 點不算黑傑克、不能投降)
+    surrendered: bool = False
+    done: bool = False
+
+
+@dataclass
+class BlackjackState:
+    bet: int
+    shoe: Shoe
+    rules: Rules
+    dealer: list                    # [明牌, 底牌, 補牌…]
+    hands: list = field(default_factory=list)
+    active: int = 0
+    over: bool = False
+    payout: int = 0
+    msg: str = ""
+    shuffled: bool = False          # 本局前換了新牌靴
+
+    @property
+    def hand(self): return self.hands[self.active]
+
+    @property
+    def wagered(self): return sum(h.bet for h in self.hands)
+
+
+def _total(values):
+    hard = sum(values)
+    soft = 1 in values and hard + 10 <= 21
+    return (hard + 10 if soft else hard), soft
+
+
+def hand_value(h):
+    return _total([VALUE[c[0]] for c in h])[0]
+
+
+def is_blackjack(h):
+    return len(h) == 2 and hand_value(h) == 21
+
+
+def _draw(rng, counts):
+    i = rng.randrange(sum(counts))
+    for r, c in enumerate(counts):
+        if i < c: counts[r] -= 1; return r + 1
+        i -= c
+
+
+def _card(rng, counts, value=None):
+    """從 counts 抽一張 (會被扣除)；value 指定點數時只在該點數中抽"""
+    if value is None: r = _draw(rng, counts)
+    else:
+        only = [c if min(i + 1, 10) == value else 0 for i, c in enumerate(counts)]
+        r = _draw(rng, only); counts[r - 1] -= 1
+    return LABELS[r - 1], rng.choice(SUITS)
+
+
+# --- 動態規劃：莊家結果分佈與玩家期望值 ---
+@lru_cache(maxsize=4096)
+def dealer_odds(comp, up, rules=RULES):
+    """莊家明牌 up、牌靴 comp (已扣除明牌) 時的最終點數分佈 [17, 18, 19, 20, 21, 爆牌]
+
+    莊家已先看底牌：明牌 A / 10 時底牌不會湊成黑傑克。逐張不放回精算。
+    """
+    counts, out = list(comp), [0.0] * 6
+
+    def go(values, p):
+        t, soft = _total(values)
+        if t > 21: out[5] += p; return
+        if t >= 17 and not (rules.hit_soft17 and t == 17 and soft): out[t - 17] += p; return
+        banned = {1: 10, 10: 1}.get(up) if len(values) == 1 else None
+        n = sum(c for v, c in enumerate(counts, 1) if v != banned)
+        for v, c in enumerate(counts, 1):
+            if not c or v == banned: continue
+            counts[v - 1] -= 1
+            go(values + [v], p * c / n)
+            counts[v - 1] += 1
+
+    go([up], 1.0)
+    return tuple(out)
+
+
+def _stand_ev(t, d):
+    if t > 21: return -1.0
+    bust = d[5]
+    if t < 17: return bust - (1 - bust)
+    return bust + sum(d[:t - 17]) - sum(d[t - 16:5])
+
+
+def _next(t, soft, v):
+    """手牌 (點數 t, 軟牌) 再拿一張 v"""
+    t += v
+    if v == 1 and not soft and t + 10 <= 21: t, soft = t + 10, True
+    if t > 21 and soft: t, soft = t - 10, False
+    return t, soft
+
+
+@lru_cache(maxsize=4096)
+def ev_table(comp, up, rules=RULES):
+    """玩家期望值表 (以 1 單位下注計)：({(點數, 軟牌): (停, 要, 加倍)}, {對子點數: 分牌})
+
+    comp 為玩家看不到的牌 (已扣除明牌)；莊家分佈逐張精算，玩家補牌依 comp 比例 (不再扣除自己的牌)。
+    """
+    d = dealer_odds(comp, up, rules)
+    n = sum(comp)
+    q = [(v, c / n) for v, c in enumerate(comp, 1) if c]
+    best = {}
+
+    def value(t, soft):
+        """(點數, 軟牌) 之後最佳 停 / 要 的期望值"""
+        if t > 21: return -1.0
+        if (t, soft) not in best:
+            hit = sum(p * value(*_next(t, soft, v)) for v, p in q)
+            best[(t, soft)] = max(_stand_ev(t, d), hit)
+        return best[(t, soft)]
+
+    table = {}
+    for t in range(4, 22):
+        for soft in (False, True):
+            if soft and t < 12: continue
+            hit = sum(p * value(*_next(t, soft, v)) for v, p in q)
+            dbl = 2 * sum(p * _stand_ev(_next(t, soft, v)[0], d) for v, p in q)
+            table[(t, soft)] = (_stand_ev(t, d), hit, dbl)
+    split = {}
+    for v in range(1, 11):
+        one = 0.0
+        for c, p in q:
+            t, soft = _next(*_next(0, False, v), c)
+            if v == 1: one += p * _stand_ev(t, d)                 # 分 A 各補一張即停
+            else: one += p * max(table[(t, soft)][:3 if rules.das else 2])
+        split[v] = 2 * one
+    return table, split
+
+
+def options(g):
+    """目前手牌可做的動作"""
+    if g.over: return []
+    h, first = g.hand, len(g.hand.cards) == 2
+    out = ["hit", "stand"]
+    if first and (not h.split or g.rules.das) and not (h.split and h.cards[0][0] == 'A'): out.append("double")
+    if first and len(g.hands) == 1 and VALUE[h.cards[0][0]] == VALUE[h.cards[1][0]]: out.append("split")
+    if first and len(g.hands) == 1 and g.rules.surrender: out.append("surrender")
+    return out
+
+
+def advice(g):
+    """提示：依目前牌靴組成 (底牌算回牌靴) 的各可行動作期望值 {動作: EV}，以 1 單位下注計"""
+    if g.over: return {}
+    up = VALUE[g.dealer[0][0]]
+    table, split = ev_table(g.shoe.comp([g.dealer[1]]), up, g.rules)
+    h = g.hand
+    t, soft = _total([VALUE[c[0]] for c in h.cards])
+    stand, hit, dbl = table[(t, soft)] if t <= 21 else (-1.0, -1.0, -2.0)
+    ev = {"hit": hit, "stand": stand, "double": dbl, "split": split[VALUE[h.cards[0][0]]], "surrender": -0.5}
+    return {a: ev[a] for a in options(g)}
+
+
+# --- 開局狀態 (閒 1, 閒 2, 明牌) 的期望派彩：rtp 控制用 ---
+def _start_probs(comp):
+    """1000 種依序發出的 (閒 1, 閒 2, 明牌) 點數的機率，陣列 [閒 1][閒 2][明牌] (點數 - 1)"""
+    c = np.asarray(comp, dtype=float)
+    n, eye = c.sum(), np.eye(10)
+    p1 = c / n
+    p2 = (c[None, :] - eye) / (n - 1)
+    pu = (c[None, None, :] - eye[:, None, :] - eye[None, :, :]) / (n - 2)
+    return np.clip(p1[:, None, None] * p2[:, :, None] * pu, 0, None)
+
+
+@lru_cache(maxsize=64)
+def start_table(comp, rules=RULES):
+    """(R, W)：各開局狀態以最佳策略的期望派彩與期望下注 (1 單位)，陣列 [閒 1][閒 2][明牌]
+
+    莊家黑傑克的機率依扣除三張後的牌靴計；之後的期望值查 ev_table (明牌已扣除)。
+    """
+    R, W = np.zeros((10, 10, 10)), np.ones((10, 10, 10))
+    for u in range(1, 11):
+        rest = list(comp); rest[u - 1] -= 1
+        table, split = ev_table(tuple(rest), u, rules)
+        for a in range(1, 11):
+            for b in range(1, 11):
+                left = list(rest); left[a - 1] -= 1; left[b - 1] -= 1
+                if min(left) < 0: continue
+                hole = {1: 10, 10: 1}.get(u)
+                p_bj = left[hole - 1] / sum(left) if hole else 0.0
+                if {a, b} == {1, 10}:
+                    R[a - 1, b - 1, u - 1] = p_bj + (1 - p_bj) * (1 + rules.blackjack_pays)
+                    continue
+                t, soft = _total([a, b])
+                stand, hit, dbl = table[(t, soft)]
+                ev = {"stand": stand, "hit": hit, "double": dbl}
+                if rules.surrender: ev["surrender"] = -0.5
+                if a == b: ev["split"] = split[a]
+                act = max(ev, key=ev.get)
+                stake = 2 if act in ("double", "split") else 1
+                R[a - 1, b - 1, u - 1] = (1 - p_bj) * (stake + ev[act])         # 莊家黑傑克時只輸原注
+                W[a - 1, b - 1, u - 1] = p_bj + (1 - p_bj) * stake
+    return R, W
+
+
+EOR_STEP = 8                    # 估斜率時每種點數 ± 8 張 (中央差分)
+
+
+@lru_cache(maxsize=8)
+def _steer_model(rules=RULES):
+    """(fav, c, g)：fav = 新牌靴下玩家佔優 (期望派彩 > 期望下注) 的開局狀態；
+    (E[派彩], E[下注], 佔優機率, 佔優局派彩貢獻, 佔優局下注貢獻) ≈ c + 組成比例 @ g (去牌效應線性模型)"""
+    full = np.array(Shoe.new(rules).comp(), dtype=float)
+    R, W = start_table(tuple(int(x) for x in full), rules)
+    fav = R > W
+
+    def stats(comp):
+        R, W = start_table(tuple(int(x) for x in comp), rules)
+        P = _start_probs(comp)
+        return np.array([(P * R).sum(), (P * W).sum(), P[fav].sum(), (P * R)[fav].sum(), (P * W)[fav].sum()])
+
+    q0, s0 = full / full.sum(), stats(full)
+    dq, ds = [], []
+    for v in range(10):
+        for s in (EOR_STEP, -EOR_STEP):
+            c = full.copy(); c[v] += s
+            dq.append(c / c.sum() - q0); ds.append(stats(c) - s0)
+    g = np.linalg.lstsq(np.array(dq), np.array(ds), rcond=None)[0]
+    return fav, s0 - q0 @ g, g
+
+
+def steer(comp, rtp=1.0, rules=RULES):
+    """玩家佔優的開局以機率 β 改發成不佔優的開局，使最佳策略下 期望派彩 = rtp × 期望下注"""
+    if rtp >= 1: return 0.0
+    fav, c, g = _steer_model(rules)
+    er, ew, pf, fr, fw = (c + np.asarray(comp) @ g / sum(comp)).tolist()
+    # 以「派彩 - rtp × 下注」為單位，與百家樂同一個 β 公式 (目標為 0)
+    ev, w = er - rtp * ew, fr - rtp * fw
+    if ev <= 0 or not 0 < pf < 1: return 0.0
+    return min(1.0, max(0.0, beta(ev, pf, w, 0.0)))
+
+
+def _deal_unfavored(rng, counts, rules):
+    """依開局機率直接抽一個玩家不佔優的 (閒 1, 閒 2, 明牌)，回傳 [閒 1, 明牌, 閒 2] (扣除 counts)"""
+    fav = _steer_model(rules)[0]
+    P = (_start_probs(Shoe(counts).comp()) * ~fav).ravel()
+    cum = np.cumsum(P)
+    a, b, u = np.unravel_index(int(np.searchsorted(cum, rng.random() * cum[-1], side="right")), fav.shape)
+    return [_card(rng, counts, v + 1) for v in (a, u, b)]
+
+
+# --- 牌局 ---
+def deal(rng, shoe, bet, rules=RULES, rtp=1.0):
+    """從牌靴發一局 (閒、明牌、閒、底牌)；切牌已過時先換新牌靴。莊家先看底牌，雙方黑傑克當場結算"""
+    shuffled = shoe.remaining <= rules.cut
+    if shuffled: shoe.counts, shoe.hands = Shoe.new(rules).counts, 0
+    before = list(shoe.counts)
+    p1, up, p2, hole = (_card(rng, shoe.counts) for _ in range(4))
+    if rtp < 1 and _steer_model(rules)[0][VALUE[p1[0]] - 1, VALUE[p2[0]] - 1, VALUE[up[0]] - 1] \
+            and rng.random() < steer(Shoe(before).comp(), rtp, rules):
+        shoe.counts = before
+        p1, up, p2 = _deal_unfavored(rng, shoe.counts, rules)
+        hole = _card(rng, shoe.counts)
+    shoe.hands += 1
+    g = BlackjackState(bet, shoe, rules, [up, hole], [Hand([p1, p2], bet)], shuffled=shuffled)
+    if is_blackjack(g.dealer) or is_blackjack(g.hand.cards): _settle(g)
+    return g
+
+
+def _advance(g, rng):
+    """目前手牌結束：換下一手，全部結束就由莊家補牌並結算；回傳本次結算的派彩 (未結算為 0)"""
+    g.hand.done = True
+    while g.active < len(g.hands) - 1 and g.hand.done: g.active += 1
+    if not all(h.done for h in g.hands): return 0
+    live = [h for h in g.hands if not h.surrendered and hand_value(h.cards) <= 21]
+    if live:
+        while True:
+            t, soft = _total([VALUE[c[0]] for c in g.dealer])
+            if t > 17 or (t == 17 and not (soft and g.rules.hit_soft17)): break
+            g.dealer.append(_card(rng, g.shoe.counts))
+    return _settle(g)
+
+
+def _settle(g):
+    """唯一的結算點：算出總派彩並結束本局"""
+    d, d_bj = hand_value(g.dealer), is_blackjack(g.dealer)
+    pay, msgs = 0, []
+    for h in g.hands:
+        p = hand_value(h.cards)
+        bj = is_blackjack(h.cards) and not h.split
+        if h.surrendered: win, msg = h.bet // 2, "投降"
+        elif d_bj: win, msg = (h.bet, "雙方黑傑克 (Push)") if bj else (0, "莊家黑傑克")
+        elif bj: win, msg = int(h.bet * (1 + g.rules.blackjack_pays)), "黑傑克！"
+        elif p > 21: win, msg = 0, "爆牌"
+        elif d > 21: win, msg = h.bet * 2, "莊家爆牌"
+        elif p > d: win, msg = h.bet * 2, "您贏了"
+        elif p == d: win, msg = h.bet, "平局 (Push)"
+        else: win, msg = 0, "莊家勝"
+        pay += win; msgs.append(msg)
+    g.over, g.payout, g.msg = True, pay, " / ".join(msgs)
+    return pay
+
+
+def _check(g, move):
+    if g.over: raise ValueError("本局已結束")
+    if move not in options(g): raise ValueError(f"目前不能 {move}")
+
+
+def hit(g, rng):
+    """要牌；爆牌或到 21 點即結束該手"""
+    _check(g, "hit")
+    g.hand.cards.append(_card(rng, g.shoe.counts))
+    return _advance(g, rng) if hand_value(g.hand.cards) >= 21 else 0
+
+
+def stand(g, rng):
+    _check(g, "stand")
+    return _advance(g, rng)
+
+
+def double(g, rng):
+    """加倍：下注加倍、只補一張 (呼叫端先扣加倍的注金 g.hand.bet)"""
+    _check(g, "double")
+    g.hand.bet *= 2; g.hand.doubled = True
+    g.hand.cards.append(_card(rng, g.shoe.counts))
+    return _advance(g, rng)
+
+
+def split(g, rng):
+    """分牌 (限一次)：拆成兩手各補一張，第二手下注與原注相同 (呼叫端先扣)；分 A 各補一張即停"""
+    _check(g, "split")
+    a, b = g.hand.cards
+    g.hands = [Hand([a, _card(rng, g.shoe.counts)], g.bet, split=True), Hand([b, _card(rng, g.shoe.counts)], g.bet, split=True)]
+    if a[0] == 'A':
+        for h in g.hands: h.done = True
+        return _advance(g, rng)
+    return _advance(g, rng) if hand_value(g.hand.cards) == 21 else 0
+
+
+def surrender(g, rng):
+    """投降：取回一半注金"""
+    _check(g, "surrender")
+    g.hand.surrendered = True
+    return _advance(g, rng)
+
+
+MOVES = {"hit": hit, "stand": stand, "double": double, "split": split, "surrender": surrender}
+
+
+# --- 策略：(點數, 軟牌, 明牌, 最初兩張) → 動作；模擬與 montecarlo 共用 ---
+@lru_cache(maxsize=32)
+def strategy_table(play="basic", stand_on=17, rules=RULES):
+    """(act, split, surrender)：act[點數][軟牌][明牌][最初兩張] ∈ hit / stand / double，
+    split[對子點數][明牌]、surrender[點數][軟牌][明牌] 為 bool。
+    basic = 新牌靴 ev_table 的最佳動作；stand_on = 未滿 stand_on 點就要牌"""
+    act = [[[["hit" if t < stand_on else "stand"] * 2 for _ in range(11)] for _ in range(2)] for t in range(22)]
+    spl = [[False] * 11 for _ in range(11)]
+    sur = [[[False] * 11 for _ in range(2)] for _ in range(22)]
+    if play != "basic": return act, spl, sur
+    full = Shoe.new(rules).comp()
+    for u in range(1, 11):
+        rest = list(full); rest[u - 1] -= 1
+        table, split_ev = ev_table(tuple(rest), u, rules)
+        for (t, soft), (s, h, d) in table.items():
+            act[t][soft][u] = ["hit" if h > s else "stand", "double" if d > max(s, h) else ("hit" if h > s else "stand")]
+            sur[t][soft][u] = rules.surrender and -0.5 > max(s, h, d)
+        for v in range(1, 11):
+            s, h, d = table[_total([v, v])]
+            spl[v][u] = split_ev[v] > max(s, h, d, -0.5 if rules.surrender else -1)
+    return act, spl, sur
+
+
+def auto_play(g, rng, strategy):
+    """依策略表打完一局，回傳派彩"""
+    act, spl, sur = strategy_table(strategy.get("play"), strategy.get("stand_on", 17), g.rules)
+    up = VALUE[g.dealer[0][0]]
+    while not g.over:
+        h = g.hand
+        t, soft = _total([VALUE[c[0]] for c in h.cards])
+        ok = options(g)
+        if "surrender" in ok and sur[t][soft][up]: return surrender(g, rng)
+        if "split" in ok and spl[VALUE[h.cards[0][0]]][up]: split(g, rng); continue
+        a = act[t][soft][up][len(h.cards) == 2]
+        MOVES[a if a in ok else act[t][soft][up][0]](g, rng)
+    return g.payout
+
+
+_SHOES = weakref.WeakKeyDictionary()
+
+
+def play(rng, strategy, rtp=1.0, rules=RULES):
+    """模擬用：同一個 rng 共用一個牌靴 (依序發到切牌再換新)"""
+    shoe = _SHOES.setdefault(rng, Shoe.new(rules))
+    g = deal(rng, shoe, strategy["bet"], rules, rtp)
+    if not g.over: auto_play(g, rng, strategy)
+    return g.wagered, g.payout
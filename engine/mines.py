@@ -0,0 +1,89 @@
+"""掃雷：5x5 盤面，倍率 = 0.97 × C(25, k) / C(25 - 地雷數, k) (k = 已翻開的安全格)
+
+盤面以位元遮罩表示 (第 i 位 = 第 i 格)，倍率事先算成 [地雷數][安全格數] 查表，翻格與計價都是 O(1)。
+to_row / from_row 為伺服器端棋局登記 (資料表 Mines_Games) 的欄位格式。
+"""
+from dataclasses import dataclass
+from math import comb
+
+SIZE = 25
+FULL = (1 << SIZE) - 1
+HOUSE = 0.97
+STRATEGY = {"bet": 100, "mines": 3, "reveals": 3}
+
+# TABLE[地雷數][安全格數]
+TABLE = tuple(tuple(HOUSE * comb(SIZE, k) / comb(SIZE - m, k) for k in range(SIZE - m + 1)) for m in range(SIZE))
+
+
+@dataclass
+class MinesState:
+    bet: int
+    mines: int                      # 地雷數
+    layout: int                     # 地雷位置遮罩
+    shown: int = 0                  # 已翻開遮罩
+    safe: int = 0                   # 已翻開的安全格數
+    active: bool = True             # 可繼續翻格 / 結算
+    over: bool = False              # 踩雷，等玩家開新局
+
+
+def multiplier(mines, safe):
+    try: return TABLE[mines][safe]
+    except IndexError: return 1.0
+
+
+def new_game(rng, bet, mines):
+    layout = 0
+    for i in rng.sample(range(SIZE), mines): layout |= 1 << i
+    return MinesState(bet, mines, layout)
+
+
+def cash_value(g):
+    return int(g.bet * TABLE[g.mines][g.safe])
+
+
+def reveal(g, i):
+    """翻開第 i 格；回傳是否有效 (已翻開 / 已結束 / 越界不算)"""
+    if not g.active or not 0 <= i < SIZE: return False
+    bit = 1 << i
+    if g.shown & bit: return False
+    g.shown |= bit
+    if g.layout & bit: g.active = False; g.over = True
+    else: g.safe += 1
+    return True
+
+
+def cash_out(g):
+    """結算領錢：回傳派彩並結束本局 (只能領一次)"""
+    if not g.active: return 0
+    g.active = False
+    return cash_value(g)
+
+
+def cells(g):
+    """給下注盤的格子狀態：hidden / safe / boom / mine (踩雷後亮出全部地雷)"""
+    out = []
+    for i in range(SIZE):
+        bit = 1 << i
+        if g.shown & bit: out.append("boom" if g.layout & bit else "safe")
+        elif g.over and g.layout & bit: out.append("mine")
+        else: out.append("hidden")
+    return out
+
+
+def to_row(g):
+    return {"bet": g.bet, "mines": g.mines, "layout": g.layout, "shown": g.shown, "status": "over" if g.over else "active"}
+
+
+def from_row(row):
+    layout, shown = int(row["layout"]), int(row.get("shown") or 0)
+    over = row.get("status") == "over"
+    return MinesState(int(row["bet"]), int(row["mines"]), layout, shown, (shown & ~layout & FULL).bit_count(), not over, over)
+
+
+def play(rng, strategy, **rules):
+    """依序翻 reveals 格後結算 (盤面已洗亂，翻哪幾格機率相同)"""
+    g = new_game(rng, strategy["bet"], strategy["mines"])
+    for i in range(strategy["reveals"]):
+        reveal(g, i)
+        if g.over: return g.bet, 0
+    return g.bet, cash_out(g)
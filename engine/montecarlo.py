@@ -0,0 +1,299 @@
+"""RTP 蒙地卡羅驗證：以 numpy 一次產生整批局面，計算各遊戲 / 各注單組合的實際派彩率、變異數與信賴區間
+
+規則與 engine 各遊戲模組相同 (含 rtp 重發 / 偏向會輸號碼的控制)，只是改為整批向量運算；
+每批 CHUNK 局以串流累加，記憶體與局數無關。
+
+    python -m engine.montecarlo [--rounds 10000000] [--rtp 0.95] [--game roulette] [--seed 1]
+                                [--wheel-items '[{"item_name": ..., "item_value": ..., "weight": ...}]'] [--wheel-cost 100]
+
+轉盤的派彩取決於 Inventory 獎項，沒給 --wheel-items 時預設不跑轉盤 (後台報告會帶入目前庫存)。
+"""
+import argparse
+import json
+import math
+import time
+
+import numpy as np
+
+from . import baccarat, blackjack, mines, roulette, wheel
+
+CHUNK = 1_000_000
+Z95 = 1.959964
+
+# 預設注單組合：遊戲 → {名稱: strategy}
+MIXES = {
+    "roulette": {"紅色": {"bets": {"紅色": 100}}, "單數": {"bets": {"Odd": 100}}, "第一打": {"bets": {"1st12": 100}},
+                 "單號 17": {"bets": {"17": 100}}, "混合": {"bets": {"紅色": 100, "Odd": 100, "col2": 50, "17": 20, "0": 10}}},
+    "baccarat": {"閒": {"bets": {"P": 100}}, "莊": {"bets": {"B": 100}}, "和": {"bets": {"T": 100}},
+                 "閒對": {"bets": {"PP": 100}}, "混合": {"bets": {"P": 100, "T": 20, "PP": 10, "BP": 10}}},
+    "blackjack": {"基本策略": {"bet": 100, "play": "basic"}, "17 點停": {"bet": 100, "play": "stand_on", "stand_on": 17},
+                  "12 點停": {"bet": 100, "play": "stand_on", "stand_on": 12}},
+    "mines": {"3 雷翻 3": {"bet": 100, "mines": 3, "reveals": 3}, "10 雷翻 5": {"bet": 100, "mines": 10, "reveals": 5},
+              "1 雷翻 20": {"bet": 100, "mines": 1, "reveals": 20}},
+    "wheel": {"單次": {}},
+}
+# 有後台 rtp 設定的遊戲
+RTP_GAMES = ("roulette", "baccarat", "blackjack")
+
+COLUMNS = {"game": "遊戲", "mix": "注單", "rounds": "局數", "target": "設定 RTP", "rtp": "實際 RTP", "sd": "標準差",
+           "ci_low": "95% 下限", "ci_high": "95% 上限", "hit_rate": "贏局率", "seconds": "秒"}
+
+
+# --- 各遊戲：回傳 (每局下注, 每局派彩陣列) ---
+def _roulette(gen, n, strategy, rtp=1.0):
+    bets = strategy["bets"]
+    pay = roulette.outcomes(bets)
+    lose = np.flatnonzero(pay < sum(bets.values()))
+    num = gen.integers(0, 37, n)
+    if len(lose):
+        bias = gen.random(n) > rtp
+        num[bias] = lose[gen.integers(0, len(lose), int(bias.sum()))]
+    return sum(bets.values()), pay[num]
+
+
+def _mines(gen, n, strategy, **rules):
+    bet, m, k = strategy["bet"], strategy["mines"], strategy["reveals"]
+    alive = math.comb(mines.SIZE - m, k) / math.comb(mines.SIZE, k)
+    cash = int(bet * mines.multiplier(m, k))
+    return bet, np.where(gen.random(n) < alive, cash, 0)
+
+
+def _wheel(gen, n, strategy, cost=100, items=()):
+    board = wheel.slots(items)
+    w = np.array([float(i.get("weight", 10)) for i in board])
+    values = np.array([int(i.get("item_value") or 0) for i in board])
+    return cost, values[gen.choice(len(board), n, p=w / w.sum())]
+
+
+# 百家樂：與遊戲相同的持續牌靴 — 同時發 S 個牌靴 (每列一個 13 種點數牌計數)，逐局發到切牌為止；
+# rtp 的 β 依每個牌靴當下組成以 baccarat 的去牌效應模型估出，改發的局依不贏的條件分佈 (整列重抽到不贏) 取代
+_BACC_POINT = np.array(baccarat.POINT[1:])
+_BANKER_DRAW = np.array(baccarat.BANKER_DRAW)
+
+
+def _shoe_draw(gen, counts, rows):
+    """counts 的 rows 列各不放回抽一張，回傳點數牌索引 0..12"""
+    cum = counts[rows].cumsum(axis=1)
+    u = (gen.random(len(rows)) * cum[:, -1]).astype(np.int64)
+    r = (cum <= u[:, None]).sum(axis=1)
+    counts[rows, r] -= 1
+    return r
+
+
+def _bacc_coup(gen, counts, rows, pay):
+    """counts 的 rows 列各發一局 (扣除牌)，回傳每局派彩"""
+    rank = [_shoe_draw(gen, counts, rows) for _ in range(4)]
+    v = [_BACC_POINT[r] for r in rank]
+    pv, bv = (v[0] + v[2]) % 10, (v[1] + v[3]) % 10
+    play = (pv < 8) & (bv < 8)
+    p_draw = play & (pv <= 5)
+    v5 = np.zeros(len(rows), np.int64)
+    v5[p_draw] = _BACC_POINT[_shoe_draw(gen, counts, rows[p_draw])]
+    b_draw = play & _BANKER_DRAW[bv, np.where(p_draw, v5, 10)]
+    vb = np.zeros(len(rows), np.int64)
+    vb[b_draw] = _BACC_POINT[_shoe_draw(gen, counts, rows[b_draw])]
+    pf, bf = np.where(p_draw, (pv + v5) % 10, pv), np.where(b_draw, (bv + vb) % 10, bv)
+    winner = np.where(pf > bf, 0, np.where(bf > pf, 1, 2))
+    return pay[winner, (rank[0] == rank[2]).astype(int), (rank[1] == rank[3]).astype(int)]
+
+
+def _shoe_rounds(gen, n, full, cut, hand):
+    """持續牌靴：同時開約 n / 每靴局數 個牌靴 (每列一個計數陣列)，逐局發到剩餘 ≤ cut 張，湊滿 n 局
+
+    hand(counts, live) 發 live 各列一局 (扣除牌)，回傳 (派彩, 下注)；
+    結果依牌靴排列再截斷，只少掉最後幾個牌靴，不偏向牌靴前段
+    """
+    per_shoe = max(1, (sum(full) - cut) // 5)       # 每局約用 5 張，用來估每批要開幾個牌靴
+    pays, bets, done = [], [], 0
+    while done < n:
+        shoes = (n - done) // per_shoe + 1
+        counts = np.tile(np.array(full, np.int64), (shoes, 1))
+        got_pay, got_bet = [], []                   # 每局一列 (牌靴數)，已過切牌的牌靴記為 -1
+        live = np.arange(shoes)
+        while len(live):
+            pay, bet = hand(counts, live)
+            row = np.full(shoes, -1.0); row[live] = pay; got_pay.append(row)
+            row = np.full(shoes, -1.0); row[live] = bet; got_bet.append(row)
+            live = live[counts[live].sum(axis=1) > cut]
+        pay, bet = np.array(got_pay).T.ravel(), np.array(got_bet).T.ravel()
+        keep = bet >= 0
+        pays.append(pay[keep][:n - done]); bets.append(bet[keep][:n - done]); done += len(pays[-1])
+    return np.concatenate(bets), np.concatenate(pays)
+
+
+def _baccarat(gen, n, strategy, rtp=1.0):
+    bets = strategy["bets"]
+    total, pay = sum(bets.values()), baccarat._pay_table(bets)
+    c, g = baccarat._steer_model(tuple(bets.items()))
+
+    def hand(counts, live):
+        before = counts[live].copy()
+        got = _bacc_coup(gen, counts, live, pay)
+        if rtp < 1:
+            ev, pw, w = (c + before @ g / before.sum(axis=1, keepdims=True)).T
+            b = np.where((ev > rtp * total) & (pw > 0) & (pw < 1), np.clip(baccarat.beta(ev, pw, w, rtp * total), 0, 1), 0)
+            todo = np.flatnonzero((got > total) & (gen.random(len(live)) < b))
+            while len(todo):
+                counts[live[todo]] = before[todo]
+                got[todo] = _bacc_coup(gen, counts, live[todo], pay)
+                todo = todo[got[todo] > total]
+        return got, np.full(len(live), total)
+
+    return _shoe_rounds(gen, n, [4 * baccarat.DECKS] * baccarat.RANKS, baccarat.CUT, hand)
+
+
+# 21 點：同樣的持續牌靴 (每列 10 種點數的計數)，依 blackjack.strategy_table 整批決定 要 / 停 / 加倍 / 分牌 (一次) / 投降；
+# rtp 的 β 依每個牌靴當下組成以 blackjack 的去牌效應模型估出，玩家佔優的開局依機率 β 整列重發到不佔優
+_BJ_ACT = {"stand": 0, "hit": 1, "double": 2}
+
+
+def _bj_total(hard, ace):
+    soft = ace & (hard + 10 <= 21)
+    return np.where(soft, hard + 10, hard), soft.astype(int)
+
+
+def _bj_hand(gen, counts, live, tables, rules, rtp):
+    """live 各列發一局 21 點並依策略表打完，回傳 (派彩, 下注) 以 1 單位計"""
+    act, spl, sur = tables
+    m, every = len(live), np.arange(len(live))
+
+    def draw(rows):
+        return _shoe_draw(gen, counts, live[rows]) + 1
+
+    before = counts[live].copy()
+    p1, up, p2, hole = draw(every), draw(every), draw(every), draw(every)
+    if rtp < 1:
+        fav, c, g = blackjack._steer_model(rules)
+        er, ew, pf, fr, fw = (c + before @ g / before.sum(axis=1, keepdims=True)).T
+        ev, w = er - rtp * ew, fr - rtp * fw
+        b = np.where((ev > 0) & (pf > 0) & (pf < 1), np.clip(baccarat.beta(ev, pf, w, 0.0), 0, 1), 0)
+        todo = np.flatnonzero(fav[p1 - 1, p2 - 1, up - 1] & (gen.random(m) < b))
+        while len(todo):
+            counts[live[todo]] = before[todo]
+            p1[todo], up[todo], p2[todo], hole[todo] = draw(todo), draw(todo), draw(todo), draw(todo)
+            todo = todo[fav[p1[todo] - 1, p2[todo] - 1, up[todo] - 1]]
+
+    # 莊家先看底牌；雙方黑傑克當場結算，接著是投降與分牌
+    pay = np.zeros(m)
+    d_bj = ((up == 1) & (hole == 10)) | ((up == 10) & (hole == 1))
+    p_bj = ((p1 == 1) & (p2 == 10)) | ((p1 == 10) & (p2 == 1))
+    pay[d_bj & p_bj] = 1
+    pay[~d_bj & p_bj] = 1 + rules.blackjack_pays
+    play = ~d_bj & ~p_bj
+    t, soft = _bj_total(p1 + p2, (p1 == 1) | (p2 == 1))
+    give_up = play & sur[t, soft, up]
+    pay[give_up] = 0.5
+    play &= ~give_up
+    split = play & (p1 == p2) & spl[p1, up]
+
+    # 兩個手牌欄位：未分牌只用第 0 欄；分 A 各補一張即停
+    hard = np.stack([np.where(split, p1, p1 + p2), np.where(split, p2, 0)], axis=1)
+    ace = np.stack([np.where(split, p1 == 1, (p1 == 1) | (p2 == 1)), split & (p2 == 1)], axis=1)
+    stake = np.stack([play * 1.0, split * 1.0], axis=1)
+    rows = np.flatnonzero(split)
+    for k in (0, 1):
+        card = draw(rows); hard[rows, k] += card; ace[rows, k] |= card == 1
+    active = np.stack([play & ~(split & (p1 == 1)), split & (p1 != 1)], axis=1)
+    first = np.ones((m, 2), bool)
+    can_double = ~split | rules.das
+    for k in (0, 1):
+        while True:
+            rows = np.flatnonzero(active[:, k])
+            if not len(rows): break
+            t, soft = _bj_total(hard[rows, k], ace[rows, k])
+            a = act[t, soft, up[rows], first[rows, k].astype(int)]
+            a = np.where((a == 2) & ~can_double[rows], act[t, soft, up[rows], 0], a)
+            a[t >= 21] = 0
+            stake[rows[a == 2], k] *= 2
+            more = rows[a > 0]
+            card = draw(more); hard[more, k] += card; ace[more, k] |= card == 1
+            first[rows, k] = False
+            t, _ = _bj_total(hard[more, k], ace[more, k])
+            active[rows[a != 1], k] = False
+            active[more[t > 21], k] = False
+
+    p_tot = np.stack([_bj_total(hard[:, k], ace[:, k])[0] for k in (0, 1)], axis=1)
+    alive = (stake > 0) & (p_tot <= 21)
+    dh, da = up + hole, (up == 1) | (hole == 1)
+    while True:
+        t, soft = _bj_total(dh, da)
+        more = np.flatnonzero(alive.any(axis=1) & ((t < 17) | ((t == 17) & soft.astype(bool) & rules.hit_soft17)))
+        if not len(more): break
+        card = draw(more); dh[more] += card; da[more] |= card == 1
+    d = _bj_total(dh, da)[0][:, None]
+    pay += (stake * np.where(alive & ((d > 21) | (p_tot > d)), 2, np.where(alive & (p_tot == d), 1, 0))).sum(axis=1)
+    return pay, np.where(play, stake.sum(axis=1), 1.0)
+
+
+def _blackjack(gen, n, strategy, rtp=1.0, rules=blackjack.RULES):
+    act, spl, sur = blackjack.strategy_table(strategy.get("play"), strategy.get("stand_on", 17), rules)
+    tables = (np.vectorize(_BJ_ACT.get)(np.array(act)), np.array(spl), np.array(sur))
+    wager, pay = _shoe_rounds(gen, n, list(blackjack.Shoe.new(rules).comp()), rules.cut,
+                              lambda counts, live: _bj_hand(gen, counts, live, tables, rules, rtp))
+    bet = strategy["bet"]
+    return wager * bet, pay * bet
+
+
+GAMES = {"roulette": _roulette, "baccarat": _baccarat, "blackjack": _blackjack, "mines": _mines, "wheel": _wheel}
+
+
+def run(game, strategy=None, n_rounds=10_000_000, seed=None, chunk=CHUNK, **rules):
+    """回傳 {game, rounds, rtp, var, sd, ci_low, ci_high, hit_rate, seconds}
+
+    rtp 以總派彩 / 總下注計；每局下注可不同 (21 點加倍 / 分牌)，變異數以比值估計 (派彩 - rtp × 下注) / 平均下注
+    """
+    fn, gen = GAMES[game], np.random.default_rng(seed)
+    strategy = strategy or next(iter(MIXES[game].values()))
+    sp = sw = spp = sww = spw = hits = 0.0
+    t0 = time.perf_counter()
+    for start in range(0, n_rounds, chunk):
+        bet, pay = fn(gen, min(chunk, n_rounds - start), strategy, **rules)
+        bet = np.broadcast_to(np.asarray(bet, dtype=float), pay.shape)
+        sp += pay.sum(); sw += bet.sum(); spp += (pay * pay).sum(); sww += (bet * bet).sum(); spw += (pay * bet).sum()
+        hits += (pay > bet).sum()
+    mean, w = float(sp / sw), float(sw / n_rounds)
+    var = max((spp - 2 * mean * spw + mean * mean * sww) / n_rounds, 0.0) / (w * w)
+    half = Z95 * math.sqrt(var / n_rounds)
+    return {"game": game, "rounds": n_rounds, "rtp": mean, "var": var, "sd": math.sqrt(var),
+            "ci_low": mean - half, "ci_high": mean + half, "hit_rate": float(hits / n_rounds), "seconds": time.perf_counter() - t0}
+
+
+def report(rtp=None, n_rounds=1_000_000, seed=None, games=None, wheel_items=(), wheel_cost=100):
+    """各遊戲 × 各注單組合一列；rtp 為後台設定 {遊戲: 值} (輪盤 / 百家樂 / 21 點套用控制)"""
+    rtp = rtp or {}
+    rows = []
+    for game in games or MIXES:
+        rules = {"roulette": {"rtp": rtp.get("roulette", 1.0)}, "baccarat": {"rtp": rtp.get("baccarat", 1.0)},
+                 "blackjack": {"rtp": rtp.get("blackjack", 1.0)},
+                 "wheel": {"cost": wheel_cost, "items": list(wheel_items)}}.get(game, {})
+        for i, (mix, strategy) in enumerate(MIXES[game].items()):
+            r = run(game, strategy, n_rounds, None if seed is None else seed + i, **rules)
+            rows.append({**r, "mix": mix, "target": rtp.get(game) if game in RTP_GAMES else None})
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description="RTP 蒙地卡羅驗證")
+    ap.add_argument("--rounds", type=int, default=10_000_000)
+    ap.add_argument("--rtp", type=float, default=0.95, help="輪盤 / 百家樂 / 21點 的設定 RTP")
+    ap.add_argument("--game", choices=list(MIXES), action="append", help="可重複；預設全部 (轉盤需 --wheel-items)")
+    ap.add_argument("--seed", type=int, default=None)
+    ap.add_argument("--wheel-items", type=json.loads, default=None,
+                    help='轉盤獎項 JSON (Inventory 資料列)，例 \'[{"item_name": "可樂", "item_value": 100, "weight": 10}]\'')
+    ap.add_argument("--wheel-cost", type=int, default=100)
+    args = ap.parse_args()
+
+    # 轉盤的派彩來自 Inventory 獎項；沒給獎項時不跑，避免印出全為 0 的假結果
+    games = args.game or [g for g in MIXES if g != "wheel" or args.wheel_items]
+    if "wheel" in games and not args.wheel_items: ap.error("轉盤需要 --wheel-items (Inventory 獎項 JSON)")
+    rows = report({g: args.rtp for g in RTP_GAMES}, args.rounds, args.seed, games,
+                  wheel_items=args.wheel_items or (), wheel_cost=args.wheel_cost)
+    print(f"{'遊戲':<10}{'注單':<10}{'設定':>7}{'實際 RTP':>10}{'標準差':>9}{'95% 信賴區間':>22}{'贏局率':>8}{'秒':>7}")
+    for r in rows:
+        target = f"{r['target']:.3f}" if r["target"] is not None else "-"
+        ci = f"[{r['ci_low']:.4f}, {r['ci_high']:.4f}]"
+        print(f"{r['game']:<10}{r['mix']:<10}{target:>7}{r['rtp']:>10.4f}{r['sd']:>9.3f}{ci:>22}{r['hit_rate']:>8.3f}{r['seconds']:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
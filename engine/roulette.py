@@ -0,0 +1,71 @@
+"""輪盤：單零 37 格；每種下注目標編成 37×K 派彩矩陣的一欄 (含本金倍數)
+
+注單 → 長度 K 的金額向量，37 個開出結果的派彩 = 矩陣 × 向量 一次算完；
+rtp 偏向、結算 (取其中一格) 與下注盤的可贏金額都走同一張表。新增下注類型 = 在 OUTSIDE 加一欄。
+"""
+import numpy as np
+
+RED = frozenset({1, 3, 5, 7, 9, 12, 14, 16, 18, 19, 21, 23, 25, 27, 30, 32, 34, 36})
+POCKETS = range(37)
+STRATEGY = {"bets": {"紅色": 100}}
+
+# 外圍注：注單 key → (含本金倍數, 命中條件)；單號 "0".."36" 為 ×36
+OUTSIDE = {
+    "紅色": (2, lambda n: n in RED),
+    "黑色": (2, lambda n: n != 0 and n not in RED),
+    "Odd": (2, lambda n: n % 2 == 1),
+    "Even": (2, lambda n: n != 0 and n % 2 == 0),
+    "1-18": (2, lambda n: 1 <= n <= 18),
+    "19-36": (2, lambda n: n >= 19),
+    "1st12": (3, lambda n: 1 <= n <= 12),
+    "2nd12": (3, lambda n: 13 <= n <= 24),
+    "3rd12": (3, lambda n: n >= 25),
+    "col1": (3, lambda n: n % 3 == 1),
+    "col2": (3, lambda n: n % 3 == 2),
+    "col3": (3, lambda n: n != 0 and n % 3 == 0),
+}
+
+KEYS = [str(n) for n in POCKETS] + list(OUTSIDE)
+INDEX = {k: i for i, k in enumerate(KEYS)}
+PAYOUT = np.zeros((len(POCKETS), len(KEYS)), dtype=np.int64)
+PAYOUT[list(POCKETS), list(POCKETS)] = 36
+for _k, (_mult, _hit) in OUTSIDE.items():
+    PAYOUT[[n for n in POCKETS if _hit(n)], INDEX[_k]] = _mult
+
+
+def slip(bets):
+    """注單 {key: 金額} → 金額向量 (未知 key 拋 KeyError，前端注單需先經 boards.clean_slip)"""
+    v = np.zeros(len(KEYS), dtype=np.int64)
+    for k, amt in bets.items(): v[INDEX[k]] += amt
+    return v
+
+
+def outcomes(bets):
+    """37 個開出號碼各自的派彩"""
+    return PAYOUT @ slip(bets)
+
+
+def payout(bets, n):
+    return int(outcomes(bets)[n])
+
+
+def losing_numbers(bets):
+    return np.flatnonzero(outcomes(bets) < sum(bets.values()))
+
+
+def spin(rng, bets, rtp=1.0):
+    """回傳 (開出號碼, 派彩)；以 1 - rtp 的機率改從會輸的號碼中開出"""
+    wins = outcomes(bets)
+    lose = np.flatnonzero(wins < sum(bets.values())) if rng.random() > rtp else ()
+    n = int(rng.choice(lose)) if len(lose) else rng.randint(0, 36)
+    return n, int(wins[n])
+
+
+def table():
+    """下注盤用：{key: [倍數, [命中號碼]]} (由派彩矩陣每欄取出)"""
+    return {k: [int(PAYOUT[:, i].max()), np.flatnonzero(PAYOUT[:, i]).tolist()] for i, k in enumerate(KEYS)}
+
+
+def play(rng, strategy, rtp=1.0):
+    bets = strategy["bets"]
+    return sum(bets.values()), spin(rng, bets, rtp)[1]
@@ -0,0 +1,22 @@
+"""幸運轉盤：依獎項權重抽一格；派彩以獎項的 item_value 計 (銘謝惠顧為 0)"""
+
+FILLER = {"item_name": "銘謝惠顧", "item_value": 0, "img_url": "", "weight": 50}
+SLOTS = 8
+STRATEGY = {}
+
+
+def slots(items):
+    """取前 8 項，不足以銘謝惠顧補滿"""
+    out = list(items[:SLOTS])
+    while len(out) < SLOTS: out.append(dict(FILLER))
+    return out
+
+
+def spin(rng, items):
+    weights = [float(i.get("weight", 10)) for i in items]
+    return rng.choices(range(len(items)), weights=weights)[0]
+
+
+def play(rng, strategy, cost=100, items=()):
+    board = slots(items)
+    return cost, int(board[spin(rng, board)].get("item_value") or 0)
@@ -0,0 +1,101 @@
+"""清單渲染層：整張清單一次送出 (單一元件、單一 payload)，前端只繪出可視範圍內的列
+
+每列 = 伺服器端套好樣板的 HTML + 動作按鈕；按鈕與勾選都在同一個元件內，回傳 action 觸發值：
+    {"action": 動作, "row": 列 id}            單列按鈕 (領取 / 購買)
+    {"action": 動作, "rows": [列 id, ...]}     勾選後的批次動作 (背包刪除)
+元件不隔離樣式 (isolate_styles=False)，直接沿用頁面上的 mission-card / mall-card / lb-rank-card 等 CSS。
+"""
+import html
+
+
+def esc(v):
+    return html.escape(str(v if v is not None else ""))
+
+
+def row(row_id, body, actions=()):
+    """actions: [(動作, 按鈕文字, 是否停用)]"""
+    return {"id": str(row_id), "html": body, "actions": [{"id": a, "label": label, "disabled": bool(off)} for a, label, off in actions]}
+
+
+def data(rows, row_height, cols=1, height=640, select=None, header="", empty="暫無資料"):
+    """row_height 為每一列 (多欄時為每一橫排) 的固定高度，虛擬捲動依此計算可視範圍"""
+    return {"rows": rows, "row_height": row_height, "cols": cols, "height": height, "select": select, "header": header, "empty": empty}
+
+
+def picked(action, name, rows=None):
+    """取出指定動作的觸發值；rows 給定時只接受清單內的列 id (前端送來的值不可信)"""
+    if not isinstance(action, dict) or action.get("action") != name: return None
+    ids = {r["id"] for r in rows} if rows is not None else None
+    if "rows" in action:
+        out = [str(i) for i in action.get("rows") or []]
+        return [i for i in out if ids is None or i in ids]
+    rid = str(action.get("row"))
+    return rid if ids is None or rid in ids else None
+
+
+CSS = """
+.klv-view { overflow-y: auto; position: relative; }
+.klv-item { position: absolute; left: 0; right: 0; display: grid; gap: 10px; }
+.klv-cell { display: flex; gap: 8px; align-items: stretch; min-width: 0; }
+.klv-cell > .klv-body { flex: 1; min-width: 0; }
+.klv-cols-1 .klv-cell { flex-direction: row; align-items: center; }
+.klv-acts { display: flex; gap: 6px; align-items: center; }
+.klv-grid .klv-cell { flex-direction: column; } .klv-grid .klv-acts > button { flex: 1; }
+.klv-acts button, .klv-bar button { cursor: pointer; border-radius: 8px; border: 1px solid #555; background: #222; color: #FFF; padding: 6px 12px; font-weight: bold; }
+.klv-acts button:disabled { opacity: 0.45; cursor: default; }
+.klv-bar { display: flex; justify-content: space-between; align-items: center; margin: 8px 0; color: #AAA; }
+.klv-bar button:disabled { opacity: 0.4; cursor: default; }
+.klv-empty { color: #AAA; padding: 10px; }
+"""
+
+JS = """
+export default function ({ data, parentElement, setTriggerValue }) {
+  let el = parentElement.querySelector('.klv');
+  if (!el) { el = document.createElement('div'); el.className = 'klv'; parentElement.appendChild(el); }
+  const rows = data.rows, cols = data.cols, rh = data.row_height, lines = Math.ceil(rows.length / cols);
+  const ids = new Set(rows.map(r => r.id));
+  const sel = parentElement.__klvSel = new Set([...(parentElement.__klvSel || [])].filter(i => ids.has(i)));
+  if (!rows.length) { el.innerHTML = (data.header || '') + `<div class="klv-empty">${data.empty}</div>`; return; }
+
+  const bar = data.select ? `<div class="klv-bar"><span class="klv-count"></span><button data-batch="1">${data.select.label}</button></div>` : '';
+  el.innerHTML = (data.header || '') + `<div class="klv-view ${cols > 1 ? 'klv-grid' : 'klv-cols-' + cols}" style="height:${Math.min(data.height, lines * rh)}px">` +
+                 `<div class="klv-space" style="height:${lines * rh}px"></div></div>` + bar;
+  const view = el.querySelector('.klv-view'), space = el.querySelector('.klv-space');
+
+  const cell = (r) => {
+    const box = data.select ? `<input type="checkbox" data-sel="${r.id}" ${sel.has(r.id) ? 'checked' : ''}>` : '';
+    const acts = r.actions.map(a => `<button data-act="${a.id}" data-row="${r.id}" ${a.disabled ? 'disabled' : ''}>${a.label}</button>`).join('');
+    return `<div class="klv-cell">${box}<div class="klv-body">${r.html}</div>${acts ? `<div class="klv-acts">${acts}</div>` : ''}</div>`;
+  };
+  const syncBar = () => {
+    if (!data.select) return;
+    el.querySelector('.klv-count').textContent = `已選取 ${sel.size} 筆`;
+    el.querySelector('[data-batch]').disabled = !sel.size;
+  };
+  // 只繪出可視範圍 (前後各多繪 4 排)
+  let drawn = '';
+  const draw = () => {
+    const first = Math.max(0, Math.floor(view.scrollTop / rh) - 4);
+    const last = Math.min(lines, Math.ceil((view.scrollTop + view.clientHeight) / rh) + 4);
+    if (drawn === first + ':' + last) return;
+    drawn = first + ':' + last;
+    let out = '';
+    for (let i = first; i < last; i++) {
+      const chunk = rows.slice(i * cols, (i + 1) * cols).map(cell).join('');
+      out += `<div class="klv-item" style="top:${i * rh}px;height:${rh - 10}px;grid-template-columns:repeat(${cols}, 1fr)">${chunk}</div>`;
+    }
+    space.innerHTML = out;
+  };
+  view.onscroll = () => requestAnimationFrame(draw);
+  el.onclick = (e) => {
+    const t = e.target;
+    if (t.dataset.sel) { t.checked ? sel.add(t.dataset.sel) : sel.delete(t.dataset.sel); syncBar(); return; }
+    const b = t.closest('button'); if (!b || b.disabled) return;
+    if (b.dataset.batch) { b.disabled = true; setTriggerValue('action', { action: data.select.action, rows: [...sel] }); sel.clear(); }
+    else if (b.dataset.act) { b.disabled = true; setTriggerValue('action', { action: b.dataset.act, row: b.dataset.row }); }
+  };
+  draw(); syncBar();
+}
+"""
+
+LIST = {"css": CSS, "js": JS, "isolate_styles": False}
@@ -0,0 +1,186 @@
+"""任務引擎：事件驅動的進度計數器，一次評估玩家所有進行中任務 (查詢數固定，與任務數量無關)
+
+簽到 / 遊戲勝場 / 賽事完賽等事件經 HANDLERS 換算成各條件的增量，依日 / 週 / 月 / 賽季週期桶
+累加到 Progress_Counters；任務頁只以主鍵查回目前週期的計數。新增條件 = 新增一個事件處理函式。
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+
+# 任務類型 → 週期桶
+BUCKETS = {"Daily": "D", "Weekly": "W", "Monthly": "M", "Season": "S"}
+
+# 量測值 (直接覆寫、不分週期) 的條件
+GAUGES = {"consecutive_checkin"}
+
+# 事件 → 處理函式 (payload → {條件: 增量或量測值})
+HANDLERS = {}
+
+
+def on(event):
+    def deco(fn):
+        HANDLERS.setdefault(event, []).append(fn)
+        return fn
+    return deco
+
+
+@on("checkin")
+def _checkin(p):
+    return {"daily_checkin": 1, "consecutive_checkin": p.get("streak", 1)}
+
+
+@on("game_win")
+def _game_win(p):
+    return {"daily_win": 1}
+
+
+@on("tournament_finish")
+def _tournament_finish(p):
+    return {"tournament_play": p.get("entries", 1)}
+
+
+CRITERIA = ["daily_checkin", "consecutive_checkin", "daily_win", "tournament_play"]
+
+
+def period_start(m_type, now):
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    if m_type == "Weekly": return today - timedelta(days=today.weekday())
+    if m_type == "Monthly": return today.replace(day=1)
+    if m_type == "Season": return datetime(2020, 1, 1)
+    return today
+
+
+def bucket_id(bucket, now):
+    if bucket == "D": return "D" + now.strftime("%Y-%m-%d")
+    if bucket == "W": return "W%04d-%02d" % now.isocalendar()[:2]
+    if bucket == "M": return "M" + now.strftime("%Y-%m")
+    return "S"
+
+
+def counter_key(player_id, criterion, bucket, now):
+    return f"{player_id}:{criterion}:{bucket_id('S' if criterion in GAUGES else bucket, now)}"
+
+
+def counter_deltas(player_id, event, payload, now):
+    """事件 → (adds, sets)，每個累加條件同時寫入四個週期桶"""
+    adds, sets = {}, {}
+    for fn in HANDLERS.get(event, []):
+        for crit, v in fn(payload).items():
+            if crit in GAUGES: sets[counter_key(player_id, crit, "S", now)] = v
+            else:
+                for b in BUCKETS.values():
+                    k = counter_key(player_id, crit, b, now); adds[k] = adds.get(k, 0) + v
+    return adds, sets
+
+
+def _parse_time(s):
+    return datetime.fromisoformat(str(s).replace('Z', '+00:00')).replace(tzinfo=None)
+
+
+class MissionEngine:
+    def __init__(self, db, outbox, ttl=30, missions_ttl=60):
+        self.db = db; self.outbox = outbox; self.ttl = ttl; self.missions_ttl = missions_ttl
+        self.lock = threading.Lock()
+        self._facts = {}      # player_id → (到期時間, {"day", "claims", "counters"})
+        self._missions = (0.0, [])
+
+    # --- 任務清單 (所有玩家共用) ---
+    def active_missions(self):
+        exp, rows = self._missions
+        if time.time() < exp: return rows
+        rows = self.db.table("Missions").select("*").eq("status", "Active").order("id").execute().data or []
+        self._missions = (time.time() + self.missions_ttl, rows)
+        return rows
+
+    def invalidate_missions(self):
+        self._missions = (0.0, [])
+
+    # --- 玩家事實 (領取紀錄一次查詢 + 計數器一次主鍵查詢) ---
+    def _load_facts(self, player_id, missions, now):
+        ids = [m['id'] for m in missions]
+        claims = {}
+        if ids:
+            oldest = min(period_start(m['type'], now) for m in missions)
+            logs = self.db.table("Mission_Logs").select("mission_id, claim_time").eq("player_id", player_id) \
+                .in_("mission_id", ids).gte("claim_time", oldest.isoformat()).execute().data or []
+            for r in logs:
+                t = _parse_time(r['claim_time'])
+                if r['mission_id'] not in claims or t > claims[r['mission_id']]: claims[r['mission_id']] = t
+        keys = sorted({counter_key(player_id, c, b, now) for c in CRITERIA for b in BUCKETS.values()})
+        rows = self.db.table("Progress_Counters").select("counter_key, value").in_("counter_key", keys).execute().data or []
+        counters = dict.fromkeys(keys, 0)
+        counters.update({r['counter_key']: r['value'] or 0 for r in rows})
+        return {"day": now.date(), "claims": claims, "counters": counters}
+
+    def _get_facts(self, player_id, missions, now):
+        with self.lock:
+            hit = self._facts.get(player_id)
+        if hit and hit[0] > time.time() and hit[1]["day"] == now.date(): return hit[1]
+        facts = self._load_facts(player_id, missions, now)
+        with self.lock:
+            self._facts[player_id] = (time.time() + self.ttl, facts)
+        return facts
+
+    def evaluate(self, player_id, missions=None, now=None):
+        """回傳 {mission_id: (達成, 已領取, 目前進度)}"""
+        now = now or datetime.now()
+        missions = self.active_missions() if missions is None else missions
+        facts = self._get_facts(player_id, missions, now)
+        out = {}
+        for m in missions:
+            target = m['target_value']
+            val = facts["counters"].get(counter_key(player_id, m['target_criteria'], BUCKETS.get(m['type'], "D"), now), 0)
+            last = facts["claims"].get(m['id'])
+            out[m['id']] = (val >= target, last is not None and last >= period_start(m['type'], now), min(val, target))
+        return out
+
+    # --- 事件 ---
+    def emit(self, player_id, event, now=None, **payload):
+        """玩家互動事件：先確保快取已載入再就地套用，重新整理時不必等背景佇列落地"""
+        now = now or datetime.now()
+        adds, sets = counter_deltas(player_id, event, payload, now)
+        if not adds and not sets: return
+        facts = self._get_facts(player_id, self.active_missions(), now)
+        with self.lock:
+            for k, v in adds.items(): facts["counters"][k] = facts["counters"].get(k, 0) + v
+            facts["counters"].update(sets)
+        self.outbox.bump(adds, sets)
+
+    def emit_many(self, events, now=None):
+        """批次事件 [(玩家, 事件, payload)] (賽事導入)：合併成一次寫入，只更新已在快取中的玩家"""
+        now = now or datetime.now()
+        adds, sets = {}, {}
+        for player_id, event, payload in events:
+            a, s = counter_deltas(player_id, event, payload, now)
+            for k, v in a.items(): adds[k] = adds.get(k, 0) + v
+            sets.update(s)
+        if not adds and not sets: return
+        with self.lock:
+            for k, v in list(adds.items()) + list(sets.items()):
+                hit = self._facts.get(k.rsplit(":", 2)[0])
+                if hit and k in hit[1]["counters"]:
+                    hit[1]["counters"][k] = v if k in sets else hit[1]["counters"][k] + v
+        self.outbox.bump(adds, sets)
+
+    # --- 啟動 ---
+    def backfill(self):
+        """啟動時回填一次計數器 (計數器上線前的紀錄)；資料庫以標記保證只執行一次，回傳寫入列數或 None"""
+        try: n = self.db.backfill_progress()
+        except Exception as e: print(f"Backfill Error: {e}"); return None
+        if n: self.reset()
+        return n
+
+    # --- 失效 / 就地更新 ---
+    def invalidate(self, player_id):
+        with self.lock:
+            self._facts.pop(player_id, None)
+
+    def reset(self):
+        with self.lock:
+            self._facts = {}
+        self.invalidate_missions()
+
+    def note_claim(self, player_id, mission_id, when=None):
+        with self.lock:
+            hit = self._facts.get(player_id)
+            if hit: hit[1]["claims"][mission_id] = when or datetime.now()
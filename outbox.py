@@ -0,0 +1,232 @@
+"""背景寫入佇列：寫入先落地到本機 SQLite (WAL)，再由有上限的工作執行緒批次送往儲存後端
+
+送出語意為 at-least-once：程序在「後端已寫入、佇列尚未刪除」之間中斷時，重啟後會再送一次。
+一批中的每個後端請求成功後立即刪除它涵蓋的項目，部分失敗時只重送失敗的部分 (不會重複入帳已送出的)；
+重試 max_attempts 次仍失敗 (或玩家不存在) 的項目移到 dead_letter 表，由後台檢視 / 重新排隊。
+"""
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+
+class Outbox:
+    def __init__(self, db, path="outbox.db", workers=2, batch_size=500, linger=0.05, max_backoff=300, max_attempts=10):
+        self.db = db
+        self.workers = workers; self.batch_size = batch_size; self.linger = linger; self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, op TEXT, target TEXT, payload TEXT,
+            attempts INTEGER DEFAULT 0, next_at REAL DEFAULT 0, claimed INTEGER DEFAULT 0, created_at REAL)""")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS dead_letter (
+            id INTEGER PRIMARY KEY, op TEXT, target TEXT, payload TEXT, attempts INTEGER, created_at REAL, error TEXT, failed_at REAL)""")
+        # 上次程序中斷時已領取但未完成的項目重新排隊
+        self.conn.execute("UPDATE outbox SET claimed = 0 WHERE claimed = 1")
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="outbox")
+        self.sent = 0; self.failed = 0; self.batches = 0; self.requests = 0
+        self.last_flush_ms = 0.0; self.total_flush_ms = 0.0; self.last_error = ""
+        self._thread = None
+
+    # --- 寫入端 (呼叫方只做一次本機 INSERT) ---
+    def enqueue(self, op, target, payload):
+        with self.lock:
+            self.conn.execute("INSERT INTO outbox (op, target, payload, created_at) VALUES (?, ?, ?, ?)",
+                              (op, target, json.dumps(payload, ensure_ascii=False, default=str), time.time()))
+        self.wake.set()
+
+    def insert(self, table, row):
+        self.enqueue("insert", table, row)
+
+    def update(self, table, values, match):
+        self.enqueue("update", table, {"values": values, "match": match})
+
+    def credit(self, pf_id, xp=0, vip_points=0):
+        """入帳用 (不可為扣款)：同一批次內同一玩家的增量會合併成一次原子更新"""
+        self.enqueue("credit", "Members", {"pf_id": pf_id, "xp": int(xp), "vip_points": int(vip_points)})
+
+    def bump(self, adds, sets=None):
+        """任務進度計數器：同一批次內的增量相加、覆寫值取最後一筆"""
+        self.enqueue("bump", "Progress_Counters", {"adds": adds, "sets": sets or {}})
+
+    # --- 送出端 ---
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="outbox-dispatch", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            self.wake.wait(timeout=1.0); self.wake.clear()
+            time.sleep(self.linger)  # 稍等讓同一波寫入湊成一批
+            try:
+                while self._dispatch(): pass
+            except Exception as e:
+                self.last_error = str(e); print(f"Outbox Error: {e}")
+
+    def _claim(self):
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            rows = self.conn.execute("SELECT id, op, target, payload, attempts FROM outbox WHERE claimed = 0 AND next_at <= ? ORDER BY id LIMIT ?",
+                                     (time.time(), self.batch_size)).fetchall()
+            if rows: self.conn.executemany("UPDATE outbox SET claimed = 1 WHERE id = ?", [(r[0],) for r in rows])
+            self.conn.execute("COMMIT")
+        return rows
+
+    def _dispatch(self):
+        rows = self._claim()
+        if not rows: return False
+        t0 = time.perf_counter()
+        futures = []
+        try:
+            for (op, target), items in self._group(rows).items(): futures.append(self.pool.submit(self._send, op, target, items))
+            for f in futures: f.result()
+        finally:
+            # 中途出錯時等已送出的請求結束，仍在領取狀態的項目放回佇列 (成功的已刪除、失敗的已排重試)
+            wait(futures)
+            with self.lock:
+                self.conn.executemany("UPDATE outbox SET claimed = 0 WHERE id = ? AND claimed = 1", [(r[0],) for r in rows])
+        ms = (time.perf_counter() - t0) * 1000
+        self.batches += 1; self.last_flush_ms = ms; self.total_flush_ms += ms
+        return len(rows) == self.batch_size
+
+    @staticmethod
+    def _group(rows):
+        groups = {}
+        for rid, op, target, payload, attempts in rows:
+            p = json.loads(payload)
+            # 多列 INSERT 需要相同欄位組合
+            key = (op, target if op != "insert" else (target, tuple(sorted(p))))
+            groups.setdefault(key, []).append((rid, p, attempts))
+        return groups
+
+    def _send(self, op, target, items):
+        """送出一組同類項目；每個後端請求成功後立即確認它涵蓋的項目，例外時只重送尚未確認的"""
+        pending = {i[0]: i for i in items}
+
+        def ack(ids):
+            self._done(ids)
+            for i in ids: pending.pop(i, None)
+
+        try:
+            if op == "insert":
+                self.db.table(target[0]).insert([p for _, p, _ in items]).execute(); self._count_request()
+                ack(list(pending))
+            elif op == "update":
+                merged = {}
+                for rid, p, _ in items:
+                    m = merged.setdefault(tuple(sorted(p["match"].items())), [{}, []])
+                    m[0].update(p["values"]); m[1].append(rid)
+                for k, (values, ids) in merged.items():
+                    q = self.db.table(target).update(values)
+                    for col, val in k: q = q.eq(col, val)
+                    q.execute(); self._count_request()
+                    ack(ids)
+            elif op == "credit":
+                sums = {}
+                for rid, p, _ in items:
+                    s = sums.setdefault(p["pf_id"], [0, 0, []]); s[0] += p["xp"]; s[1] += p["vip_points"]; s[2].append(rid)
+                for pf_id, (xp, vp, ids) in sums.items():
+                    got = self.db.adjust_balance(pf_id, xp=xp, vip_points=vp); self._count_request()
+                    if got is None:
+                        # 玩家不存在 (已刪除)：不重試，留在 dead_letter 供查帳
+                        self._bury([pending.pop(i) for i in ids], f"玩家 {pf_id} 不存在")
+                    else: ack(ids)
+            elif op == "bump":
+                adds, sets = {}, {}
+                for _, p, _ in items:
+                    for k, v in p["adds"].items(): adds[k] = adds.get(k, 0) + v
+                    sets.update(p["sets"])
+                self.db.bump_counters(adds, sets); self._count_request()
+                ack(list(pending))
+        except Exception as e:
+            self.last_error = str(e); print(f"Outbox Error: {e}")
+            self._retry(list(pending.values()), str(e))
+
+    def _done(self, ids):
+        with self.lock:
+            self.conn.executemany("DELETE FROM outbox WHERE id = ?", [(i,) for i in ids])
+            self.sent += len(ids)
+
+    def _retry(self, items, error=""):
+        now = time.time()
+        dead = [i for i in items if i[2] + 1 >= self.max_attempts]
+        if dead: self._bury(dead, error)
+        with self.lock:
+            self.conn.executemany("UPDATE outbox SET claimed = 0, attempts = attempts + 1, next_at = ? WHERE id = ?",
+                                  [(now + min(self.max_backoff, 2 ** a), rid) for rid, _, a in items if a + 1 < self.max_attempts])
+            self.failed += len(items)
+
+    def _count_request(self):
+        """統計計數由送出執行緒池同時累加，一律在鎖內進行"""
+        with self.lock: self.requests += 1
+
+    def _bury(self, items, error):
+        """移到 dead_letter (保留原 id / 內容 / 次數)，不再自動重送"""
+        if not items: return
+        now = time.time()
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self.conn.executemany("""INSERT OR REPLACE INTO dead_letter (id, op, target, payload, attempts, created_at, error, failed_at)
+                                     SELECT id, op, target, payload, attempts + 1, created_at, ?, ? FROM outbox WHERE id = ?""",
+                                  [(error, now, i[0]) for i in items])
+            self.conn.executemany("DELETE FROM outbox WHERE id = ?", [(i[0],) for i in items])
+            self.conn.execute("COMMIT")
+        print(f"Outbox: {len(items)} 筆移到 dead_letter ({error})")
+
+    def dead_letters(self, limit=100):
+        with self.lock:
+            rows = self.conn.execute("SELECT id, op, target, payload, attempts, error, failed_at FROM dead_letter ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [dict(zip(("id", "op", "target", "payload", "attempts", "error", "failed_at"), r)) for r in rows]
+
+    def requeue(self, ids=None):
+        """dead_letter 的項目放回佇列重送 (ids 為 None = 全部)，回傳筆數"""
+        where, params = ("", []) if ids is None else (f" WHERE id IN ({','.join('?' * len(ids))})", list(ids))
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            n = self.conn.execute(f"""INSERT INTO outbox (op, target, payload, attempts, next_at, claimed, created_at)
+                                      SELECT op, target, payload, 0, 0, 0, created_at FROM dead_letter{where}""", params).rowcount
+            self.conn.execute(f"DELETE FROM dead_letter{where}", params)
+            self.conn.execute("COMMIT")
+        self.wake.set()
+        return n
+
+    # --- 觀測 ---
+    def depth(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def pending(self, pf_id):
+        """此玩家尚未送出的入帳筆數 (扣款被拒時判斷是否值得等佇列)"""
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM outbox WHERE op = 'credit' AND json_extract(payload, '$.pf_id') = ?", (pf_id,)).fetchone()[0]
+
+    def flush(self, timeout=5.0, pf_id=None):
+        """喚醒並等待佇列清空 (逾時回傳 False)；指定 pf_id 時只等此玩家的入帳"""
+        sql, args = "SELECT COUNT(*) FROM outbox WHERE next_at <= ?", []
+        if pf_id is not None: sql, args = sql + " AND op = 'credit' AND json_extract(payload, '$.pf_id') = ?", [pf_id]
+        end = time.time() + timeout
+        while time.time() < end:
+            with self.lock:
+                ready = self.conn.execute(sql, [time.time()] + args).fetchone()[0]
+            if not ready: return True
+            self.wake.set(); time.sleep(0.02)
+        return False
+
+    def stats(self):
+        with self.lock:
+            depth, oldest = self.conn.execute("SELECT COUNT(*), MIN(created_at) FROM outbox").fetchone()
+            dead = self.conn.execute("SELECT COUNT(*) FROM dead_letter").fetchone()[0]
+        return {
+            "depth": depth, "oldest_age_s": round(time.time() - oldest, 1) if oldest else 0.0,
+            "sent": self.sent, "failed": self.failed, "dead": dead, "batches": self.batches, "requests": self.requests,
+            "last_flush_ms": round(self.last_flush_ms, 1),
+            "avg_flush_ms": round(self.total_flush_ms / self.batches, 1) if self.batches else 0.0,
+            "last_error": self.last_error,
+        }
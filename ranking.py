@@ -0,0 +1,125 @@
+"""程序內排名索引：以 bisect 維護排序陣列，名次 / 百分位 / 前後名玩家查詢皆為 O(log n)
+
+啟動時自資料庫載入一次，之後由導入、上帝之手、結算等路徑增量更新，並定期與資料庫重新對帳。
+"""
+import threading
+import time
+from bisect import bisect_left, insort
+
+
+class RankingIndex:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self._keys = []   # (-points, player_id) 遞增排序 = 積分遞減
+        self._pts = {}
+        self.names = {}
+
+    def load(self, rows):
+        with self.lock:
+            self._pts = {r['player_id']: r['points'] or 0 for r in rows}
+            self.names = {r['player_id']: r.get('name') or r['player_id'] for r in rows}
+            self._keys = sorted((-p, pid) for pid, p in self._pts.items())
+
+    def __len__(self):
+        return len(self._keys)
+
+    def points(self, pid):
+        return self._pts.get(pid)
+
+    # --- 增量更新 ---
+    def remove(self, pid):
+        with self.lock:
+            old = self._pts.pop(pid, None)
+            if old is None: return
+            i = bisect_left(self._keys, (-old, pid))
+            if i < len(self._keys) and self._keys[i] == (-old, pid): del self._keys[i]
+
+    def set(self, pid, pts, name=None):
+        with self.lock:
+            self.remove(pid)
+            self._pts[pid] = pts
+            insort(self._keys, (-pts, pid))
+            if name: self.names[pid] = name
+
+    def add(self, pid, delta, name=None):
+        with self.lock:
+            self.set(pid, (self._pts.get(pid) or 0) + delta, name)
+
+    def transform(self, fn):
+        """整榜套用同一公式 (賽季結算)，於本機重建不需查資料庫"""
+        with self.lock:
+            self._pts = {pid: fn(p) for pid, p in self._pts.items()}
+            self._keys = sorted((-p, pid) for pid, p in self._pts.items())
+
+    def clear(self):
+        with self.lock:
+            self._keys = []; self._pts = {}
+
+    # --- 查詢 ---
+    def position(self, pid):
+        """同分同名次 (1 起算)；未上榜回傳 None"""
+        p = self._pts.get(pid)
+        if p is None: return None
+        return bisect_left(self._keys, (-p, "")) + 1
+
+    def percentile(self, pid):
+        """積分嚴格低於自己的玩家比例 (0~100)"""
+        p = self._pts.get(pid)
+        n = len(self._keys)
+        if p is None or n == 0: return None
+        below = n - bisect_left(self._keys, (-p, "\U0010FFFF"))
+        return 100.0 * below / n
+
+    def neighbors(self, pid, k=1):
+        """前後各 k 位 ([(名次, 名稱, 積分)] 上方, 下方)"""
+        with self.lock:
+            p = self._pts.get(pid)
+            if p is None: return [], []
+            i = bisect_left(self._keys, (-p, pid))
+            def info(j):
+                q, other = self._keys[j]
+                return bisect_left(self._keys, (q, "")) + 1, self.names.get(other, other), -q
+            return [info(j) for j in range(max(0, i - k), i)], [info(j) for j in range(i + 1, min(len(self._keys), i + 1 + k))]
+
+    def top(self, n):
+        return [(pid, -q) for q, pid in self._keys[:n]]
+
+
+class Rankings:
+    """總榜 / 月榜兩個索引，超過對帳間隔時於下次存取重新載入；載入失敗後以 backoff 起算倍增退避 (上限為對帳間隔)"""
+    def __init__(self, db, reconcile_every=300, backoff=5):
+        self.db = db; self.reconcile_every = reconcile_every; self.backoff = backoff
+        self.boards = {"hero": RankingIndex(), "monthly": RankingIndex()}
+        self.loaded_at = 0.0
+        self.failures = 0; self.retry_at = 0.0
+        self._load_lock = threading.Lock()
+
+    def reload(self):
+        with self._load_lock: self._reload()
+
+    def _reload(self):
+        for board, idx in self.boards.items(): idx.load(self.db.board_scores(board))
+        self.loaded_at = time.time(); self.failures = 0; self.retry_at = 0.0
+
+    def get(self, board):
+        """過期時由一個請求重新載入 (同時到達的其他請求照用舊索引)；退避期間不查資料庫"""
+        now = time.time()
+        if now - self.loaded_at > self.reconcile_every and now >= self.retry_at and self._load_lock.acquire(blocking=False):
+            try: self._reload()
+            except Exception as e:
+                self.failures += 1
+                self.retry_at = now + min(self.reconcile_every, self.backoff * 2 ** (self.failures - 1))
+                print(f"Ranking reload error: {e} (連續 {self.failures} 次，{self.retry_at - now:.0f} 秒後再試)")
+            finally: self._load_lock.release()
+        return self.boards[board]
+
+    def remove_player(self, pid):
+        """刪除玩家：從每個榜單索引移除 (含名稱)"""
+        for idx in self.boards.values():
+            with idx.lock:
+                idx.remove(pid); idx.names.pop(pid, None)
+
+    def apply_deltas(self, board, rows, key, col, names=None):
+        """rows 與 bulk_add 相同格式 [{key: 玩家, col: 增量}]"""
+        idx = self.boards[board]
+        for r in rows: idx.add(r[key], r[col], (names or {}).get(r[key]))
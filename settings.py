@@ -0,0 +1,75 @@
+"""系統設定快照：System_Settings 一次解析成具型別的欄位，並帶版本號
+
+set_configs 寫入設定時同時更新 settings_version，各程序以短 TTL 比對版本號，版本變動才重新解析。
+"""
+import re
+import time
+from dataclasses import dataclass, field
+
+from tiers import TierTable
+
+VERSION_KEY = "settings_version"
+GAMES = ["mines", "wheel", "blackjack", "baccarat", "roulette"]
+
+
+def _int(v, default):
+    try: return int(float(v))
+    except (TypeError, ValueError): return default
+
+
+def _float(v, default):
+    try: return float(v)
+    except (TypeError, ValueError): return default
+
+
+def new_version():
+    # 以奈秒時間戳當版本號，多個程序同時寫入也不需先讀後寫
+    return str(time.time_ns())
+
+
+@dataclass(frozen=True)
+class Settings:
+    version: str = "0"
+    rank_limits: tuple = (1000, 500, 200, 80)   # 菁英 / 大師 / 鑽石 / 白金 門檻
+    tiers: TierTable = field(default_factory=lambda: TierTable((1000, 500, 200, 80)))
+    rtp: dict = field(default_factory=dict)
+    vip_bonus: dict = field(default_factory=dict)      # VIP 等級 → 簽到加成 %
+    vip_discount: dict = field(default_factory=dict)   # VIP 等級 → 商城折扣 %
+    checkin_min: int = 10
+    checkin_max: int = 500
+    flags: dict = field(default_factory=dict)          # 遊戲 → 是否開放
+    nickname_cost: int = 500
+    min_bet_wheel: int = 100
+    max_redeem_val: int = 1000000
+    marquee_th_xp: int = 5000
+    section_budget_ms: int = 800   # 單一區塊載入超過此時間即記錄
+    raw: dict = field(default_factory=dict)
+
+    @classmethod
+    def parse(cls, raw, version="0"):
+        def level_table(prefix):
+            out = {}
+            for k, v in raw.items():
+                m = re.fullmatch(prefix + r"(\d+)", k)
+                if m: out[int(m.group(1))] = _float(v, 0.0)
+            return out
+        limits = (_int(raw.get('rank_limit_challenger'), 1000), _int(raw.get('rank_limit_master'), 500),
+                  _int(raw.get('rank_limit_diamond'), 200), _int(raw.get('rank_limit_platinum'), 80))
+        return cls(
+            version=version, rank_limits=limits, tiers=TierTable(limits),
+            rtp={g: _float(raw.get(f'rtp_{g}'), 0.95) for g in ("roulette", "baccarat", "blackjack")},
+            vip_bonus=level_table("vip_bonus_"), vip_discount=level_table("vip_discount_"),
+            checkin_min=_int(raw.get('checkin_min'), 10), checkin_max=_int(raw.get('checkin_max'), 500),
+            flags={g: raw.get(f'status_{g}', 'ON') == 'ON' for g in GAMES},
+            nickname_cost=_int(raw.get('nickname_cost'), 500), min_bet_wheel=_int(raw.get('min_bet_wheel'), 100),
+            max_redeem_val=_int(raw.get('max_redeem_val'), 1000000), marquee_th_xp=_int(raw.get('marquee_th_xp'), 5000),
+            section_budget_ms=_int(raw.get('section_budget_ms'), 800),
+            raw=dict(raw),
+        )
+
+    def get(self, key, default):
+        """文字類設定 (標題、說明) 直接取原值"""
+        return self.raw.get(key, default)
+
+    def rank_title(self, pts):
+        return self.tiers.title(pts)
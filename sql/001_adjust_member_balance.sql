@@ -0,0 +1,13 @@
+-- 原子化 XP / VIP 點數增減：單次往返完成，扣款後餘額為負時不更新並回傳空集合
+create or replace function adjust_member_balance(p_pf_id text, p_xp bigint default 0, p_vp bigint default 0)
+returns table (new_xp bigint, new_vip_points bigint)
+language sql
+as $$
+  update "Members" m
+     set xp = coalesce(m.xp, 0) + p_xp,
+         vip_points = coalesce(m.vip_points, 0) + p_vp
+   where m.pf_id = p_pf_id
+     and (p_xp >= 0 or coalesce(m.xp, 0) + p_xp >= 0)
+     and (p_vp >= 0 or coalesce(m.vip_points, 0) + p_vp >= 0)
+  returning m.xp::bigint, m.vip_points::bigint;
+$$;
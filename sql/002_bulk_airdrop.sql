@@ -0,0 +1,53 @@
+-- 空投 / 批次增量用：依排位積分區間與 VIP 等級一次解析目標名單 (回傳陣列，不受 PostgREST max-rows 限制)
+create or replace function airdrop_cohort(p_min_points bigint default null, p_max_points bigint default null, p_vip_level int default null)
+returns text[]
+language sql
+stable
+as $$
+  select coalesce(array_agg(m.pf_id order by m.pf_id), '{}')
+    from "Members" m
+    left join "Leaderboard" l on l.player_id = m.pf_id
+   where (p_min_points is null or coalesce(l.hero_points, 0) >= p_min_points)
+     and (p_max_points is null or coalesce(l.hero_points, 0) < p_max_points)
+     and (p_vip_level is null or m.vip_level = p_vip_level);
+$$;
+
+-- 多列增量：p_rows = [{"<p_key>": ..., "<欄位>": 增量, ...}]，同一鍵需先在呼叫端合併
+-- p_upsert = true 時不存在的鍵會新增 (榜單用)，否則只更新既有資料列 (Members 用)
+create or replace function bulk_add(p_table text, p_key text, p_rows jsonb, p_upsert boolean default false)
+returns integer
+language plpgsql
+as $$
+declare
+  cols text[];
+  n integer;
+begin
+  if p_table not in ('Members', 'Leaderboard', 'Monthly_God') then
+    raise exception 'bulk_add: table % not allowed', p_table;
+  end if;
+  select array_agg(distinct k) into cols
+    from jsonb_array_elements(p_rows) r, jsonb_object_keys(r) k
+   where k <> p_key;
+  if cols is null then return 0; end if;
+  if p_upsert then
+    execute format(
+      'insert into %I as t (%I, %s) select r->>%L, %s from jsonb_array_elements($1) r on conflict (%I) do update set %s',
+      p_table, p_key,
+      (select string_agg(format('%I', c), ', ') from unnest(cols) c),
+      p_key,
+      (select string_agg(format('coalesce((r->>%L)::numeric, 0)', c), ', ') from unnest(cols) c),
+      p_key,
+      (select string_agg(format('%I = coalesce(t.%I, 0) + excluded.%I', c, c, c), ', ') from unnest(cols) c))
+    using p_rows;
+  else
+    execute format(
+      'update %I t set %s from jsonb_array_elements($1) r where t.%I = r->>%L',
+      p_table,
+      (select string_agg(format('%I = coalesce(t.%I, 0) + coalesce((r->>%L)::numeric, 0)', c, c, c), ', ') from unnest(cols) c),
+      p_key, p_key)
+    using p_rows;
+  end if;
+  get diagnostics n = row_count;
+  return n;
+end;
+$$;
@@ -0,0 +1,40 @@
+-- 賽事導入改以內容雜湊去重，並記錄逐塊檢查點以支援中斷續傳
+alter table "Import_History" add column if not exists content_hash text;
+alter table "Import_History" add column if not exists status text default 'done';
+alter table "Import_History" add column if not exists buy_in integer;
+alter table "Import_History" add column if not exists rows integer default 0;
+alter table "Import_History" add column if not exists chunk_size integer;
+alter table "Import_History" add column if not exists chunks_total integer default 0;
+alter table "Import_History" add column if not exists chunks_done integer default 0;
+create unique index if not exists import_history_content_hash on "Import_History" (content_hash);
+
+-- 單一交易套用一個區塊並推進檢查點；重送已完成的區塊直接回傳目前進度
+create or replace function apply_import_chunk(p_hash text, p_chunk integer, p_members jsonb, p_xp jsonb, p_hero jsonb, p_monthly jsonb, p_records jsonb)
+returns integer
+language plpgsql
+as $$
+declare
+  h "Import_History"%rowtype;
+begin
+  select * into h from "Import_History" where content_hash = p_hash for update;
+  if not found then raise exception 'apply_import_chunk: unknown import %', p_hash; end if;
+  if h.chunks_done > p_chunk then return h.chunks_done; end if;
+  if h.chunks_done < p_chunk then raise exception 'apply_import_chunk: chunk % out of order (done %)', p_chunk, h.chunks_done; end if;
+
+  insert into "Members" (pf_id, name, role, xp)
+    select pf_id, name, '玩家', 0 from jsonb_populate_recordset(null::"Members", p_members)
+    on conflict (pf_id) do nothing;
+  perform bulk_add('Members', 'pf_id', p_xp, false);
+  perform bulk_add('Leaderboard', 'player_id', p_hero, true);
+  perform bulk_add('Monthly_God', 'player_id', p_monthly, true);
+  insert into "Tournament_Records" (player_id, buy_in, rank, re_entries, payout, filename, actual_fee, time)
+    select player_id, buy_in, rank, re_entries, payout, filename, actual_fee, time
+      from jsonb_populate_recordset(null::"Tournament_Records", p_records);
+
+  update "Import_History"
+     set chunks_done = p_chunk + 1,
+         status = case when p_chunk + 1 >= chunks_total then 'done' else 'in_progress' end
+   where content_hash = p_hash;
+  return p_chunk + 1;
+end;
+$$;
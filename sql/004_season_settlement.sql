@@ -0,0 +1,81 @@
+-- 賽季結算 / 月榜換月：先封存結算前名次，再以單一語句套用；同一名稱只能執行一次
+create table if not exists "Settlement_Runs" (
+  id bigserial primary key,
+  kind text not null,            -- 'season' | 'month'
+  label text not null,
+  scheme text,
+  players integer default 0,
+  run_at timestamptz default now(),
+  unique (kind, label)
+);
+
+create table if not exists "Season_Archive" (
+  id bigserial primary key,
+  season_label text not null,
+  scheme text,
+  player_id text not null,
+  position integer,
+  hero_points numeric,
+  new_points numeric,
+  settled_at timestamptz default now()
+);
+create index if not exists season_archive_label on "Season_Archive" (season_label, position);
+
+create table if not exists "Monthly_Archive" (
+  id bigserial primary key,
+  month_label text not null,
+  player_id text not null,
+  position integer,
+  monthly_points numeric,
+  archived_at timestamptz default now()
+);
+create index if not exists monthly_archive_label on "Monthly_Archive" (month_label, position);
+
+create or replace function settle_season(p_scheme text, p_label text, p_house text default '330999')
+returns integer
+language plpgsql
+as $$
+declare
+  n integer;
+begin
+  if p_scheme not in ('A', 'B', 'soft') then raise exception 'settle_season: unknown scheme %', p_scheme; end if;
+  insert into "Settlement_Runs" (kind, label, scheme) values ('season', p_label, p_scheme);
+
+  insert into "Season_Archive" (season_label, scheme, player_id, position, hero_points, new_points)
+    select p_label, p_scheme, player_id,
+           rank() over (order by hero_points desc),
+           hero_points,
+           case p_scheme when 'A' then greatest(0, hero_points - 150)
+                         when 'B' then trunc(hero_points * 0.9)
+                         else trunc(hero_points * 0.4) end
+      from "Leaderboard" where player_id <> p_house;
+  get diagnostics n = row_count;
+
+  update "Leaderboard"
+     set hero_points = case p_scheme when 'A' then greatest(0, hero_points - 150)
+                                     when 'B' then trunc(hero_points * 0.9)
+                                     else trunc(hero_points * 0.4) end
+   where player_id <> p_house;
+
+  update "Settlement_Runs" set players = n where kind = 'season' and label = p_label;
+  return n;
+end;
+$$;
+
+create or replace function rollover_month(p_label text, p_house text default '330999')
+returns integer
+language plpgsql
+as $$
+declare
+  n integer;
+begin
+  insert into "Settlement_Runs" (kind, label) values ('month', p_label);
+  insert into "Monthly_Archive" (month_label, player_id, position, monthly_points)
+    select p_label, player_id, rank() over (order by monthly_points desc), monthly_points
+      from "Monthly_God" where player_id <> p_house;
+  get diagnostics n = row_count;
+  delete from "Monthly_God" where player_id <> p_house;
+  update "Settlement_Runs" set players = n where kind = 'month' and label = p_label;
+  return n;
+end;
+$$;
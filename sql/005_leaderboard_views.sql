@@ -0,0 +1,30 @@
+-- 榜單讀取：名稱與積分一次取回，並提供玩家自身名次 (同分同名次)
+create or replace view "Leaderboard_Named" as
+  select l.player_id, coalesce(m.name, l.player_id) as name, l.hero_points as points
+    from "Leaderboard" l left join "Members" m on m.pf_id = l.player_id;
+
+create or replace view "Monthly_God_Named" as
+  select g.player_id, coalesce(m.name, g.player_id) as name, g.monthly_points as points
+    from "Monthly_God" g left join "Members" m on m.pf_id = g.player_id;
+
+create or replace function board_position(p_board text, p_player text, p_house text default '330999')
+returns table (points numeric, position bigint, total bigint)
+language plpgsql
+stable
+as $$
+begin
+  if p_board = 'hero' then
+    return query
+      select coalesce((select l.hero_points from "Leaderboard" l where l.player_id = p_player), 0)::numeric,
+             (select count(*) from "Leaderboard" l where l.player_id <> p_house
+                 and l.hero_points > coalesce((select x.hero_points from "Leaderboard" x where x.player_id = p_player), 0)) + 1,
+             (select count(*) from "Leaderboard" l where l.player_id <> p_house);
+  else
+    return query
+      select coalesce((select g.monthly_points from "Monthly_God" g where g.player_id = p_player), 0)::numeric,
+             (select count(*) from "Monthly_God" g where g.player_id <> p_house
+                 and g.monthly_points > coalesce((select x.monthly_points from "Monthly_God" x where x.player_id = p_player), 0)) + 1,
+             (select count(*) from "Monthly_God" g where g.player_id <> p_house);
+  end if;
+end;
+$$;
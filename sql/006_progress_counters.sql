@@ -0,0 +1,20 @@
+-- 任務進度計數器：事件 (簽到 / 勝場 / 賽事完賽) 依週期桶累加，任務頁以主鍵一次查回
+create table if not exists "Progress_Counters" (
+  counter_key text primary key,  -- 玩家:條件:週期桶 例 p1:daily_win:D2026-10-18
+  value bigint default 0,
+  updated_at timestamptz default now()
+);
+
+-- p_adds = {"<counter_key>": 增量}；p_sets = {"<counter_key>": 值} 直接覆寫 (連續簽到天數等量測值)
+create or replace function bump_counters(p_adds jsonb default '{}', p_sets jsonb default '{}')
+returns void
+language sql
+as $$
+  insert into "Progress_Counters" as c (counter_key, value, updated_at)
+  select key, value::bigint, now() from jsonb_each_text(p_adds)
+  on conflict (counter_key) do update set value = coalesce(c.value, 0) + excluded.value, updated_at = now();
+
+  insert into "Progress_Counters" as c (counter_key, value, updated_at)
+  select key, value::bigint, now() from jsonb_each_text(p_sets)
+  on conflict (counter_key) do update set value = excluded.value, updated_at = now();
+$$;
@@ -0,0 +1,14 @@
+-- 商品排位門檻改存整數階級 (0 無限制, 1 白銀 … 5 菁英)，標籤欄位保留供顯示
+alter table "Inventory" add column if not exists mall_min_tier integer;
+alter table "Inventory" add column if not exists wheel_min_tier integer;
+
+update "Inventory" set
+  mall_min_tier = case
+    when mall_min_rank like '%菁英%' then 5 when mall_min_rank like '%大師%' then 4
+    when mall_min_rank like '%鑽石%' then 3 when mall_min_rank like '%白金%' then 2
+    when mall_min_rank like '%白銀%' then 1 else 0 end,
+  wheel_min_tier = case
+    when wheel_min_rank like '%菁英%' then 5 when wheel_min_rank like '%大師%' then 4
+    when wheel_min_rank like '%鑽石%' then 3 when wheel_min_rank like '%白金%' then 2
+    when wheel_min_rank like '%白銀%' then 1 else 0 end
+ where mall_min_tier is null or wheel_min_tier is null;
@@ -0,0 +1,2 @@
+-- 百家樂共用牌靴：13 種點數牌剩餘張數 + 本靴局數 (engine.baccarat.Shoe.encode)，空字串 = 新牌靴
+alter table "Baccarat_Global" add column if not exists shoe text default '';
@@ -0,0 +1,11 @@
+-- 掃雷伺服器端棋局登記：每位玩家一盤，layout / shown 為 25 格位元遮罩 (engine.mines.to_row)
+-- status = active (可翻格 / 結算) 或 over (已爆炸)；結算領錢時以 shown 為條件刪除，同一盤只能領一次
+create table if not exists "Mines_Games" (
+  player_id text primary key,
+  bet bigint not null,
+  mines int not null,
+  layout bigint not null,
+  shown bigint default 0,
+  status text default 'active',
+  started_at timestamptz default now()
+);
@@ -0,0 +1,45 @@
+-- 空投續傳：同一內容 (名單 + 點數 + 禮物) 未完成的執行會沿用同一個 run_key，已完成的塊不會重複發送
+create table if not exists "Airdrop_Runs" (
+  run_key text primary key,
+  content_hash text,
+  chunks_total integer default 0,
+  chunks_done integer default 0,
+  status text default 'in_progress',
+  created_at timestamptz default now()
+);
+create index if not exists airdrop_runs_hash on "Airdrop_Runs" (content_hash, status);
+
+create table if not exists "Airdrop_Chunks" (
+  chunk_key text primary key,  -- run_key:塊序號
+  run_key text,
+  players integer default 0,
+  done_at timestamptz default now()
+);
+
+-- 單一交易：標記此塊、發送點數與禮物，回傳 [點數列數, 禮物筆數]；此塊已完成時不動任何資料並回傳 null
+create or replace function apply_airdrop_chunk(p_run text, p_chunk integer, p_deltas jsonb, p_prizes jsonb)
+returns integer[]
+language plpgsql
+as $$
+declare
+  b integer;
+  n integer;
+begin
+  insert into "Airdrop_Chunks" (chunk_key, run_key, players, done_at)
+    values (p_run || ':' || p_chunk, p_run, greatest(jsonb_array_length(p_deltas), jsonb_array_length(p_prizes)), now())
+    on conflict (chunk_key) do nothing;
+  if not found then return null; end if;
+
+  b := bulk_add('Members', 'pf_id', p_deltas, false);
+  insert into "Prizes" (player_id, prize_name, status, time, expire_at, source)
+    select player_id, prize_name, status, time, expire_at, source
+      from jsonb_populate_recordset(null::"Prizes", p_prizes);
+  get diagnostics n = row_count;
+
+  update "Airdrop_Runs"
+     set chunks_done = chunks_done + 1,
+         status = case when chunks_done + 1 >= chunks_total then 'done' else 'in_progress' end
+   where run_key = p_run;
+  return array[coalesce(b, 0), n];
+end;
+$$;
@@ -0,0 +1,60 @@
+-- 任務計數器回填：由既有紀錄重建 Progress_Counters (006 之前的簽到 / 勝場 / 賽事不再遺失)
+--   簽到 = Prizes source DailyCheckIn、勝場 = Prizes source GameWin*、賽事 = Tournament_Records 每筆一場、連續簽到 = Members.consecutive_days
+-- 計數鍵與 missions.counter_key 相同；與現有值取較大者 (已累加的新事件不會被蓋掉)
+-- Settlement_Runs (backfill, progress_counters) 標記只執行一次；app 啟動時也會呼叫，已執行過回傳 null
+-- 時間字串前 10 碼轉日期；不存在的日期 (例 2026-02-30) 回傳 null 而不是讓整個回填失敗
+create or replace function backfill_date(p_time text)
+returns date
+language plpgsql
+immutable
+as $$
+begin
+  return left(p_time, 10)::date;
+exception when others then
+  return null;
+end;
+$$;
+
+create or replace function backfill_progress_counters()
+returns integer
+language plpgsql
+as $$
+declare
+  n integer;
+begin
+  insert into "Settlement_Runs" (kind, label) values ('backfill', 'progress_counters')
+    on conflict (kind, label) do nothing;
+  if not found then return null; end if;
+
+  -- 先過濾再轉型：格式不符的舊資料略過，不讓整個回填 (含標記) 失敗
+  with raw as (
+    select player_id, 'daily_checkin' as crit, "time"::text as ts from "Prizes" where source = 'DailyCheckIn'
+    union all
+    select player_id, 'daily_win', "time"::text from "Prizes" where source like 'GameWin%'
+    union all
+    select player_id, 'tournament_play', "time"::text from "Tournament_Records"
+  ), ev as (
+    select player_id, crit, t
+      from (select player_id, crit, backfill_date(ts) as t from raw where ts ~ '^\d{4}-\d{2}-\d{2}') d
+     where t is not null
+  ), keyed as (
+    select ev.player_id || ':' || ev.crit || ':' || b.id as counter_key, count(*) as value
+      from ev
+     cross join lateral (values ('D' || to_char(ev.t, 'YYYY-MM-DD')), ('W' || to_char(ev.t, 'IYYY-IW')),
+                                ('M' || to_char(ev.t, 'YYYY-MM')), ('S')) as b(id)
+     where ev.player_id is not null
+     group by 1
+    union all
+    select pf_id || ':consecutive_checkin:S', consecutive_days from "Members" where coalesce(consecutive_days, 0) > 0
+  )
+  insert into "Progress_Counters" as c (counter_key, value, updated_at)
+  select counter_key, value, now() from keyed
+  on conflict (counter_key) do update set value = greatest(coalesce(c.value, 0), excluded.value), updated_at = now();
+  get diagnostics n = row_count;
+
+  update "Settlement_Runs" set players = n where kind = 'backfill' and label = 'progress_counters';
+  return n;
+end;
+$$;
+
+select backfill_progress_counters();
@@ -0,0 +1,700 @@
+"""撲洛王國儲存層：Supabase 與內嵌 SQLite 共用同一套鏈式查詢介面"""
+import functools
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+HOUSE_ID = "330999"  # 老闆帳號，不列入榜單與清除
+
+# --- 資料表定義 (第一欄為主鍵 / 預設 upsert 衝突欄位) ---
+SCHEMA = {
+    "Members": [
+        ("pf_id", "TEXT PRIMARY KEY"), ("name", "TEXT"), ("password", "TEXT"), ("role", "TEXT DEFAULT '玩家'"),
+        ("xp", "INTEGER DEFAULT 0"), ("xp_temp", "INTEGER DEFAULT 0"),
+        ("vip_level", "INTEGER DEFAULT 0"), ("vip_expiry", "TEXT"), ("vip_points", "INTEGER DEFAULT 0"),
+        ("last_checkin", "TEXT"), ("consecutive_days", "INTEGER DEFAULT 0"),
+        ("ban_until", "TEXT"), ("join_date", "TEXT"),
+    ],
+    "Leaderboard": [("player_id", "TEXT PRIMARY KEY"), ("hero_points", "INTEGER DEFAULT 0")],
+    "Monthly_God": [("player_id", "TEXT PRIMARY KEY"), ("monthly_points", "INTEGER DEFAULT 0")],
+    "Prizes": [
+        ("id", "INTEGER PRIMARY KEY AUTOINCREMENT"), ("player_id", "TEXT"), ("prize_name", "TEXT"),
+        ("status", "TEXT"), ("time", "TEXT"), ("expire_at", "TEXT"), ("source", "TEXT"),
+    ],
+    "Inventory": [
+        ("id", "INTEGER PRIMARY KEY AUTOINCREMENT"), ("item_name", "TEXT UNIQUE"), ("stock", "INTEGER DEFAULT 0"),
+        ("item_value", "INTEGER DEFAULT 0"), ("weight", "REAL DEFAULT 10"), ("target_market", "TEXT DEFAULT 'Both'"),
+        ("mall_price", "INTEGER DEFAULT 0"), ("vip_price", "INTEGER DEFAULT 0"),
+        ("vip_card_level", "INTEGER DEFAULT 0"), ("vip_card_hours", "INTEGER DEFAULT 0"),
+        ("img_url", "TEXT DEFAULT ''"), ("mall_min_rank", "TEXT DEFAULT '無限制'"),
+        ("wheel_min_rank", "TEXT DEFAULT '無限制'"), ("status", "TEXT DEFAULT '上架中'"),
+        # 整數階級門檻 (tiers.py)；舊資料為空時由標籤換算
+        ("mall_min_tier", "INTEGER"), ("wheel_min_tier", "INTEGER"),
+    ],
+    "Missions": [
+        ("id", "INTEGER PRIMARY KEY AUTOINCREMENT"), ("title", "TEXT"), ("description", "TEXT"),
+        ("reward_xp", "INTEGER DEFAULT 0"), ("type", "TEXT"), ("target_criteria", "TEXT"),
+        ("target_value", "INTEGER DEFAULT 1"), ("status", "TEXT DEFAULT 'Active'"), ("reward_item", "TEXT"),
+    ],
+    "Mission_Logs": [
+        ("id", "INTEGER PRIMARY KEY AUTOINCREMENT"), ("player_id", "TEXT"), ("mission_id", "INTEGER"), ("claim_time", "TEXT"),
+    ],
+    "Game_Transactions": [
+        ("id", "INTEGER PRIMARY KEY AUTOINCREMENT"), ("player_id", "TEXT"), ("game_type", "TEXT"),
+        ("action_type", "TEXT"), ("amount", "INTEGER"), ("timestamp", "TEXT"),
+    ],
+    # shoe = 百家樂共用牌靴 (engine.baccarat.Shoe.encode)，hand_count = 本牌靴已發局數
+    "Baccarat_Global": [("id", "INTEGER PRIMARY KEY"), ("hand_count", "INTEGER DEFAULT 0"), ("history_string", "TEXT DEFAULT ''"),
+                        ("shoe", "TEXT DEFAULT ''")],
+    # 掃雷進行中 / 已爆炸待清除的盤面，每位玩家一盤 (engine.mines.to_row)；結算領錢時刪除
+    "Mines_Games": [
+        ("player_id", "TEXT PRIMARY KEY"), ("bet", "INTEGER"), ("mines", "INTEGER"), ("layout", "INTEGER"),
+        ("shown", "INTEGER DEFAULT 0"), ("status", "TEXT DEFAULT 'active'"), ("started_at", "TEXT"),
+    ],
+    "Roulette_Global": [("id", "INTEGER PRIMARY KEY"), ("history_string", "TEXT DEFAULT ''")],
+    "Staff_Logs": [
+        ("id", "INTEGER PRIMARY KEY AUTOINCREMENT"), ("staff_id", "TEXT"), ("player_id", "TEXT"),
+        ("prize_name", "TEXT"), ("time", "TEXT"),
+    ],
+    "Tournament_Records": [
+        ("id", "INTEGER PRIMARY KEY AUTOINCREMENT"), ("player_id", "TEXT"), ("buy_in", "INTEGER"), ("rank", "INTEGER"),
+        ("re_entries", "INTEGER DEFAULT 0"), ("payout", "INTEGER DEFAULT 0"), ("filename", "TEXT"),
+        ("actual_fee", "INTEGER DEFAULT 0"), ("time", "TEXT"),
+    ],
+    "Import_History": [
+        ("id", "INTEGER PRIMARY KEY AUTOINCREMENT"), ("filename", "TEXT"), ("import_time", "TEXT"),
+        ("content_hash", "TEXT"), ("status", "TEXT DEFAULT 'done'"), ("buy_in", "INTEGER"), ("rows", "INTEGER DEFAULT 0"),
+        ("chunk_size", "INTEGER"), ("chunks_total", "INTEGER DEFAULT 0"), ("chunks_done", "INTEGER DEFAULT 0"),
+    ],
+    # 空投：同一內容 (名單 + 點數 + 禮物) 未完成的執行會續傳；逐塊標記與入帳同一交易，重送已完成的塊直接略過
+    "Airdrop_Runs": [
+        ("run_key", "TEXT PRIMARY KEY"), ("content_hash", "TEXT"), ("chunks_total", "INTEGER DEFAULT 0"),
+        ("chunks_done", "INTEGER DEFAULT 0"), ("status", "TEXT DEFAULT 'in_progress'"), ("created_at", "TEXT"),
+    ],
+    "Airdrop_Chunks": [("chunk_key", "TEXT PRIMARY KEY"), ("run_key", "TEXT"), ("players", "INTEGER DEFAULT 0"), ("done_at", "TEXT")],
+    "System_Settings": [("config_key", "TEXT PRIMARY KEY"), ("config_value", "TEXT")],
+    "Settlement_Runs": [
+        ("id", "INTEGER PRIMARY KEY AUTOINCREMENT"), ("kind", "TEXT"), ("label", "TEXT"), ("scheme", "TEXT"),
+        ("players", "INTEGER DEFAULT 0"), ("run_at", "TEXT"),
+    ],
+    "Season_Archive": [
+        ("id", "INTEGER PRIMARY KEY AUTOINCREMENT"), ("season_label", "TEXT"), ("scheme", "TEXT"), ("player_id", "TEXT"),
+        ("position", "INTEGER"), ("hero_points", "REAL"), ("new_points", "REAL"), ("settled_at", "TEXT"),
+    ],
+    "Monthly_Archive": [
+        ("id", "INTEGER PRIMARY KEY AUTOINCREMENT"), ("month_label", "TEXT"), ("player_id", "TEXT"),
+        ("position", "INTEGER"), ("monthly_points", "REAL"), ("archived_at", "TEXT"),
+    ],
+    # 任務進度計數器：counter_key = 玩家:條件:週期桶 (見 missions.counter_key)
+    "Progress_Counters": [("counter_key", "TEXT PRIMARY KEY"), ("value", "INTEGER DEFAULT 0"), ("updated_at", "TEXT")],
+}
+
+# 榜單代號 → (資料表, 積分欄位, 含名稱的檢視表)
+BOARDS = {
+    "hero": ("Leaderboard", "hero_points", "Leaderboard_Named"),
+    "monthly": ("Monthly_God", "monthly_points", "Monthly_God_Named"),
+}
+
+# 賽季結算方案 (與 sql/004_season_settlement.sql 相同的整數截斷語意)
+SETTLEMENT_SQL = {
+    "A": "MAX(0, hero_points - 150)",
+    "B": "CAST(hero_points * 0.9 AS INTEGER)",
+    "soft": "CAST(hero_points * 0.4 AS INTEGER)",
+}
+SETTLEMENT_PY = {
+    "A": lambda p: max(0, p - 150),
+    "B": lambda p: int(p * 0.9),
+    "soft": lambda p: int(p * 0.4),
+}
+
+INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_prizes_player ON "Prizes" (player_id, source)',
+    'CREATE INDEX IF NOT EXISTS idx_mlogs_player ON "Mission_Logs" (player_id, mission_id, claim_time)',
+    'CREATE INDEX IF NOT EXISTS idx_tr_player ON "Tournament_Records" (player_id)',
+    'CREATE INDEX IF NOT EXISTS idx_lb_points ON "Leaderboard" (hero_points)',
+    'CREATE INDEX IF NOT EXISTS idx_mg_points ON "Monthly_God" (monthly_points)',
+    'CREATE UNIQUE INDEX IF NOT EXISTS idx_import_hash ON "Import_History" (content_hash)',
+    'CREATE INDEX IF NOT EXISTS idx_airdrop_hash ON "Airdrop_Runs" (content_hash, status)',
+    'CREATE UNIQUE INDEX IF NOT EXISTS idx_settlement_label ON "Settlement_Runs" (kind, label)',
+    'CREATE INDEX IF NOT EXISTS idx_season_archive ON "Season_Archive" (season_label, position)',
+    'CREATE INDEX IF NOT EXISTS idx_monthly_archive ON "Monthly_Archive" (month_label, position)',
+]
+
+# 全域狀態表需要 id=1 的單一資料列
+SEED_ROWS = [
+    'INSERT OR IGNORE INTO "Baccarat_Global" (id, hand_count, history_string) VALUES (1, 0, \'\')',
+    'INSERT OR IGNORE INTO "Roulette_Global" (id, history_string) VALUES (1, \'\')',
+]
+
+_IDENT = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def _like_to_glob(pattern):
+    """LIKE 樣式 (區分大小寫，\\ 跳脫) → GLOB：% → *、_ → ?，字面的 * ? [ 包成 [*] [?] [[]"""
+    out, chars = [], iter(pattern)
+    for c in chars:
+        if c == "\\": c = next(chars, "\\")
+        elif c == "%": out.append("*"); continue
+        elif c == "_": out.append("?"); continue
+        out.append(f"[{c}]" if c in "*?[" else c)
+    return "".join(out)
+
+
+def _q(name):
+    if not _IDENT.match(name): raise ValueError(f"非法欄位名稱: {name}")
+    return f'"{name}"'
+
+
+def merge_deltas(key, rows):
+    """同一鍵的多筆增量合併成一筆 (bulk_add 的單一語句不能重複命中同一列)"""
+    merged = {}
+    for r in rows:
+        m = merged.setdefault(r[key], {key: r[key]})
+        for c, v in r.items():
+            if c != key: m[c] = m.get(c, 0) + v
+    return list(merged.values())
+
+
+# --- 往返次數 (每個執行緒各自累計，另有全程序合計；巢狀呼叫只算最外層一次) ---
+_trips = threading.local()
+_trips_total = [0]
+_trips_lock = threading.Lock()
+
+
+def round_trips(all_threads=False):
+    """後端往返次數 (片段預算 / benchmarks 用)"""
+    if all_threads: return _trips_total[0]
+    return getattr(_trips, "n", 0)
+
+
+def _count_trip():
+    _trips.n = round_trips() + 1
+    with _trips_lock: _trips_total[0] += 1
+
+
+def _round_trip(fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        depth = getattr(_trips, "depth", 0)
+        if depth == 0: _count_trip()
+        _trips.depth = depth + 1
+        try: return fn(*args, **kwargs)
+        finally: _trips.depth = depth
+    return wrapper
+
+
+class Response:
+    """與 postgrest APIResponse 相同的 data / count 介面"""
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class Storage:
+    """儲存後端基底：table(name) 回傳支援 select/insert/update/upsert/delete 與 eq/in_/ilike/order/limit 的查詢物件"""
+    engine = ""
+
+    def table(self, name):
+        raise NotImplementedError
+
+    def adjust_balance(self, pf_id, xp=0, vip_points=0):
+        """原子化增減餘額並回傳 {"xp", "vip_points"}；玩家不存在或扣款後為負時回傳 None"""
+        raise NotImplementedError
+
+    def cohort_member_ids(self, min_points=None, max_points=None, vip_level=None):
+        """一次查詢解析空投名單：排位積分 [min_points, max_points) 與 VIP 等級 (None 表示不限)"""
+        raise NotImplementedError
+
+    def bulk_add(self, table, key, rows, upsert=False):
+        """多列數值增量 rows = [{key: ..., 欄位: 增量}]，回傳影響列數；upsert=False 時只更新既有資料列"""
+        raise NotImplementedError
+
+    def begin_import(self, content_hash, filename, buy_in, rows, chunk_size, chunks_total):
+        """取得 (或建立) 此內容雜湊的導入紀錄，回傳含 status / chunks_done / chunk_size 的資料列"""
+        res = self.table("Import_History").select("*").eq("content_hash", content_hash).execute()
+        if res.data: return res.data[0]
+        return self.table("Import_History").insert({
+            "filename": filename, "content_hash": content_hash, "status": "in_progress", "buy_in": buy_in, "rows": rows,
+            "chunk_size": chunk_size, "chunks_total": chunks_total, "chunks_done": 0, "import_time": datetime.now().isoformat()
+        }).execute().data[0]
+
+    def apply_import_chunk(self, content_hash, chunk, members, xp, hero, monthly, records):
+        """單一交易套用一個區塊並推進檢查點，回傳新的 chunks_done (重送已完成區塊不會重複入帳)"""
+        raise NotImplementedError
+
+    def begin_airdrop(self, content_hash, chunks_total):
+        """取得此內容未完成的空投執行 (續傳)，沒有就建立新的一次，回傳含 run_key / chunks_done 的資料列"""
+        res = self.table("Airdrop_Runs").select("*").eq("content_hash", content_hash).eq("status", "in_progress").execute()
+        if res.data: return res.data[0]
+        now = datetime.now().isoformat()
+        return self.table("Airdrop_Runs").insert({
+            "run_key": f"{content_hash[:16]}-{now}", "content_hash": content_hash, "chunks_total": chunks_total,
+            "chunks_done": 0, "status": "in_progress", "created_at": now
+        }).execute().data[0]
+
+    def apply_airdrop_chunk(self, run_key, chunk, deltas, prizes):
+        """單一交易：標記此塊、發送點數 (bulk_add Members) 與禮物 (Prizes)，回傳 (點數列數, 禮物筆數)；
+        此塊已完成時不動任何資料並回傳 None"""
+        raise NotImplementedError
+
+    def settle_season(self, scheme, label):
+        """封存結算前總榜後套用方案 (A / B / soft)，回傳封存人數；同一賽季名稱重複執行會失敗"""
+        raise NotImplementedError
+
+    def rollover_month(self, label):
+        """封存月榜後清空，回傳封存人數；同一月份名稱重複執行會失敗"""
+        raise NotImplementedError
+
+    def bump_counters(self, adds, sets=None):
+        """任務進度計數器：adds = {counter_key: 增量} 累加，sets = {counter_key: 值} 直接覆寫 (連續簽到等量測值)"""
+        raise NotImplementedError
+
+    def backfill_progress(self):
+        """由簽到 / 勝場 / 賽事紀錄回填 Progress_Counters (與現有值取較大者)，回傳寫入列數；已回填過回傳 None"""
+        raise NotImplementedError
+
+    def leaderboard(self, board, limit=20):
+        """榜單前 N 名 [{player_id, name, points}]，名稱以 JOIN 一次取回 (不含老闆帳號)"""
+        raise NotImplementedError
+
+    def board_position(self, board, player_id):
+        """玩家自身 {points, position, total}；position 為同分同名次"""
+        raise NotImplementedError
+
+    def board_scores(self, board):
+        """整榜 [{player_id, name, points}] (排名索引載入 / 對帳用，不含老闆帳號)"""
+        raise NotImplementedError
+
+
+class SupabaseStorage(Storage):
+    engine = "supabase"
+
+    def __init__(self, url, key):
+        from supabase import create_client
+        self.client = create_client(url, key)
+
+    def table(self, name):
+        # 查詢物件由 postgrest 建立，於建立時計一次往返
+        _count_trip()
+        return self.client.table(name)
+
+    @_round_trip
+    def adjust_balance(self, pf_id, xp=0, vip_points=0):
+        # sql/001_adjust_member_balance.sql
+        res = self.client.rpc("adjust_member_balance", {"p_pf_id": pf_id, "p_xp": int(xp), "p_vp": int(vip_points)}).execute()
+        if not res.data: return None
+        return {"xp": res.data[0]["new_xp"], "vip_points": res.data[0]["new_vip_points"]}
+
+    @_round_trip
+    def cohort_member_ids(self, min_points=None, max_points=None, vip_level=None):
+        # sql/002_bulk_airdrop.sql
+        res = self.client.rpc("airdrop_cohort", {"p_min_points": min_points, "p_max_points": max_points, "p_vip_level": vip_level}).execute()
+        return list(res.data or [])
+
+    @_round_trip
+    def bulk_add(self, table, key, rows, upsert=False):
+        rows = merge_deltas(key, rows)
+        if not rows: return 0
+        return self.client.rpc("bulk_add", {"p_table": table, "p_key": key, "p_rows": rows, "p_upsert": upsert}).execute().data
+
+    @_round_trip
+    def apply_import_chunk(self, content_hash, chunk, members, xp, hero, monthly, records):
+        # sql/003_resumable_import.sql
+        return self.client.rpc("apply_import_chunk", {
+            "p_hash": content_hash, "p_chunk": chunk, "p_members": members, "p_xp": merge_deltas("pf_id", xp),
+            "p_hero": merge_deltas("player_id", hero), "p_monthly": merge_deltas("player_id", monthly), "p_records": records
+        }).execute().data
+
+    @_round_trip
+    def apply_airdrop_chunk(self, run_key, chunk, deltas, prizes):
+        # sql/010_airdrop_runs.sql
+        got = self.client.rpc("apply_airdrop_chunk", {
+            "p_run": run_key, "p_chunk": chunk, "p_deltas": merge_deltas("pf_id", deltas), "p_prizes": prizes
+        }).execute().data
+        return None if got is None else tuple(got)
+
+    @_round_trip
+    def settle_season(self, scheme, label):
+        # sql/004_season_settlement.sql
+        return self.client.rpc("settle_season", {"p_scheme": scheme, "p_label": label, "p_house": HOUSE_ID}).execute().data
+
+    @_round_trip
+    def rollover_month(self, label):
+        return self.client.rpc("rollover_month", {"p_label": label, "p_house": HOUSE_ID}).execute().data
+
+    @_round_trip
+    def bump_counters(self, adds, sets=None):
+        # sql/006_progress_counters.sql
+        if not adds and not sets: return
+        self.client.rpc("bump_counters", {"p_adds": adds or {}, "p_sets": sets or {}}).execute()
+
+    @_round_trip
+    def backfill_progress(self):
+        # sql/011_progress_backfill.sql
+        return self.client.rpc("backfill_progress_counters", {}).execute().data
+
+    @_round_trip
+    def leaderboard(self, board, limit=20):
+        # sql/005_leaderboard_views.sql
+        view = BOARDS[board][2]
+        return self.client.table(view).select("player_id, name, points").neq("player_id", HOUSE_ID).order("points", desc=True).limit(limit).execute().data
+
+    @_round_trip
+    def board_position(self, board, player_id):
+        res = self.client.rpc("board_position", {"p_board": board, "p_player": player_id, "p_house": HOUSE_ID}).execute()
+        return res.data[0]
+
+    @_round_trip
+    def board_scores(self, board, page=1000):
+        # PostgREST 單次回傳有上限，分頁取完
+        out = []
+        while True:
+            rows = self.client.table(BOARDS[board][2]).select("player_id, name, points").neq("player_id", HOUSE_ID).order("player_id").range(len(out), len(out) + page - 1).execute().data
+            out += rows
+            if len(rows) < page: return out
+
+
+class SQLiteQuery:
+    """模擬 postgrest 查詢鏈，於 execute() 時編譯成單一 SQL"""
+    def __init__(self, store, name):
+        if name not in SCHEMA: raise ValueError(f"未知資料表: {name}")
+        self.store = store; self.name = name
+        self.op = "select"; self.columns = "*"; self.count = None; self.payload = None; self.on_conflict = None
+        self.filters = []; self.orders = []; self.limit_n = None; self._negate = False
+
+    # --- 動作 ---
+    def select(self, columns="*", count=None):
+        self.op = "select"; self.columns = columns; self.count = count
+        return self
+
+    def insert(self, rows):
+        self.op = "insert"; self.payload = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def upsert(self, rows, on_conflict=None):
+        self.op = "upsert"; self.payload = rows if isinstance(rows, list) else [rows]; self.on_conflict = on_conflict
+        return self
+
+    def update(self, values):
+        self.op = "update"; self.payload = values
+        return self
+
+    def delete(self):
+        self.op = "delete"
+        return self
+
+    # --- 條件 ---
+    @property
+    def not_(self):
+        self._negate = True
+        return self
+
+    def _filter(self, sql, params):
+        if self._negate: sql = f"NOT ({sql})"; self._negate = False
+        self.filters.append((sql, params))
+        return self
+
+    def eq(self, col, val): return self._filter(f"{_q(col)} = ?", [val])
+    def neq(self, col, val): return self._filter(f"{_q(col)} <> ?", [val])
+    def gt(self, col, val): return self._filter(f"{_q(col)} > ?", [val])
+    def gte(self, col, val): return self._filter(f"{_q(col)} >= ?", [val])
+    def lt(self, col, val): return self._filter(f"{_q(col)} < ?", [val])
+    def lte(self, col, val): return self._filter(f"{_q(col)} <= ?", [val])
+    def like(self, col, pattern): return self._filter(f"{_q(col)} GLOB ?", [_like_to_glob(pattern)])
+    def ilike(self, col, pattern): return self._filter(f"{_q(col)} LIKE ?", [pattern])
+
+    def in_(self, col, values):
+        values = list(values)
+        if not values: return self._filter("0", [])
+        return self._filter(f"{_q(col)} IN ({', '.join('?' * len(values))})", values)
+
+    def is_(self, col, val):
+        if val is None or str(val).lower() == "null": return self._filter(f"{_q(col)} IS NULL", [])
+        return self._filter(f"{_q(col)} IS ?", [val])
+
+    def order(self, col, desc=False):
+        self.orders.append(f"{_q(col)} {'DESC' if desc else 'ASC'}")
+        return self
+
+    def limit(self, n):
+        self.limit_n = int(n)
+        return self
+
+    # --- 編譯與執行 ---
+    def _where(self):
+        if not self.filters: return "", []
+        params = [p for _, ps in self.filters for p in ps]
+        return " WHERE " + " AND ".join(sql for sql, _ in self.filters), params
+
+    def _select_list(self):
+        if self.columns.strip() == "*": return "*"
+        return ", ".join(_q(c.strip()) for c in self.columns.split(",") if c.strip())
+
+    @_round_trip
+    def execute(self):
+        return getattr(self, f"_exec_{self.op}")()
+
+    def _exec_select(self):
+        where, params = self._where()
+        sql = f'SELECT {self._select_list()} FROM {_q(self.name)}{where}'
+        if self.orders: sql += " ORDER BY " + ", ".join(self.orders)
+        if self.limit_n is not None: sql += f" LIMIT {self.limit_n}"
+        with self.store.lock:
+            data = self.store.fetch(sql, params)
+            count = None
+            if self.count:
+                count = self.store.conn.execute(f'SELECT COUNT(*) FROM {_q(self.name)}{where}', params).fetchone()[0]
+        return Response(data, count)
+
+    def _exec_insert(self):
+        out = []
+        with self.store.transaction():
+            for row in self.payload:
+                cols = list(row.keys())
+                sql = f'INSERT INTO {_q(self.name)} ({", ".join(_q(c) for c in cols)}) VALUES ({", ".join("?" * len(cols))}) RETURNING *'
+                out += self.store.fetch(sql, [row[c] for c in cols])
+        return Response(out)
+
+    def _exec_upsert(self):
+        keys = [k.strip() for k in (self.on_conflict or SCHEMA[self.name][0][0]).split(",")]
+        out = []
+        with self.store.transaction():
+            for row in self.payload:
+                cols = list(row.keys())
+                sets = [f"{_q(c)} = excluded.{_q(c)}" for c in cols if c not in keys]
+                action = f"DO UPDATE SET {', '.join(sets)}" if sets else "DO NOTHING"
+                sql = (f'INSERT INTO {_q(self.name)} ({", ".join(_q(c) for c in cols)}) VALUES ({", ".join("?" * len(cols))}) '
+                       f'ON CONFLICT ({", ".join(_q(k) for k in keys)}) {action} RETURNING *')
+                out += self.store.fetch(sql, [row[c] for c in cols])
+        return Response(out)
+
+    def _exec_update(self):
+        cols = list(self.payload.keys())
+        where, params = self._where()
+        sql = f'UPDATE {_q(self.name)} SET {", ".join(f"{_q(c)} = ?" for c in cols)}{where} RETURNING *'
+        with self.store.transaction():
+            return Response(self.store.fetch(sql, [self.payload[c] for c in cols] + params))
+
+    def _exec_delete(self):
+        where, params = self._where()
+        with self.store.transaction():
+            return Response(self.store.fetch(f'DELETE FROM {_q(self.name)}{where} RETURNING *', params))
+
+
+class SQLiteStorage(Storage):
+    """單機內嵌後端：單一連線 + 鎖，檔案模式啟用 WAL"""
+    engine = "sqlite"
+
+    def __init__(self, path=":memory:"):
+        self.path = path
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        if path != ":memory:":
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=5000")
+        self._migrate()
+
+    def _migrate(self):
+        with self.transaction():
+            for name, cols in SCHEMA.items():
+                self.conn.execute(f'CREATE TABLE IF NOT EXISTS {_q(name)} ({", ".join(f"{_q(c)} {t}" for c, t in cols)})')
+                have = {r[1] for r in self.conn.execute(f"PRAGMA table_info({_q(name)})")}
+                for c, t in cols:
+                    # 舊檔案補欄位 (ALTER 不支援 PRIMARY KEY / UNIQUE)
+                    if c not in have: self.conn.execute(f'ALTER TABLE {_q(name)} ADD COLUMN {_q(c)} {t.replace("UNIQUE", "")}')
+            for sql in INDEXES + SEED_ROWS: self.conn.execute(sql)
+
+    @contextmanager
+    def transaction(self):
+        with self.lock:
+            if self.conn.in_transaction:
+                yield self.conn
+                return
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def fetch(self, sql, params=()):
+        with self.lock:
+            return [dict(r) for r in self.conn.execute(sql, params).fetchall()]
+
+    def table(self, name):
+        return SQLiteQuery(self, name)
+
+    @_round_trip
+    def adjust_balance(self, pf_id, xp=0, vip_points=0):
+        xp = int(xp); vip_points = int(vip_points)
+        sql = ('UPDATE "Members" SET xp = COALESCE(xp, 0) + ?, vip_points = COALESCE(vip_points, 0) + ? '
+               'WHERE pf_id = ? AND (? >= 0 OR COALESCE(xp, 0) + ? >= 0) AND (? >= 0 OR COALESCE(vip_points, 0) + ? >= 0) '
+               'RETURNING xp, vip_points')
+        with self.transaction():
+            rows = self.fetch(sql, [xp, vip_points, pf_id, xp, xp, vip_points, vip_points])
+        return rows[0] if rows else None
+
+    @_round_trip
+    def cohort_member_ids(self, min_points=None, max_points=None, vip_level=None):
+        sql = 'SELECT m.pf_id FROM "Members" m LEFT JOIN "Leaderboard" l ON l.player_id = m.pf_id WHERE 1'
+        params = []
+        if min_points is not None: sql += " AND COALESCE(l.hero_points, 0) >= ?"; params.append(min_points)
+        if max_points is not None: sql += " AND COALESCE(l.hero_points, 0) < ?"; params.append(max_points)
+        if vip_level is not None: sql += " AND m.vip_level = ?"; params.append(vip_level)
+        return [r["pf_id"] for r in self.fetch(sql + " ORDER BY m.pf_id", params)]
+
+    @_round_trip
+    def bulk_add(self, table, key, rows, upsert=False):
+        rows = merge_deltas(key, rows)
+        if not rows: return 0
+        cols = sorted({c for r in rows for c in r if c != key})
+        if upsert:
+            sql = (f'INSERT INTO {_q(table)} ({_q(key)}, {", ".join(_q(c) for c in cols)}) VALUES (?{", ?" * len(cols)}) '
+                   f'ON CONFLICT ({_q(key)}) DO UPDATE SET {", ".join(f"{_q(c)} = COALESCE({_q(c)}, 0) + excluded.{_q(c)}" for c in cols)}')
+            params = [[r[key]] + [r.get(c, 0) for c in cols] for r in rows]
+        else:
+            sql = f'UPDATE {_q(table)} SET {", ".join(f"{_q(c)} = COALESCE({_q(c)}, 0) + ?" for c in cols)} WHERE {_q(key)} = ?'
+            params = [[r.get(c, 0) for c in cols] + [r[key]] for r in rows]
+        with self.transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(sql, params)
+            return conn.total_changes - before
+
+    @_round_trip
+    def apply_import_chunk(self, content_hash, chunk, members, xp, hero, monthly, records):
+        with self.transaction() as conn:
+            h = self.fetch('SELECT chunks_done, chunks_total FROM "Import_History" WHERE content_hash = ?', [content_hash])
+            if not h: raise KeyError(f"未知的導入紀錄: {content_hash}")
+            done, total = h[0]["chunks_done"], h[0]["chunks_total"]
+            if done > chunk: return done
+            if done < chunk: raise ValueError(f"區塊 {chunk} 順序錯誤 (已完成 {done})")
+            conn.executemany("INSERT INTO \"Members\" (pf_id, name, role, xp) VALUES (?, ?, '玩家', 0) ON CONFLICT (pf_id) DO NOTHING",
+                             [(m["pf_id"], m["name"]) for m in members])
+            self.bulk_add("Members", "pf_id", xp)
+            self.bulk_add("Leaderboard", "player_id", hero, upsert=True)
+            self.bulk_add("Monthly_God", "player_id", monthly, upsert=True)
+            if records: self.table("Tournament_Records").insert(records).execute()
+            conn.execute('UPDATE "Import_History" SET chunks_done = ?, status = ? WHERE content_hash = ?',
+                         (chunk + 1, "done" if chunk + 1 >= total else "in_progress", content_hash))
+            return chunk + 1
+
+    @_round_trip
+    def apply_airdrop_chunk(self, run_key, chunk, deltas, prizes):
+        now = datetime.now().isoformat()
+        with self.transaction() as conn:
+            players = len({d["pf_id"] for d in deltas} | {p["player_id"] for p in prizes})
+            if not conn.execute('INSERT OR IGNORE INTO "Airdrop_Chunks" (chunk_key, run_key, players, done_at) VALUES (?, ?, ?, ?)',
+                                (f"{run_key}:{chunk}", run_key, players, now)).rowcount: return None
+            balances = self.bulk_add("Members", "pf_id", deltas)
+            n = len(self.table("Prizes").insert(prizes).execute().data) if prizes else 0
+            conn.execute("""UPDATE "Airdrop_Runs" SET chunks_done = chunks_done + 1,
+                            status = CASE WHEN chunks_done + 1 >= chunks_total THEN 'done' ELSE 'in_progress' END WHERE run_key = ?""", (run_key,))
+            return balances, n
+
+    @_round_trip
+    def settle_season(self, scheme, label):
+        expr = SETTLEMENT_SQL[scheme]
+        now = datetime.now().isoformat()
+        with self.transaction() as conn:
+            conn.execute('INSERT INTO "Settlement_Runs" (kind, label, scheme, run_at) VALUES (\'season\', ?, ?, ?)', (label, scheme, now))
+            n = conn.execute(f'''INSERT INTO "Season_Archive" (season_label, scheme, player_id, position, hero_points, new_points, settled_at)
+                SELECT ?, ?, player_id, RANK() OVER (ORDER BY hero_points DESC), hero_points, {expr}, ?
+                FROM "Leaderboard" WHERE player_id <> ?''', (label, scheme, now, HOUSE_ID)).rowcount
+            conn.execute(f'UPDATE "Leaderboard" SET hero_points = {expr} WHERE player_id <> ?', (HOUSE_ID,))
+            conn.execute('UPDATE "Settlement_Runs" SET players = ? WHERE kind = \'season\' AND label = ?', (n, label))
+        return n
+
+    @_round_trip
+    def rollover_month(self, label):
+        now = datetime.now().isoformat()
+        with self.transaction() as conn:
+            conn.execute('INSERT INTO "Settlement_Runs" (kind, label, run_at) VALUES (\'month\', ?, ?)', (label, now))
+            n = conn.execute('''INSERT INTO "Monthly_Archive" (month_label, player_id, position, monthly_points, archived_at)
+                SELECT ?, player_id, RANK() OVER (ORDER BY monthly_points DESC), monthly_points, ?
+                FROM "Monthly_God" WHERE player_id <> ?''', (label, now, HOUSE_ID)).rowcount
+            conn.execute('DELETE FROM "Monthly_God" WHERE player_id <> ?', (HOUSE_ID,))
+            conn.execute('UPDATE "Settlement_Runs" SET players = ? WHERE kind = \'month\' AND label = ?', (n, label))
+        return n
+
+    @_round_trip
+    def bump_counters(self, adds, sets=None):
+        now = datetime.now().isoformat()
+        sql = 'INSERT INTO "Progress_Counters" (counter_key, value, updated_at) VALUES (?, ?, ?) ON CONFLICT (counter_key) DO UPDATE SET '
+        with self.transaction() as conn:
+            if adds: conn.executemany(sql + "value = COALESCE(value, 0) + excluded.value, updated_at = excluded.updated_at", [(k, int(v), now) for k, v in adds.items()])
+            if sets: conn.executemany(sql + "value = excluded.value, updated_at = excluded.updated_at", [(k, int(v), now) for k, v in sets.items()])
+
+    @_round_trip
+    def backfill_progress(self):
+        # 與 sql/011_progress_backfill.sql 相同；週期桶格式同 missions.bucket_id (ISO 週)
+        def iso_week(d):
+            # 格式對但不存在的日期 (2026-02-30) 回傳 NULL，該筆略過
+            try: return "W%04d-%02d" % datetime.strptime(d, "%Y-%m-%d").isocalendar()[:2]
+            except ValueError: return None
+        with self.transaction() as conn:
+            if not conn.execute("INSERT OR IGNORE INTO \"Settlement_Runs\" (kind, label, run_at) VALUES ('backfill', 'progress_counters', ?)",
+                                (datetime.now().isoformat(),)).rowcount: return None
+            conn.create_function("iso_week", 1, iso_week, deterministic=True)
+            before = conn.total_changes
+            conn.execute("""
+                WITH ev AS (
+                    SELECT player_id, 'daily_checkin' AS crit, substr("time", 1, 10) AS d FROM "Prizes" WHERE source = 'DailyCheckIn'
+                    UNION ALL SELECT player_id, 'daily_win', substr("time", 1, 10) FROM "Prizes" WHERE source LIKE 'GameWin%'
+                    UNION ALL SELECT player_id, 'tournament_play', substr("time", 1, 10) FROM "Tournament_Records"
+                ), ok AS (SELECT player_id, crit, d, iso_week(d) AS w FROM ev
+                          WHERE player_id IS NOT NULL AND d GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'),
+                keyed AS (
+                    SELECT player_id || ':' || crit || ':' || b AS counter_key, COUNT(*) AS value FROM (
+                        SELECT player_id, crit, 'D' || d AS b FROM ok WHERE w IS NOT NULL
+                        UNION ALL SELECT player_id, crit, w FROM ok WHERE w IS NOT NULL
+                        UNION ALL SELECT player_id, crit, 'M' || substr(d, 1, 7) FROM ok WHERE w IS NOT NULL
+                        UNION ALL SELECT player_id, crit, 'S' FROM ok WHERE w IS NOT NULL
+                    ) GROUP BY 1
+                    UNION ALL SELECT pf_id || ':consecutive_checkin:S', consecutive_days FROM "Members" WHERE COALESCE(consecutive_days, 0) > 0
+                )
+                INSERT INTO "Progress_Counters" (counter_key, value, updated_at) SELECT counter_key, value, ? FROM keyed WHERE 1
+                ON CONFLICT (counter_key) DO UPDATE SET value = MAX(COALESCE(value, 0), excluded.value), updated_at = excluded.updated_at
+            """, (datetime.now().isoformat(),))
+            n = conn.total_changes - before
+            conn.execute("UPDATE \"Settlement_Runs\" SET players = ? WHERE kind = 'backfill' AND label = 'progress_counters'", (n,))
+            return n
+
+    def _board_sql(self, board):
+        table, col, _ = BOARDS[board]
+        return f'''SELECT b.player_id, COALESCE(m.name, b.player_id) AS name, b.{_q(col)} AS points
+            FROM {_q(table)} b LEFT JOIN "Members" m ON m.pf_id = b.player_id WHERE b.player_id <> ?''', col
+
+    @_round_trip
+    def leaderboard(self, board, limit=20):
+        sql, col = self._board_sql(board)
+        return self.fetch(f"{sql} ORDER BY b.{_q(col)} DESC LIMIT ?", [HOUSE_ID, int(limit)])
+
+    @_round_trip
+    def board_scores(self, board):
+        sql, _ = self._board_sql(board)
+        return self.fetch(sql, [HOUSE_ID])
+
+    @_round_trip
+    def board_position(self, board, player_id):
+        table, col, _ = BOARDS[board]
+        rows = self.fetch(f'''WITH me AS (SELECT COALESCE((SELECT {_q(col)} FROM {_q(table)} WHERE player_id = ?), 0) AS pts)
+            SELECT me.pts AS points,
+                   (SELECT COUNT(*) FROM {_q(table)} WHERE player_id <> ? AND {_q(col)} > me.pts) + 1 AS position,
+                   (SELECT COUNT(*) FROM {_q(table)} WHERE player_id <> ?) AS total
+            FROM me''', [player_id, HOUSE_ID, HOUSE_ID])
+        return rows[0]
+
+
+def open_storage(secrets):
+    """依 secrets 的 [storage] engine 建立後端，預設沿用 [supabase]"""
+    engine = secrets["storage"].get("engine", "supabase") if "storage" in secrets else "supabase"
+    if engine == "sqlite":
+        path = secrets["storage"].get("path", "kingdom.db")
+        return SQLiteStorage(path)
+    if "supabase" not in secrets: raise KeyError("找不到 [supabase] secrets 設定")
+    return SupabaseStorage(secrets["supabase"]["url"], secrets["supabase"]["key"])
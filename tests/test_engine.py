@@ -0,0 +1,98 @@
+"""engine 規則：21 點每個動作只結算一次且金額正確、莊家結果分佈；百家樂精確機率與牌靴存取"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import engine  # noqa: E402
+from engine import baccarat  # noqa: E402
+from engine import blackjack as bj  # noqa: E402
+
+
+def _table(player, dealer, draw="10", bet=100):
+    """指定手牌與莊家牌；牌靴只剩 draw 這種牌，之後補的每張都確定"""
+    shoe = bj.Shoe([0] * 13)
+    shoe.counts[bj.LABELS.index(draw)] = 40
+    return bj.BlackjackState(bet, shoe, bj.RULES, [(c, '♠') for c in dealer], [bj.Hand([(c, '♠') for c in player], bet)])
+
+
+def _play(g, moves, seed=1):
+    """依序執行動作，回傳各步回傳的派彩 (只有結算那一步非 0)"""
+    rng = engine.rng(seed)
+    return [bj.MOVES[m](g, rng) for m in moves]
+
+
+def test_double_pays_once():
+    g = _table(["5", "6"], ["6", "10"])             # 11 加倍補 10 = 21；莊家 16 補 10 爆牌
+    assert _play(g, ["double"]) == [400]
+    assert g.over and g.payout == 400 and g.wagered == 200 and g.hand.doubled
+    with pytest.raises(ValueError): bj.stand(g, engine.rng(1))
+
+
+def test_split_pays_once():
+    g = _table(["8", "8"], ["10", "7"])             # 分成兩手 18 對莊家 17
+    assert _play(g, ["split", "stand", "stand"]) == [0, 0, 400]
+    assert g.over and g.payout == 400 and g.wagered == 200 and len(g.hands) == 2
+    assert all(bj.hand_value(h.cards) == 18 for h in g.hands)
+
+
+def test_split_aces_take_one_card_each():
+    g = _table(["A", "A"], ["10", "7"])             # 分 A 各補一張即停；21 點不算黑傑克
+    assert _play(g, ["split"]) == [400]
+    assert g.over and [len(h.cards) for h in g.hands] == [2, 2]
+
+
+def test_surrender_returns_half():
+    g = _table(["10", "6"], ["10", "7"])
+    assert _play(g, ["surrender"]) == [50]
+    assert g.over and g.payout == 50 and bj.options(g) == []
+
+
+def test_dealer_blackjack_settles_on_deal():
+    # 莊家先看底牌：黑傑克當場結算，玩家不能再動作
+    for seed in range(5000):
+        rng = engine.rng(seed)
+        g = bj.deal(rng, bj.Shoe.new(), 100)
+        if bj.is_blackjack(g.dealer): break
+    else: pytest.fail("找不到莊家黑傑克的種子")
+    assert g.over and bj.options(g) == []
+    assert g.payout == (100 if bj.is_blackjack(g.hand.cards) else 0)
+    with pytest.raises(ValueError): bj.hit(g, rng)
+
+
+def test_moves_settle_exactly_once():
+    """隨機合法動作打 3000 局：各步回傳的派彩加總 = 該局派彩，且結算後不能再動作"""
+    rng, shoe = engine.rng(7), bj.Shoe.new()
+    for _ in range(3000):
+        g = bj.deal(rng, shoe, 100)
+        paid = g.payout if g.over else 0
+        while not g.over:
+            paid += bj.MOVES[rng.choice(bj.options(g))](g, rng)
+        assert paid == g.payout
+        assert g.payout <= 2 * g.wagered + g.bet // 2
+
+
+def test_dealer_odds_sum_to_one():
+    full = bj.Shoe.new().comp()
+    for up in range(1, 11):
+        rest = list(full); rest[up - 1] -= 1
+        for rules in (bj.RULES, bj.Rules(hit_soft17=True)):
+            assert sum(bj.dealer_odds(tuple(rest), up, rules)) == pytest.approx(1.0, abs=1e-9)
+
+
+def test_baccarat_full_shoe_odds():
+    s = baccarat.summary(baccarat.Shoe().counts)     # 8 副牌的標準機率
+    assert s["B"] == pytest.approx(0.458597, abs=1e-6)
+    assert s["P"] == pytest.approx(0.446247, abs=1e-6)
+    assert s["T"] == pytest.approx(0.095156, abs=1e-6)
+    assert baccarat.odds(tuple(baccarat.Shoe().counts)).sum() == pytest.approx(1.0, abs=1e-12)
+
+
+def test_baccarat_shoe_round_trip():
+    rng, shoe = engine.rng(3), baccarat.Shoe()
+    for _ in range(5): baccarat.deal(rng, shoe, {"B": 100})
+    back = baccarat.Shoe.decode(shoe.encode())
+    assert back == shoe and back.remaining < 4 * baccarat.DECKS * baccarat.RANKS and back.hands == 5
+    assert baccarat.Shoe.decode("壞掉;x") == baccarat.Shoe()
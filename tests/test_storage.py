@@ -0,0 +1,60 @@
+"""storage.adjust_balance 併發：多個連線 (模擬多個程序) 同時對同一位玩家加減 XP"""
+import os
+import random
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage  # noqa: E402
+
+
+def test_adjust_balance_concurrent(tmp_path):
+    path = os.path.join(tmp_path, "kingdom.db")
+    storage.SQLiteStorage(path).table("Members").insert({"pf_id": "p1", "xp": 1000}).execute()
+    stores = [storage.SQLiteStorage(path) for _ in range(4)]
+    rng = random.Random(7)
+    deltas = [rng.choice((-300, -120, -50, 40, 90, 200)) for _ in range(800)]
+    applied, seen, lock = [], [], threading.Lock()
+
+    def worker(k):
+        for d in deltas[k::16]:
+            row = stores[k % len(stores)].adjust_balance("p1", xp=d)
+            with lock:
+                if row is not None: applied.append(d); seen.append(row["xp"])
+
+    threads = [threading.Thread(target=worker, args=(k,)) for k in range(16)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+
+    final = stores[0].table("Members").select("xp").eq("pf_id", "p1").execute().data[0]["xp"]
+    assert final == 1000 + sum(applied)
+    assert min(seen) >= 0 and final >= 0
+    # 有扣款被拒 (餘額不足) 才算真的測到下限
+    assert len(applied) < len(deltas)
+
+
+def test_backfill_progress_skips_bad_dates():
+    db = storage.SQLiteStorage(":memory:")
+    db.table("Prizes").insert([
+        {"player_id": "p1", "source": "GameWin-bacc", "time": "2026-10-18T10:00:00"},
+        {"player_id": "p1", "source": "GameWin-bacc", "time": "2026-02-30T10:00:00"},    # 不存在的日期
+        {"player_id": "p1", "source": "GameWin-bacc", "time": "昨天"},
+    ]).execute()
+    assert db.backfill_progress() == 4
+    got = {r["counter_key"]: r["value"] for r in db.table("Progress_Counters").select("*").execute().data}
+    assert got == {"p1:daily_win:D2026-10-18": 1, "p1:daily_win:W2026-42": 1, "p1:daily_win:M2026-10": 1, "p1:daily_win:S": 1}
+    # 標記已寫入，重跑不再執行
+    assert db.backfill_progress() is None
+
+
+def test_like_escapes_glob_and_prefix_delete():
+    db = storage.SQLiteStorage(":memory:")
+    db.bump_counters({"a_b:daily_win:S": 1, "axb:daily_win:S": 1, "a*:daily_win:S": 1, "ab:daily_win:S": 1})
+    keys = lambda: sorted(r["counter_key"] for r in db.table("Progress_Counters").select("counter_key").execute().data)
+    # 字面的 * 不是 GLOB 萬用字元；\_ 跳脫後只比對底線
+    assert [r["counter_key"] for r in db.table("Progress_Counters").select("counter_key").like("counter_key", "a*:%").execute().data] == ["a*:daily_win:S"]
+    assert [r["counter_key"] for r in db.table("Progress_Counters").select("counter_key").like("counter_key", "a\\_b:%").execute().data] == ["a_b:daily_win:S"]
+    # 刪除單一玩家的計數器 (app 的刪除玩家路徑) 不會波及 ID 相近的玩家
+    db.table("Progress_Counters").delete().gte("counter_key", "a_b:").lt("counter_key", "a_b;").execute()
+    assert keys() == ["a*:daily_win:S", "ab:daily_win:S", "axb:daily_win:S"]
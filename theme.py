@@ -0,0 +1,111 @@
+"""主題樣式：每個設定版本編譯一次，寫成內容雜湊檔名的靜態樣式表 (static/theme-<雜湊>.css)，每次執行只送出 <link>
+
+遠端圖片 (歡迎牆背景、商品圖) 下載一份到 static/assets/ 後改用本地網址，下載失敗時沿用原網址。
+需在 .streamlit/config.toml 開啟 server.enableStaticServing；檔名隨內容改變，反向代理可對 app/static/ 設長效快取。
+"""
+import hashlib
+import mimetypes
+import os
+import tempfile
+import urllib.request
+from pathlib import Path
+from string import Template
+
+STATIC_DIR = Path(__file__).resolve().parent / "static"
+STATIC_URL = "app/static"
+MAX_IMAGE_BYTES = 5 * 1024 * 1024
+
+CSS = Template("""
+:root { color-scheme: dark; }
+html, body, .stApp { background-color: #000000 !important; color: #FFFFFF !important; font-family: 'Arial', sans-serif; }
+.stTextInput input, .stNumberInput input, .stSelectbox div, .stTextArea textarea { background-color: #1a1a1a !important; color: #FFFFFF !important; border: 1px solid #444 !important; border-radius: 8px !important; }
+.stButton > button { background: linear-gradient(180deg, #333 0%, #111 100%) !important; color: #FFD700 !important; border: 1px solid #FFD700 !important; border-radius: 8px !important; font-weight: bold !important; transition: 0.1s; }
+.stButton > button:hover { background: linear-gradient(180deg, #FFD700 0%, #B8860B 100%) !important; color: #000 !important; transform: scale(1.02); }
+.stTabs [data-baseweb="tab-list"] { gap: 5px; background-color: #111; padding: 10px; border-radius: 15px; border: 1px solid #333; }
+.stTabs [data-baseweb="tab"] { background-color: #222; color: #AAA; border-radius: 8px; border: none; }
+.stTabs [aria-selected="true"] { background-color: #FFD700 !important; color: #000 !important; font-weight: bold; }
+
+.welcome-wall { text-align: center; padding: 60px 20px; background: linear-gradient(rgba(0,0,0,0.8), rgba(0,0,0,0.9)), url('$welcome_bg'); background-size: cover; border-radius: 20px; border: 2px solid #FFD700; margin-bottom: 20px; }
+.rank-card { background: linear-gradient(135deg, #1a1a1a 0%, #000 100%); border: 2px solid #FFD700; border-radius: 20px; padding: 25px; text-align: center; box-shadow: 0 0 20px rgba(255, 215, 0, 0.3); height: 100%; display: flex; flex-direction: column; justify-content: space-between; }
+.vip-card { background: linear-gradient(135deg, #000 0%, #222 100%); border: 2px solid #9B30FF; border-radius: 20px; padding: 25px; text-align: center; box-shadow: 0 0 20px rgba(155, 48, 255, 0.3); height: 100%; display: flex; flex-direction: column; justify-content: space-between; }
+.lb-rank-card { padding: 15px; border-radius: 15px; margin-bottom: 10px; display: flex; align-items: center; justify-content: space-between; box-shadow: 0 4px 10px rgba(0,0,0,0.5); border: 2px solid #FFF; }
+.lb-rank-1 { background: linear-gradient(45deg, #FFD700, #FDB931); color: #000; box-shadow: 0 0 20px rgba(255,215,0,0.6); transform: scale(1.02); }
+.lb-rank-2 { background: linear-gradient(45deg, #E0E0E0, #B0B0B0); color: #000; box-shadow: 0 0 15px rgba(224,224,224,0.4); }
+.lb-rank-3 { background: linear-gradient(45deg, #CD7F32, #A0522D); color: #FFF; box-shadow: 0 0 10px rgba(205,127,50,0.4); }
+.lb-rank-norm { background: rgba(30,30,30,0.8); border: 1px solid #444; color: #EEE; }
+
+.glory-title { color: #FFD700; font-size: 2.2em; font-weight: bold; text-align: center; margin-bottom: 20px; border-bottom: 4px solid #FFD700; padding-bottom: 10px; text-shadow: 0 0 10px rgba(255,215,0,0.5); }
+.mall-card { background: #151515; border: 1px solid #333; border-radius: 12px; padding: 15px; text-align: center; height: 100%; display:flex; flex-direction:column; justify-content:space-between; }
+.mall-card:hover { border-color: #FFD700; transform: translateY(-5px); }
+.mall-price { color: #00FF00; font-weight: bold; font-size: 1.2em; }
+
+.lobby-card { background: linear-gradient(145deg, #222, #111); border: 1px solid #444; border-radius: 15px; padding: 20px; text-align: center; cursor: pointer; transition: 0.2s; box-shadow: 0 4px 6px rgba(0,0,0,0.3); }
+.lobby-card:hover { border-color: #FFD700; transform: scale(1.02); box-shadow: 0 0 15px rgba(255, 215, 0, 0.2); }
+.lobby-icon { font-size: 3em; margin-bottom: 10px; }
+
+.bj-table { background-color: #35654d; padding: 30px; border-radius: 20px; border: 8px solid #5c3a21; box-shadow: inset 0 0 50px rgba(0,0,0,0.8); text-align: center; margin-bottom: 20px; }
+.bj-card { background-color: #FFFFFF; color: #000000; border-radius: 6px; display: inline-block; width: 60px; height: 85px; margin: 5px; padding: 5px; font-family: 'Arial', sans-serif; font-weight: bold; font-size: 1.2em; box-shadow: 2px 2px 5px rgba(0,0,0,0.5); vertical-align: middle; line-height: 1.1; }
+.suit-red { color: #D40000 !important; } .suit-black { color: #000000 !important; }
+
+.roulette-history-bar { display: flex; gap: 5px; overflow-x: auto; padding: 10px; background: #000; border-radius: 8px; margin-bottom: 10px; border: 1px solid #333; }
+.hist-ball { min-width: 35px; height: 35px; border-radius: 50%; display: flex; align-items: center; justify-content: center; font-weight: bold; border: 2px solid #fff; margin-right: 5px; }
+
+.lm-grid { display: grid; grid-template-columns: repeat(5, 1fr); gap: 10px; padding: 20px; background: #000; border: 4px solid #FFD700; border-radius: 20px; }
+.lm-cell { background: #222; border: 2px solid #444; border-radius: 10px; padding: 10px; text-align: center; color: #FFF; transition: 0.1s; height: 100px; display: flex; flex-direction: column; justify-content: center; align-items: center; }
+.lm-active { background: #FFF; border-color: #FFD700; color: #000; box-shadow: 0 0 20px #FFD700; transform: scale(1.1); font-weight: bold; }
+.lm-img { width: 50px; height: 50px; object-fit: contain; margin-bottom: 5px; }
+
+.marquee-container { background: #1a1a1a; color: #FFD700; padding: 12px 0; overflow: hidden; white-space: nowrap; border-top: 2px solid #FFD700; border-bottom: 2px solid #FFD700; margin-bottom: 25px; }
+.marquee-text { display: inline-block; padding-left: 100%; animation: marquee ${marquee_speed}s linear infinite; font-size: 1.5em; font-weight: bold; }
+@keyframes marquee { 0% { transform: translate(0, 0); } 100% { transform: translate(-100%, 0); } }
+
+.mission-card { background: linear-gradient(90deg, #222 0%, #111 100%); border-left: 5px solid #FFD700; padding: 15px; margin-bottom: 10px; border-radius: 5px; display: flex; justify-content: space-between; align-items: center; }
+.mission-title { font-size: 1.2em; font-weight: bold; color: #FFF; }
+.bp-row { display: grid; grid-template-columns: 2fr 2fr 3fr 2fr 2fr; gap: 8px; padding: 8px 4px; border-bottom: 1px solid #333; color: #EEE; }
+.bp-head { font-weight: bold; color: #FFD700; margin-left: 24px; }
+.mission-reward { color: #00FF00; font-weight: bold; border: 1px solid #00FF00; padding: 5px 10px; border-radius: 15px; }
+
+.bead-plate { display: grid; grid-template-columns: repeat(10, 1fr); gap: 5px; width: 100%; padding: 10px; background: #FFF; border: 2px solid #999; overflow-x: auto; margin-bottom: 15px; border-radius: 8px; }
+.bead { width: 35px; height: 35px; border-radius: 50%; display: flex; align-items: center; justify-content: center; font-size: 14px; font-weight: 900; margin: auto; color: white; box-shadow: inset -2px -2px 5px rgba(0,0,0,0.3); border: 1px solid rgba(0,0,0,0.2); }
+.bead-P { background: radial-gradient(circle at 10px 10px, #5555FF, #0000AA); }
+.bead-B { background: radial-gradient(circle at 10px 10px, #FF5555, #AA0000); }
+.bead-T { background: radial-gradient(circle at 10px 10px, #55FF55, #008000); color: black; }
+""")
+
+
+def _write_once(rel, data):
+    """檔名含內容雜湊，已存在就不再寫入；先寫暫存檔再改名，多個程序同時寫入也不會讀到半個檔案"""
+    path = STATIC_DIR / rel
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent)
+        with os.fdopen(fd, "wb") as f: f.write(data)
+        os.chmod(tmp, 0o644)                        # mkstemp 建的是 0600，靜態檔要讓網頁伺服器讀得到
+        os.replace(tmp, path)
+    return f"{STATIC_URL}/{rel}"
+
+
+def compile_css(marquee_speed, welcome_bg):
+    """回傳樣式表網址 (相同內容 → 相同檔名)"""
+    # 樣式表內的網址相對於樣式表本身 (同在 app/static/ 下)
+    if str(welcome_bg).startswith(STATIC_URL + "/"): welcome_bg = welcome_bg[len(STATIC_URL) + 1:]
+    css = CSS.substitute(marquee_speed=marquee_speed, welcome_bg=welcome_bg).encode()
+    return _write_once(f"theme-{hashlib.sha256(css).hexdigest()[:12]}.css", css)
+
+
+def local_image(url, timeout=5):
+    """遠端圖片 → 本地快取網址；非 http(s) 網址、非圖片或下載失敗時回傳原網址"""
+    if not url or not str(url).startswith(("http://", "https://")): return url
+    key = hashlib.sha256(str(url).encode()).hexdigest()[:16]
+    hit = next(STATIC_DIR.glob(f"assets/{key}.*"), None)
+    if hit: return f"{STATIC_URL}/assets/{hit.name}"
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0"}), timeout=timeout) as res:
+            ctype = res.headers.get_content_type()
+            data = res.read(MAX_IMAGE_BYTES + 1)
+    except Exception as e:
+        print(f"Asset Error: {url} {e}"); return url
+    # 靜態檔以副檔名判斷型別，必須存成正確的圖片副檔名
+    ext = mimetypes.guess_extension(ctype) if ctype.startswith("image/") else None
+    if not ext or len(data) > MAX_IMAGE_BYTES: return url
+    return _write_once(f"assets/{key}{ext}", data)
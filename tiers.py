@@ -0,0 +1,62 @@
+"""排位 / VIP 階級表：門檻排序陣列 + bisect 對應積分 → 整數階級，整批積分以 numpy 一次分類
+
+階級 ID：0 = 無限制 (商品門檻用)，1 白銀 … 5 菁英；Inventory 以 mall_min_tier / wheel_min_tier 存整數門檻。
+"""
+from bisect import bisect_right
+
+import numpy as np
+import pandas as pd
+
+NO_LIMIT = 0
+TIER_NAMES = {1: "🥈 白銀", 2: "⬜ 白金", 3: "💎 鑽石", 4: "🎖️ 大師", 5: "🏆 菁英"}
+TIER_EN = {1: "Silver", 2: "Platinum", 3: "Diamond", 4: "Master", 5: "Challenger"}
+# 商品門檻選項 (沿用舊版標籤文字，標籤與整數一併寫入)
+LIMIT_LABELS = {NO_LIMIT: "無限制", **{t: f"{TIER_NAMES[t]} ({TIER_EN[t]})" for t in TIER_NAMES}}
+
+VIP_NAMES = {1: "銅牌", 2: "銀牌", 3: "黃金", 4: "鑽石"}
+VIP_COHORTS = {"VIP 1 (銅)": 1, "VIP 2 (銀)": 2, "VIP 3 (金)": 3, "VIP 4 (鑽)": 4}
+
+
+def tier_of_label(label):
+    """舊資料只有標籤文字時的對應 (僅在載入時做一次)"""
+    for t in sorted(TIER_NAMES, reverse=True):
+        if TIER_NAMES[t].split()[-1] in str(label or ""): return t
+    return NO_LIMIT
+
+
+class TierTable:
+    def __init__(self, limits):
+        # limits 依序為 菁英 / 大師 / 鑽石 / 白金 門檻 (與設定相同)，內部轉成遞增陣列
+        self.limits = tuple(limits)
+        self.thresholds = sorted(self.limits)
+        self._arr = np.asarray(self.thresholds)
+
+    def tier(self, pts):
+        return 1 + bisect_right(self.thresholds, pts or 0)
+
+    def tiers(self, points):
+        """整批積分 → 階級 ID 陣列"""
+        return 1 + np.searchsorted(self._arr, np.nan_to_num(np.asarray(points, dtype=float)), side="right")
+
+    def title(self, pts):
+        return TIER_NAMES[self.tier(pts)]
+
+    def titles(self, points):
+        return [TIER_NAMES[t] for t in self.tiers(points)]
+
+    def bounds(self, tier):
+        """階級 → 積分區間 [lo, hi)，None 表示無界"""
+        lo = self.thresholds[tier - 2] if tier > 1 else None
+        hi = self.thresholds[tier - 1] if tier <= len(self.thresholds) else None
+        return lo, hi
+
+
+def min_tiers(items, kind):
+    """商品 DataFrame → 門檻階級 Series (kind = 'mall' / 'wheel')；整數欄位為空的舊資料以標籤補上"""
+    tier = items.get(f"{kind}_min_tier")
+    label = items.get(f"{kind}_min_rank")
+    legacy = label.map(tier_of_label) if label is not None else None
+    if tier is None: tier = legacy
+    elif legacy is not None: tier = tier.fillna(legacy)
+    if tier is None: return pd.Series(NO_LIMIT, index=items.index, dtype=int)
+    return tier.fillna(NO_LIMIT).astype(int)
@@ -0,0 +1,185 @@
+"""賽事精算導入：欄位向量化計算積分 / 手續費，多檔以內容雜湊去重並逐塊交易寫入 (可中斷續傳)"""
+import hashlib
+import io
+import math
+import os
+import re
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# 積分矩陣 (還原舊版邏輯)：買入 → (底分, 積分倍率, 前三名加分)
+MATRIX = {
+    1200: (200, 0.75, [2, 1.5, 1]),
+    3400: (400, 1.5, [5, 4, 3]),
+    6600: (600, 2.0, [10, 8, 6]),
+    11000: (1000, 3.0, [20, 15, 10]),
+    21500: (1500, 5.0, [40, 30, 20])
+}
+
+
+def buy_in_from_filename(fn, default=1000):
+    nums = [int(n) for n in re.findall(r'(\d+)', fn)]
+    # 檔名含日期等其他數字時，優先採用積分矩陣內的買入
+    known = [n for n in nums if n in MATRIX]
+    if known: return known[0]
+    return nums[0] if nums else default
+
+
+def read_results(up, fn):
+    if fn.endswith('.csv'):
+        try: df = pd.read_csv(up, encoding='utf-8-sig')
+        except:
+            up.seek(0)
+            df = pd.read_csv(up, encoding='big5')
+    else: df = pd.read_excel(up)
+    df.columns = df.columns.str.strip()
+    return df
+
+
+def scoring(buy):
+    base, p_mult, bonuses = MATRIX.get(buy, (100, 1.0, [1, 1, 1]))
+    if buy >= 3000 and buy not in MATRIX: base = 200
+    return base, p_mult, bonuses
+
+
+def _int_col(df, col, default=0):
+    if col not in df.columns: return pd.Series(default, index=df.index, dtype="int64")
+    return pd.to_numeric(df[col]).astype("int64")
+
+
+def compute_results(df, buy):
+    """整張表一次計算，欄位：player_id, name, rank, re_entries, payout, actual_fee, pts"""
+    base, p_mult, bonuses = scoring(buy)
+    rank = _int_col(df, 'Rank')
+    re_e = _int_col(df, 'Re-Entries')
+    ents = re_e + 1
+
+    # 抓取抵用卷折扣
+    remark = df['Remark'].where(df['Remark'].notna(), '').astype(str) if 'Remark' in df.columns else pd.Series('', index=df.index)
+    found = remark.str.extractall(r'(\d+)抵用卷')
+    discounts = found[0].astype("int64").groupby(level=0).sum().reindex(df.index, fill_value=0) if not found.empty else 0
+
+    # 實際手續費 = XP 獎勵 (100% 全額回饋，不含 Payout)
+    actual_fee = (base * ents - discounts).clip(lower=0)
+
+    # 積分 = int(參賽次數 * 倍率) + 前三名加分 (與逐列版相同的索引語意；1200 買入的 1.5 加分會保留小數)
+    bonus_arr = np.asarray(bonuses)
+    rank_bonus = np.where(rank <= 3, bonus_arr[np.minimum(rank.to_numpy() - 1, len(bonuses) - 1)], 0)
+    pts = (ents * p_mult).astype("int64") + rank_bonus
+
+    return pd.DataFrame({
+        "player_id": df['ID'].astype(str), "name": df['Nickname'].astype(str).str[:10],
+        "rank": rank, "re_entries": re_e, "payout": _int_col(df, 'Payout'),
+        "actual_fee": actual_fee.astype("int64"), "pts": pd.Series(pts, index=df.index),
+    })
+
+
+def _num(v):
+    return int(v) if float(v).is_integer() else float(v)
+
+
+# --- 多檔批次導入 (內容雜湊去重 + 逐塊檢查點) ---
+RESULT_EXTS = ('.csv', '.xlsx', '.xls')
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def expand_uploads(files):
+    """上傳檔 (含 zip) 展開成 [(檔名, bytes)]"""
+    out = []
+    for name, data in files:
+        if name.lower().endswith('.zip'):
+            with zipfile.ZipFile(io.BytesIO(data)) as zf:
+                for info in zf.infolist():
+                    base = os.path.basename(info.filename)
+                    if info.is_dir() or base.startswith('.') or not base.lower().endswith(RESULT_EXTS): continue
+                    out.append((base, zf.read(info)))
+        elif name.lower().endswith(RESULT_EXTS): out.append((name, data))
+    return out
+
+
+def buy_in_for(df, fn):
+    # 檔案內有買入欄位時優先採用，否則沿用檔名數字
+    for col in ('Buy-in', 'BuyIn', '買入'):
+        if col in df.columns and df[col].notna().any(): return int(pd.to_numeric(df[col].dropna().iloc[0]))
+    return buy_in_from_filename(fn)
+
+
+def parse_file(name, data):
+    """可在子程序執行：解析並精算單一檔案，回傳 (檔名, 雜湊, 買入, 精算結果)"""
+    df = read_results(io.BytesIO(data), name)
+    buy = buy_in_for(df, name)
+    return name, content_hash(data), buy, compute_results(df, buy)
+
+
+def build_chunk(res, fn, buy, now):
+    players = res.groupby('player_id', sort=False).agg(name=('name', 'first'), xp=('actual_fee', 'sum'), pts=('pts', 'sum'))
+    return {
+        "members": [{"pf_id": pid, "name": r['name']} for pid, r in players.iterrows()],
+        "xp": [{"pf_id": pid, "xp": int(r.xp)} for pid, r in players.iterrows()],
+        "hero": [{"player_id": pid, "hero_points": _num(r.pts)} for pid, r in players.iterrows()],
+        "monthly": [{"player_id": pid, "monthly_points": _num(r.pts)} for pid, r in players.iterrows()],
+        "records": [{
+            "player_id": r.player_id, "buy_in": buy, "rank": int(r.rank), "re_entries": int(r.re_entries), "payout": int(r.payout),
+            "filename": fn, "actual_fee": int(r.actual_fee), "time": now
+        } for r in res.itertuples()],
+    }
+
+
+def parse_all(files, workers=None):
+    if len(files) <= 1: return [_safe_parse(n, d) for n, d in files]
+    with ProcessPoolExecutor(max_workers=workers or min(len(files), os.cpu_count() or 1)) as pool:
+        return list(pool.map(_safe_parse, [n for n, _ in files], [d for _, d in files]))
+
+
+def _safe_parse(name, data):
+    try: return parse_file(name, data)
+    except Exception as e: return name, content_hash(data), None, e
+
+
+def import_files(db, files, chunk_size=200, workers=None, on_progress=None, on_chunk=None):
+    """解析 (程序池) → 依雜湊取得檢查點 → 從上次完成的區塊續傳；回傳每個檔案的結果報表
+
+    on_chunk(payload) 於每個區塊寫入後呼叫 (排名索引增量更新用)。
+    """
+    report = []
+    parsed = parse_all(expand_uploads(files), workers)
+    for i, (fn, digest, buy, res) in enumerate(parsed):
+        t0 = time.perf_counter()
+        row = {"檔案": fn, "雜湊": digest[:12], "買入": buy, "筆數": 0, "區塊": "", "結果": "", "ms": 0.0}
+        try:
+            if isinstance(res, Exception): raise res
+            row["筆數"] = len(res)
+            row["區塊"], row["結果"] = _apply_file(db, fn, digest, buy, res, chunk_size, on_chunk)
+        except Exception as e:
+            row["結果"] = f"失敗: {e}"
+        row["ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        report.append(row)
+        if on_progress: on_progress(i + 1, len(parsed), row)
+    return report
+
+
+def _apply_file(db, fn, digest, buy, res, chunk_size, on_chunk=None):
+    # 改用雜湊前的舊紀錄只有檔名可比對
+    if db.table("Import_History").select("id").eq("filename", fn).is_("content_hash", "null").limit(1).execute().data:
+        return "", "重複略過 (舊紀錄)"
+    n_chunks = max(1, math.ceil(len(res) / chunk_size))
+    h = db.begin_import(digest, fn, buy, len(res), chunk_size, n_chunks)
+    # 續傳時沿用當初的區塊大小，區塊邊界才會一致
+    size = h.get("chunk_size") or chunk_size; total = h.get("chunks_total") or n_chunks
+    done = h.get("chunks_done") or 0
+    if h.get("status") == "done": return f"{done}/{total}", "重複略過"
+    resumed = done > 0
+    now = datetime.now().isoformat()
+    for c in range(done, total):
+        payload = build_chunk(res.iloc[c * size:(c + 1) * size], fn, buy, now)
+        done = db.apply_import_chunk(digest, c, **payload)
+        if on_chunk: on_chunk(payload)
+    return f"{done}/{total}", "續傳完成" if resumed else "匯入完成"